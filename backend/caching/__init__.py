@@ -0,0 +1 @@
+from .lru import *
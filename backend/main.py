@@ -1,10 +1,25 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from metrics import registry, server_timing_header, start_request_timings
 from stt.routers import router as stt_router
+from rag.clients import async_clients
 from rag.routers.context import router as rag_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connection pools are bound to the event loop, so they are opened here and shared by all requests
+    await async_clients.open()
+    yield
+    await async_clients.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Middleware
 app.add_middleware(
@@ -13,10 +28,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-request stage breakdown, e.g. "Server-Timing: langtail;dur=412.0, embedding;dur=95.3"
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    timings = start_request_timings()
+    response = await call_next(request)
+    if SERVER_TIMING_HEADER and timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 routers_prefix = "/api/v1"
 
 # Include routers with prefixes
 app.include_router(stt_router, prefix=f"{routers_prefix}/stt")
-app.include_router(rag_router, prefix=f"{routers_prefix}/rag")
\ No newline at end of file
+app.include_router(rag_router, prefix=f"{routers_prefix}/rag")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,98 @@
+# cache/cache.py
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from caching import LRUCache
+from metrics import cache_requests
+
+
+class SqliteVectorStore:
+    # Persistent tier shared by all workers on the host, vectors are stored as packed float32
+    def __init__(self, path: str, max_entries: int, ttl_seconds: Optional[float] = None):
+        self._path = path
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS vectors_created_at ON vectors (created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[List[float]]:
+        row = self._connection().execute(
+            "SELECT vector, created_at FROM vectors WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._ttl_seconds and row[1] < time.time() - self._ttl_seconds:
+            return None
+        return array("f", row[0]).tolist()
+
+    def set(self, key: str, vector: List[float]) -> None:
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO vectors (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, array("f", vector).tobytes(), now)
+            )
+            if self._ttl_seconds:
+                connection.execute("DELETE FROM vectors WHERE created_at < ?", (now - self._ttl_seconds,))
+            connection.execute(
+                "DELETE FROM vectors WHERE key IN "
+                "(SELECT key FROM vectors ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,)
+            )
+
+
+class VectorCache:
+    def __init__(self, name: str, memory: LRUCache, persistent: Optional[SqliteVectorStore] = None):
+        self.name = name
+        self.memory = memory
+        self.persistent = persistent
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            cache_requests.inc(cache=self.name, result="hit_memory")
+            return value
+        if self.persistent is not None:
+            value = self.persistent.get(key)
+            if value is not None:
+                self.persistent_hits += 1
+                cache_requests.inc(cache=self.name, result="hit_persistent")
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        cache_requests.inc(cache=self.name, result="miss")
+        return None
+
+    def set(self, key: str, value: List[float]) -> None:
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.persistent_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "hit_ratio": (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0
+        }
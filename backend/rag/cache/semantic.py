@@ -0,0 +1,112 @@
+# cache/semantic.py
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from metrics import cache_requests
+
+
+def mark_collection_seeded(marker_path: str) -> None:
+    directory = os.path.dirname(marker_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(marker_path, "w") as f:
+        f.write(str(time.time()))
+
+
+class SemanticCache:
+    # Rows are unit-normalized float32 embeddings, so a matrix-vector product gives the cosine similarities
+    def __init__(self, name: str, max_entries: int, threshold: float, marker_path: str = ""):
+        self.name = name
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.marker_path = marker_path
+        self.hits = 0
+        self.misses = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._values: List[Any] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._size = 0
+        self._seeded_at = self._marker_mtime()
+        self._lock = threading.Lock()
+
+    def _marker_mtime(self) -> Optional[float]:
+        if not self.marker_path:
+            return None
+        try:
+            return os.stat(self.marker_path).st_mtime
+        except OSError:
+            return None
+
+    def _check_marker(self) -> None:
+        # The seeding script runs in another process and touches the marker when it finishes
+        seeded_at = self._marker_mtime()
+        if seeded_at != self._seeded_at:
+            self._seeded_at = seeded_at
+            self._clear()
+
+    def _clear(self) -> None:
+        self._values = [None] * self.max_entries
+        self._last_used[:] = 0
+        self._size = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding: List[float], accept=None) -> Optional[Any]:
+        if self.max_entries <= 0:
+            return None
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_marker()
+            if self._size and self._matrix is not None and self._matrix.shape[1] == len(vector):
+                similarities = self._matrix[:self._size] @ vector
+                for index in np.argsort(similarities)[::-1]:
+                    if similarities[index] < self.threshold:
+                        break
+                    value = self._values[index]
+                    if accept is None or accept(value):
+                        self._last_used[index] = time.monotonic()
+                        self.hits += 1
+                        cache_requests.inc(cache=self.name, result="hit_memory")
+                        return value
+            self.misses += 1
+        cache_requests.inc(cache=self.name, result="miss")
+        return None
+
+    def set(self, embedding: List[float], value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_marker()
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._clear()
+            if self._size < self.max_entries:
+                index = self._size
+                self._size += 1
+            else:
+                index = int(np.argmin(self._last_used))
+            self._matrix[index] = vector
+            self._values[index] = value
+            self._last_used[index] = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": self._size,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1 @@
+from .clients import *
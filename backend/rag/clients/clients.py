@@ -0,0 +1,77 @@
+# clients/clients.py
+from typing import Optional
+
+import aiohttp
+import httpx
+from qdrant_client import AsyncQdrantClient
+from voyageai import AsyncClient as AsyncVoyageClient
+
+from rag.config.settings import settings
+
+
+class AsyncClients:
+    # Created on the running event loop by the app lifespan, or lazily on first use
+    def __init__(self):
+        self._langtail: Optional[httpx.AsyncClient] = None
+        self._voyage: Optional[AsyncVoyageClient] = None
+        self._voyage_session: Optional[aiohttp.ClientSession] = None
+        self._qdrant: Optional[AsyncQdrantClient] = None
+
+    @property
+    def langtail(self) -> httpx.AsyncClient:
+        if self._langtail is None:
+            self._langtail = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LANGTAIL_POOL_SIZE,
+                    max_keepalive_connections=settings.LANGTAIL_POOL_SIZE
+                ),
+                timeout=httpx.Timeout(settings.LANGTAIL_TIMEOUT_SECONDS, connect=settings.LANGTAIL_CONNECT_TIMEOUT_SECONDS)
+            )
+        return self._langtail
+
+    @property
+    def voyage(self) -> AsyncVoyageClient:
+        if self._voyage is None:
+            self._voyage = AsyncVoyageClient(api_key=settings.VOYAGE_API_KEY, timeout=settings.VOYAGE_TIMEOUT_SECONDS)
+        return self._voyage
+
+    @property
+    def voyage_session(self) -> aiohttp.ClientSession:
+        # voyageai opens a new session per request unless one is provided through voyageai.aiosession
+        if self._voyage_session is None or self._voyage_session.closed:
+            self._voyage_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.VOYAGE_POOL_SIZE)
+            )
+        return self._voyage_session
+
+    @property
+    def qdrant(self) -> AsyncQdrantClient:
+        if self._qdrant is None:
+            self._qdrant = AsyncQdrantClient(
+                host=settings.QDRANT_HOST,
+                port=settings.QDRANT_PORT,
+                api_key=settings.QDRANT_API_KEY,
+                timeout=settings.QDRANT_TIMEOUT_SECONDS
+            )
+        return self._qdrant
+
+    async def open(self) -> None:
+        self.langtail
+        self.voyage
+        self.voyage_session
+        self.qdrant
+
+    async def close(self) -> None:
+        if self._langtail is not None:
+            await self._langtail.aclose()
+        if self._voyage_session is not None:
+            await self._voyage_session.close()
+        if self._qdrant is not None:
+            await self._qdrant.close()
+        self._langtail = None
+        self._voyage = None
+        self._voyage_session = None
+        self._qdrant = None
+
+
+async_clients = AsyncClients()
@@ -10,21 +10,79 @@ class Settings(BaseSettings):
     LANGTAIL_PROJECT: str = Field(..., env='LANGTAIL_PROJECT')
     LANGTAIL_PROMPT: str = Field(..., env='LANGTAIL_PROMPT')
     LANGTAIL_ENVIRONMENT: str = Field(..., env='LANGTAIL_ENVIRONMENT')
+    LANGTAIL_POOL_SIZE: int = Field(default=10, env='LANGTAIL_POOL_SIZE')
+    LANGTAIL_CONNECT_TIMEOUT_SECONDS: float = Field(default=3.0, env='LANGTAIL_CONNECT_TIMEOUT_SECONDS')
+    LANGTAIL_TIMEOUT_SECONDS: float = Field(default=15.0, env='LANGTAIL_TIMEOUT_SECONDS')
+    LANGTAIL_CACHE_SIZE: int = Field(default=1024, env='LANGTAIL_CACHE_SIZE')
+    LANGTAIL_CACHE_TTL_SECONDS: int = Field(default=24 * 60 * 60, env='LANGTAIL_CACHE_TTL_SECONDS')
+    # Race mode searches with the raw query and only waits this long for the enhanced one
+    LANGTAIL_RACE: bool = Field(default=False, env='LANGTAIL_RACE')
+    LANGTAIL_RACE_BUDGET_SECONDS: float = Field(default=1.0, env='LANGTAIL_RACE_BUDGET_SECONDS')
 
     # Qdrant settings
     QDRANT_HOST: str = Field(default='localhost', env='QDRANT_HOST')
     QDRANT_PORT: int = Field(default=6333, env='QDRANT_PORT')
     QDRANT_API_KEY: str = Field(default='', env='QDRANT_API_KEY')
     QDRANT_COLLECTION_NAME: str = Field(..., env='QDRANT_COLLECTION_NAME')
+    QDRANT_TIMEOUT_SECONDS: int = Field(default=10, env='QDRANT_TIMEOUT_SECONDS')
+
+    # Local vector index, searched instead of Qdrant when the directory holds a built index
+    LOCAL_INDEX_DIR: str = Field(default='', env='LOCAL_INDEX_DIR')
+    LOCAL_INDEX_DTYPE: str = Field(default='float32', env='LOCAL_INDEX_DTYPE')
+    # Paragraph text and law metadata, seeding keeps only slim payloads in Qdrant when this is set
+    DOCUMENT_STORE_DIR: str = Field(default='', env='DOCUMENT_STORE_DIR')
+    # Extra candidates fetched per search, chunks of one long paragraph collapse into a single result
+    SEARCH_CHUNK_HEADROOM: int = Field(default=4, env='SEARCH_CHUNK_HEADROOM')
+
+    # Keyword search, hybrid mode fuses BM25 and dense rankings with reciprocal-rank fusion
+    SEARCH_MODE: str = Field(default='dense', env='SEARCH_MODE')
+    BM25_INDEX_DIR: str = Field(default='', env='BM25_INDEX_DIR')
+    BM25_TITLE_WEIGHT: float = Field(default=0.5, env='BM25_TITLE_WEIGHT')
+    HYBRID_CANDIDATE_FACTOR: int = Field(default=4, env='HYBRID_CANDIDATE_FACTOR')
+    HYBRID_RRF_K: int = Field(default=60, env='HYBRID_RRF_K')
+
+    # MongoDB settings, the batch size is how many documents each cursor round trip returns
+    MONGO_URI: str = Field(default='mongodb://localhost:27017/', env='MONGO_URI')
+    MONGO_DB_NAME: str = Field(default='law_database_mvp', env='MONGO_DB_NAME')
+    MONGO_COLLECTION_NAME: str = Field(default='MVP', env='MONGO_COLLECTION_NAME')
+    MONGO_POOL_SIZE: int = Field(default=10, env='MONGO_POOL_SIZE')
+    MONGO_BATCH_SIZE: int = Field(default=100, env='MONGO_BATCH_SIZE')
 
     # VoyageAI settings
     VOYAGE_API_KEY: str = Field(..., env='VOYAGE_API_KEY')
     VOYAGE_MODEL: str = Field(..., env='VOYAGE_MODEL')
+    VOYAGE_POOL_SIZE: int = Field(default=20, env='VOYAGE_POOL_SIZE')
+    VOYAGE_TIMEOUT_SECONDS: float = Field(default=30.0, env='VOYAGE_TIMEOUT_SECONDS')
+    # Document embedding requests are packed up to these limits, counted with tiktoken
+    EMBEDDING_BATCH_MAX_TOKENS: int = Field(default=100_000, env='EMBEDDING_BATCH_MAX_TOKENS')
+    EMBEDDING_BATCH_MAX_TEXTS: int = Field(default=128, env='EMBEDDING_BATCH_MAX_TEXTS')
+    EMBEDDING_CHUNK_MAX_TOKENS: int = Field(default=8000, env='EMBEDDING_CHUNK_MAX_TOKENS')
+    EMBEDDING_CHUNK_OVERLAP_TOKENS: int = Field(default=400, env='EMBEDDING_CHUNK_OVERLAP_TOKENS')
     # OpenData settings
     OPEN_DATA_API_KEY: str = Field(..., env='OPEN_DATA_API_KEY')
 
     # General settings
     DEFAULT_N: int = Field(default=3)
+    BATCH_MAX_QUERIES: int = Field(default=64, env='BATCH_MAX_QUERIES')
+
+    # Query embedding cache, an empty DB path disables the persistent tier
+    EMBEDDING_CACHE_SIZE: int = Field(default=1024, env='EMBEDDING_CACHE_SIZE')
+    EMBEDDING_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 60 * 60, env='EMBEDDING_CACHE_TTL_SECONDS')
+    EMBEDDING_CACHE_DB_PATH: str = Field(default='', env='EMBEDDING_CACHE_DB_PATH')
+    EMBEDDING_CACHE_DB_MAX_ENTRIES: int = Field(default=100_000, env='EMBEDDING_CACHE_DB_MAX_ENTRIES')
+
+    # Semantic result cache, cleared whenever the seeding script touches the marker file
+    SEMANTIC_CACHE_SIZE: int = Field(default=512, env='SEMANTIC_CACHE_SIZE')
+    SEMANTIC_CACHE_THRESHOLD: float = Field(default=0.95, env='SEMANTIC_CACHE_THRESHOLD')
+    QDRANT_SEED_MARKER_PATH: str = Field(default='cache/qdrant_seeded', env='QDRANT_SEED_MARKER_PATH')
+    # Laws already uploaded by an interrupted seeding run, removed once a run completes
+    SEED_CHECKPOINT_PATH: str = Field(default='cache/seed_checkpoint.json', env='SEED_CHECKPOINT_PATH')
+    # Seeding pipeline, the rate limits apply to Voyage embedding requests and 0 disables them
+    SEED_QUEUE_SIZE: int = Field(default=8, env='SEED_QUEUE_SIZE')
+    SEED_EMBED_CONCURRENCY: int = Field(default=4, env='SEED_EMBED_CONCURRENCY')
+    SEED_UPSERT_CONCURRENCY: int = Field(default=2, env='SEED_UPSERT_CONCURRENCY')
+    SEED_EMBED_REQUESTS_PER_MINUTE: int = Field(default=300, env='SEED_EMBED_REQUESTS_PER_MINUTE')
+    SEED_EMBED_TOKENS_PER_MINUTE: int = Field(default=1_000_000, env='SEED_EMBED_TOKENS_PER_MINUTE')
 
     # Auth
     AUTH_USERNAME1: str = Field(..., env='AUTH_USERNAME1')
@@ -0,0 +1,4 @@
+from .store import *
+from .index import *
+from .bm25 import *
+from .documents import *
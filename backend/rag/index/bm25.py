@@ -0,0 +1,198 @@
+# index/bm25.py
+import glob
+import json
+import os
+import re
+import unicodedata
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.index.store import BlobStore, BlobStoreWriter, PublishedState, publish_version, version_path
+
+BM25_INDEX = "bm25"
+TOKEN = re.compile(r"\d+(?:/\d+)+|\w+")
+FIELDS = ("text", "title")
+
+# Diacritics are folded before stemming, so stopwords and suffixes are written without them
+STOPWORDS = frozenset("""
+a aby ale ani az by byl byla byli bylo byt do i jak jako je jeho jej jeji jejich jen jsou k ke kde
+ktera ktere kteri kterou ktery ma mezi mu na nebo neni o od po pod pro pri s se si so ta tak
+takze tento to tom tomu tu ty u uz v ve z za ze
+""".split())
+
+SUFFIXES = sorted("""
+atech etem atum ech ich eho emi emu ete eti iho imi imu ach ata aty ych ama ami ove ovi ymi
+em es im um at am os us ym mi ou a e i o u y
+""".split(), key=len, reverse=True)
+
+MIN_STEM = 3
+
+
+def fold_diacritics(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    # Light stemming in the spirit of Dolamic & Savoy, only case endings are removed
+    if token.isdigit():
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    tokens = []
+    for match in TOKEN.finditer(fold_diacritics(text.lower())):
+        token = match.group()
+        if "/" in token:
+            # "235/2004" matches both the whole citation and its parts
+            tokens.append(token)
+            tokens.extend(token.split("/"))
+        elif token not in STOPWORDS:
+            tokens.append(stem(token))
+    return tokens
+
+
+def document_fields(payload: dict) -> Dict[str, List[str]]:
+    title = f"{payload.get('law_nazev') or ''} § {payload.get('paragraph_cislo') or ''}"
+    return {"text": tokenize(payload.get("paragraph_zneni")), "title": tokenize(title)}
+
+
+class BM25IndexWriter:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.version = uuid.uuid4().hex
+        self._payloads = BlobStoreWriter(self._path("payloads"), self._path("offsets"))
+        self._term_counts: Dict[str, List[Counter]] = {field: [] for field in FIELDS}
+
+    def _path(self, name: str) -> str:
+        return version_path(self.directory, BM25_INDEX, name, self.version)
+
+    def add(self, ids: List[Any], payloads: List[dict], stored_payloads: Optional[List[dict]] = None) -> None:
+        # stored_payloads replaces what is kept for hydration, e.g. slim payloads backed by a document store
+        for point_id, payload, stored in zip(ids, payloads, stored_payloads or payloads):
+            for field, tokens in document_fields(payload).items():
+                self._term_counts[field].append(Counter(tokens))
+            self._payloads.append({"id": point_id, "payload": stored})
+
+    def commit(self) -> None:
+        self._payloads.close()
+        vocabulary: Dict[str, int] = {}
+        for counts in self._term_counts.values():
+            for document in counts:
+                for term in document:
+                    vocabulary.setdefault(term, len(vocabulary))
+
+        average_lengths = {}
+        for field, counts in self._term_counts.items():
+            # Postings in CSR layout: docs[indptr[t]:indptr[t + 1]] contain term t
+            postings: List[List[Tuple[int, int]]] = [[] for _ in vocabulary]
+            lengths = np.zeros(len(counts), dtype=np.float32)
+            for doc, document in enumerate(counts):
+                lengths[doc] = sum(document.values())
+                for term, tf in document.items():
+                    postings[vocabulary[term]].append((doc, tf))
+            indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(p) for p in postings])
+            docs = np.fromiter((doc for p in postings for doc, _ in p), dtype=np.int32, count=int(indptr[-1]))
+            tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(indptr[-1]))
+            for name, array in (("indptr", indptr), ("docs", docs), ("tfs", tfs), ("lengths", lengths)):
+                with open(self._path(f"{field}_{name}"), "wb") as f:
+                    np.save(f, array)
+            average_lengths[field] = float(lengths.mean()) if len(lengths) else 0.0
+
+        with open(self._path("vocabulary"), "w", encoding="utf-8") as f:
+            json.dump(vocabulary, f, ensure_ascii=False)
+        publish_version(self.directory, BM25_INDEX, {
+            "version": self.version,
+            "count": len(self._payloads),
+            "average_lengths": average_lengths
+        })
+
+    def abort(self) -> None:
+        self._payloads.close()
+        for path in glob.glob(self._path("*")):
+            os.remove(path)
+
+
+class BM25Index:
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75, title_weight: float = 0.5):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.weights = {"text": 1.0, "title": title_weight}
+        self._published = PublishedState(directory, BM25_INDEX, self._open, self._close)
+
+    def _open(self, meta: dict) -> dict:
+        path = lambda name: version_path(self.directory, BM25_INDEX, name, meta["version"])
+        with open(path("vocabulary"), encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        fields = {
+            field: {name: np.load(path(f"{field}_{name}"), mmap_mode="r") for name in ("indptr", "docs", "tfs", "lengths")}
+            for field in FIELDS
+        }
+        return {
+            "count": meta["count"],
+            "average_lengths": meta["average_lengths"],
+            "vocabulary": vocabulary,
+            "fields": fields,
+            "payloads": BlobStore(path("payloads"), path("offsets"))
+        }
+
+    @staticmethod
+    def _close(state: dict) -> None:
+        # The postings mappings are released with their last reference
+        state["payloads"].close()
+
+    @property
+    def available(self) -> bool:
+        return self._published.available
+
+    def close(self) -> None:
+        self._published.close()
+
+    def scores(self, state: dict, query: str) -> np.ndarray:
+        count = state["count"]
+        scores = np.zeros(count, dtype=np.float32)
+        terms = set(tokenize(query))
+        for field, arrays in state["fields"].items():
+            average_length = state["average_lengths"][field] or 1.0
+            norms = self.k1 * (1 - self.b + self.b * arrays["lengths"] / average_length)
+            for term in terms:
+                term_id = state["vocabulary"].get(term)
+                if term_id is None:
+                    continue
+                start, end = int(arrays["indptr"][term_id]), int(arrays["indptr"][term_id + 1])
+                if start == end:
+                    continue
+                docs = arrays["docs"][start:end]
+                tfs = arrays["tfs"][start:end]
+                idf = np.log(1 + (count - (end - start) + 0.5) / ((end - start) + 0.5))
+                scores[docs] += self.weights[field] * idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+        return scores
+
+    def search(self, query: str, top_n: int) -> List[Tuple[float, Any, dict]]:
+        with self._published.pin() as state:
+            if state is None:
+                raise RuntimeError(f"No keyword index found in '{self.directory}'")
+            if not state["count"] or top_n <= 0:
+                return []
+            scores = self.scores(state, query)
+            top_n = min(top_n, int(np.count_nonzero(scores)))
+            if not top_n:
+                return []
+            candidates = np.argpartition(-scores, top_n - 1)[:top_n]
+            ranked = candidates[np.argsort(-scores[candidates])]
+            results = []
+            for index in ranked:
+                record = state["payloads"][int(index)]
+                results.append((float(scores[index]), record["id"], record["payload"]))
+            return results
@@ -0,0 +1,117 @@
+# index/documents.py
+import os
+import uuid
+from typing import Any, List, Optional
+
+import numpy as np
+
+from rag.index.store import BlobStore, BlobStoreWriter, PublishedState, publish_version, version_path
+
+DOCUMENT_STORE = "documents"
+LAW_FIELDS = ("nazev", "id", "year", "category", "date", "staleURL")
+
+
+# Payload fields served by the document store, Qdrant keeps identifiers and fields small enough to filter on
+STORED_FIELDS = ("law_nazev", "law_date", "law_staleURL", "paragraph_zneni")
+
+
+class DocumentStoreWriter:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.version = uuid.uuid4().hex
+        self._laws = BlobStoreWriter(self._path("laws"), self._path("law_offsets"))
+        self._paragraphs = BlobStoreWriter(self._path("paragraphs"), self._path("paragraph_offsets"))
+        # Point IDs and the paragraph row each one points at, chunks of a paragraph share its row
+        self._point_ids: List[bytes] = []
+        self._rows: List[int] = []
+
+    def _path(self, name: str) -> str:
+        return version_path(self.directory, DOCUMENT_STORE, name, self.version)
+
+    def add_law(self, law: Any) -> int:
+        # Law metadata is stored once and paragraphs point at it by row
+        return self._laws.append({field: getattr(law, field) for field in LAW_FIELDS})
+
+    def add_paragraph(self, law_row: int, cislo: str, zneni: str) -> int:
+        # The whole paragraph is stored once, even when it is embedded as several chunks
+        return self._paragraphs.append([law_row, cislo, zneni])
+
+    def add_point(self, point_id: Any, paragraph_row: int) -> None:
+        self._point_ids.append(str(point_id).encode("utf-8"))
+        self._rows.append(paragraph_row)
+
+    def commit(self) -> None:
+        self._laws.close()
+        self._paragraphs.close()
+        # Sorted fixed-width IDs are binary searched straight from the mapping, readers never load them whole
+        point_ids = np.asarray(self._point_ids, dtype=f"S{max(map(len, self._point_ids), default=1)}")
+        order = np.argsort(point_ids, kind="stable")
+        for name, array in (("point_ids", point_ids[order]), ("rows", np.asarray(self._rows, dtype=np.int64)[order])):
+            with open(self._path(name), "wb") as f:
+                np.save(f, array)
+        publish_version(self.directory, DOCUMENT_STORE, {"version": self.version, "count": len(self._rows), "laws": len(self._laws)})
+
+    def abort(self) -> None:
+        self._laws.close()
+        self._paragraphs.close()
+        for name in ("laws", "law_offsets", "paragraphs", "paragraph_offsets", "point_ids", "rows"):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+
+class DocumentStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._published = PublishedState(directory, DOCUMENT_STORE, self._open, self._close)
+
+    def _open(self, meta: dict) -> dict:
+        path = lambda name: version_path(self.directory, DOCUMENT_STORE, name, meta["version"])
+        return {
+            "point_ids": np.load(path("point_ids"), mmap_mode="r"),
+            "rows": np.load(path("rows"), mmap_mode="r"),
+            "laws": BlobStore(path("laws"), path("law_offsets")),
+            "paragraphs": BlobStore(path("paragraphs"), path("paragraph_offsets")),
+            # Law records are shared by many hits, decode each one once
+            "law_cache": {}
+        }
+
+    @staticmethod
+    def _close(state: dict) -> None:
+        state["laws"].close()
+        state["paragraphs"].close()
+
+    @property
+    def available(self) -> bool:
+        return self._published.available
+
+    def close(self) -> None:
+        self._published.close()
+
+    @staticmethod
+    def _row(state: dict, point_id: Any) -> Optional[int]:
+        key = str(point_id).encode("utf-8")
+        point_ids = state["point_ids"]
+        if len(key) > point_ids.dtype.itemsize:
+            return None
+        index = int(np.searchsorted(point_ids, key))
+        if index == len(point_ids) or point_ids[index] != key:
+            return None
+        return int(state["rows"][index])
+
+    def payload(self, point_id: Any) -> Optional[dict]:
+        with self._published.pin() as state:
+            if state is None:
+                return None
+            row = self._row(state, point_id)
+            if row is None:
+                return None
+            law_row, cislo, zneni = state["paragraphs"][row]
+            law = state["law_cache"].get(law_row)
+            if law is None:
+                law = state["law_cache"][law_row] = state["laws"][law_row]
+        return {
+            **{f"law_{field}": value for field, value in law.items()},
+            "paragraph_cislo": cislo,
+            "paragraph_zneni": zneni
+        }
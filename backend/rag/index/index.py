@@ -0,0 +1,121 @@
+# index/index.py
+import glob
+import os
+import uuid
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from rag.index.store import BlobStore, BlobStoreWriter, PublishedState, publish_version, version_path
+
+DENSE_INDEX = "dense"
+DTYPES = ("float32", "float16")
+BLOCK_ROWS = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalIndexWriter:
+    def __init__(self, directory: str, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported index dtype '{dtype}', expected one of {DTYPES}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = dtype
+        self.version = uuid.uuid4().hex
+        self.dimension: Optional[int] = None
+        self._vectors = open(self._path("vectors"), "wb")
+        self._payloads = BlobStoreWriter(self._path("payloads"), self._path("offsets"))
+
+    def _path(self, name: str) -> str:
+        return version_path(self.directory, DENSE_INDEX, name, self.version)
+
+    def add(self, ids: List[Any], vectors: List[List[float]], payloads: List[dict]) -> None:
+        if not vectors:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        elif matrix.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of size {self.dimension}, got {matrix.shape[1]}")
+        self._vectors.write(_normalize(matrix).astype(self.dtype).tobytes())
+        self._payloads.extend({"id": point_id, "payload": payload} for point_id, payload in zip(ids, payloads))
+
+    def commit(self) -> None:
+        self._vectors.close()
+        self._payloads.close()
+        publish_version(self.directory, DENSE_INDEX, {
+            "version": self.version,
+            "dtype": self.dtype,
+            "dimension": self.dimension or 0,
+            "count": len(self._payloads)
+        })
+
+    def abort(self) -> None:
+        self._vectors.close()
+        self._payloads.close()
+        for path in glob.glob(self._path("*")):
+            os.remove(path)
+
+
+class LocalVectorIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._published = PublishedState(directory, DENSE_INDEX, self._open, self._close)
+
+    def _open(self, meta: dict) -> dict:
+        path = lambda name: version_path(self.directory, DENSE_INDEX, name, meta["version"])
+        if meta["count"]:
+            vectors = np.memmap(path("vectors"), dtype=meta["dtype"], mode="r", shape=(meta["count"], meta["dimension"]))
+        else:
+            vectors = np.empty((0, meta["dimension"]), dtype=meta["dtype"])
+        return {"vectors": vectors, "payloads": BlobStore(path("payloads"), path("offsets"))}
+
+    @staticmethod
+    def _close(state: dict) -> None:
+        # The vector mapping is released with its last reference
+        state["payloads"].close()
+
+    @property
+    def available(self) -> bool:
+        return self._published.available
+
+    def __len__(self) -> int:
+        with self._published.pin() as state:
+            return 0 if state is None else len(state["vectors"])
+
+    def close(self) -> None:
+        self._published.close()
+
+    @staticmethod
+    def scores(vectors: np.ndarray, embedding: List[float]) -> np.ndarray:
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        if len(query) != vectors.shape[1]:
+            raise ValueError(f"Expected a query vector of size {vectors.shape[1]}, got {len(query)}")
+        scores = np.empty(len(vectors), dtype=np.float32)
+        # Blocks keep float16 upcasts small and let pages of the mapping be read sequentially
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = vectors[start:start + BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        return scores
+
+    def search(self, embedding: List[float], top_n: int) -> List[Tuple[float, Any, dict]]:
+        with self._published.pin() as state:
+            if state is None:
+                raise RuntimeError(f"No local index found in '{self.directory}'")
+            vectors, payloads = state["vectors"], state["payloads"]
+            if not len(vectors) or top_n <= 0:
+                return []
+            scores = self.scores(vectors, embedding)
+            top_n = min(top_n, len(scores))
+            candidates = np.argpartition(-scores, top_n - 1)[:top_n]
+            ranked = candidates[np.argsort(-scores[candidates])]
+            results = []
+            for index in ranked:
+                record = payloads[int(index)]
+                results.append((float(scores[index]), record["id"], record["payload"]))
+            return results
@@ -0,0 +1,151 @@
+# index/store.py
+import glob
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+def meta_path(directory: str, kind: str) -> str:
+    return os.path.join(directory, f"{kind}.meta.json")
+
+
+def version_path(directory: str, kind: str, name: str, version: str) -> str:
+    return os.path.join(directory, f"{kind}-{name}-{version}")
+
+
+def publish_version(directory: str, kind: str, meta: dict) -> None:
+    # Files of a build carry a version suffix and the meta file is swapped in last, so readers never see a mixed index.
+    # Files and meta are prefixed with the index kind, so several kinds can share one directory.
+    path = meta_path(directory, kind)
+    with open(path + ".part", "w") as f:
+        json.dump(meta, f)
+    os.replace(path + ".part", path)
+    # Readers that still map an older build keep it alive until they reload
+    for path in glob.glob(os.path.join(directory, f"{kind}-*")):
+        if not path.endswith(meta["version"]):
+            os.remove(path)
+
+
+def read_meta(directory: str, kind: str) -> Optional[tuple]:
+    # Returns (mtime, meta) or None when nothing has been published yet
+    path = meta_path(directory, kind)
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path) as f:
+            return mtime, json.load(f)
+    except OSError:
+        return None
+
+
+class PublishedState:
+    # The loaded state of the latest published version of one index kind. Readers pin the state they use
+    # and a replaced state is closed once its last reader is done, so a reload never unmaps files under a search.
+    def __init__(self, directory: str, kind: str, open_state: Callable[[dict], Any], close_state: Callable[[Any], None]):
+        self.directory = directory
+        self.kind = kind
+        self._open_state = open_state
+        self._close_state = close_state
+        self._meta_mtime: Optional[float] = None
+        self._state: Any = None
+        # id(state) -> number of readers using it
+        self._readers: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def reload(self) -> None:
+        try:
+            mtime = os.stat(meta_path(self.directory, self.kind)).st_mtime
+        except OSError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        with self._lock:
+            loaded = read_meta(self.directory, self.kind)
+            if loaded is None or loaded[0] == self._meta_mtime:
+                return
+            mtime, meta = loaded
+            previous, self._state, self._meta_mtime = self._state, self._open_state(meta), mtime
+            if previous is not None and not self._readers.get(id(previous)):
+                self._close_state(previous)
+
+    @property
+    def available(self) -> bool:
+        self.reload()
+        return self._state is not None
+
+    @contextmanager
+    def pin(self) -> Iterator[Any]:
+        # Yields the current state, or None when nothing has been published yet
+        self.reload()
+        with self._lock:
+            state = self._state
+            if state is not None:
+                self._readers[id(state)] = self._readers.get(id(state), 0) + 1
+        try:
+            yield state
+        finally:
+            if state is not None:
+                with self._lock:
+                    self._readers[id(state)] -= 1
+                    retired = not self._readers[id(state)] and state is not self._state
+                    if not self._readers[id(state)]:
+                        del self._readers[id(state)]
+                if retired:
+                    self._close_state(state)
+
+    def close(self) -> None:
+        with self._lock:
+            state, self._state, self._meta_mtime = self._state, None, None
+            if state is not None and not self._readers.get(id(state)):
+                self._close_state(state)
+
+
+class BlobStoreWriter:
+    # Records are JSON documents packed back to back, offsets[i]:offsets[i + 1] is record i
+    def __init__(self, blob_path: str, offsets_path: str):
+        self.blob_path = blob_path
+        self.offsets_path = offsets_path
+        self._blob = open(blob_path, "wb")
+        self._offsets: List[int] = [0]
+
+    def append(self, record: Any) -> int:
+        data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._blob.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        return len(self._offsets) - 2
+
+    def extend(self, records: Iterable[Any]) -> None:
+        for record in records:
+            self.append(record)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def close(self) -> None:
+        self._blob.close()
+        with open(self.offsets_path, "wb") as f:
+            np.save(f, np.asarray(self._offsets, dtype=np.int64))
+
+
+class BlobStore:
+    def __init__(self, blob_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        self._file = open(blob_path, "rb")
+        # mmap refuses empty files
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(blob_path) else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Any:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return json.loads(self._blob[start:end])
+
+    def close(self) -> None:
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
@@ -1,6 +1,6 @@
 # models/types.py
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class Paragraf(BaseModel):
     cislo: str
@@ -15,8 +15,12 @@ class Law(BaseModel):
     staleURL: Optional[str] = None
     paragrafy: List[Paragraf] = Field(default_factory=list)
 
+SearchMode = Literal["dense", "bm25", "hybrid"]
+
 class QueryRequest(BaseModel):
     query: str
+    # Falls back to the SEARCH_MODE setting
+    mode: Optional[SearchMode] = None
 
     @validator('query')
     def query_must_be_non_empty(cls, v):
@@ -24,6 +28,12 @@ class QueryRequest(BaseModel):
             raise ValueError('Query must be a non-empty string')
         return v
 
+class BatchQuery(QueryRequest):
+    n: Optional[int] = Field(default=None, ge=1)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQuery]
+
 class RelevantDocument(BaseModel):
     law_nazev: str
     law_id: str
@@ -35,4 +45,9 @@ class RelevantDocument(BaseModel):
     paragraph_zneni: str
 
 class QueryResponse(BaseModel):
-    relevant_docs: List[RelevantDocument]
\ No newline at end of file
+    relevant_docs: List[RelevantDocument]
+    # enhanced: searched with the Langtail query, raw: Langtail missed the race, cache: semantic cache hit
+    query_source: Literal["enhanced", "raw", "cache"] = "enhanced"
+
+class BatchQueryResponse(BaseModel):
+    results: List[QueryResponse]
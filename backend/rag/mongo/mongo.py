@@ -1,25 +1,119 @@
+# mongo/mongo.py
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from bson import ObjectId
 from pymongo import MongoClient
-from typing import List
+from pymongo.collection import Collection
+from rag.config import settings
 from rag.logger.logger import logger
-from rag.models import Law
-
-
-def get_mongo_client(uri: str = "mongodb://localhost:27017/") -> MongoClient:
-    return MongoClient(uri)
-
-def fetch_laws_from_mongodb(db_name: str = "law_database_mvp", collection_name: str = "MVP") -> List[Law]:
-    client = get_mongo_client()
-    db = client[db_name]
-    collection = db[collection_name]
-    laws_data = list(collection.find())
-    laws = []
-    for law_data in laws_data:
-        try:
-            # Remove MongoDB '_id' field
-            law_data.pop('_id', None)
-            # Build Law object
-            law = Law(**law_data)
-            laws.append(law)
-        except Exception as e:
-            logger.error(f"Failed to parse law data: {e}")
-    return laws
\ No newline at end of file
+from rag.models import Law, Paragraf
+
+UPDATED_AT = "updated_at"
+# A Law cannot be built without these, so they are always part of a projection
+REQUIRED_FIELDS = ("nazev", "id", "year")
+
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(uri: Optional[str] = None) -> MongoClient:
+    # MongoClient is thread-safe and pools its connections, so one is shared per URI
+    uri = uri or settings.MONGO_URI
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(uri, maxPoolSize=settings.MONGO_POOL_SIZE)
+            _clients[uri] = client
+        return client
+
+def close_mongo_clients() -> None:
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+def get_law_collection(db_name: Optional[str] = None, collection_name: Optional[str] = None) -> Collection:
+    return get_mongo_client()[db_name or settings.MONGO_DB_NAME][collection_name or settings.MONGO_COLLECTION_NAME]
+
+def changed_since_filter(since: Optional[datetime]) -> dict:
+    if since is None:
+        return {}
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Laws saved before updated_at was stamped fall back to the insertion time kept in their ObjectId
+    return {"$or": [
+        {UPDATED_AT: {"$gte": since}},
+        {UPDATED_AT: {"$exists": False}, "_id": {"$gte": ObjectId.from_datetime(since)}}
+    ]}
+
+def law_projection(fields: Optional[Sequence[str]]) -> Optional[dict]:
+    if fields is None:
+        return None
+    return {field: True for field in (*REQUIRED_FIELDS, *fields)}
+
+def iter_laws_from_mongodb(
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    failed: Optional[List[ObjectId]] = None
+) -> Iterator[Law]:
+    # Laws are parsed one at a time as the cursor yields them, fields=None fetches whole documents.
+    # The _id of every law that cannot be parsed is appended to failed.
+    cursor = get_law_collection(db_name, collection_name).find(
+        changed_since_filter(since),
+        projection=law_projection(fields),
+        batch_size=batch_size or settings.MONGO_BATCH_SIZE
+    )
+    with cursor:
+        for law_data in cursor:
+            object_id = law_data.pop('_id', None)
+            try:
+                yield Law(**law_data)
+            except Exception as e:
+                logger.error(f"Failed to parse law data: {e}")
+                if failed is not None:
+                    failed.append(object_id)
+
+def iter_paragraphs_from_mongodb(
+    db_name: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[Tuple[Law, Paragraf]]:
+    # The server unwinds paragrafy, so even the longest law never has to be held in memory at once.
+    # The yielded Law carries metadata only and is shared by all paragraphs of that law.
+    projection = law_projection(fields) or {UPDATED_AT: False}
+    if fields is not None:
+        projection["paragrafy"] = True
+    pipeline = [
+        {"$match": changed_since_filter(since)},
+        {"$project": projection},
+        {"$unwind": "$paragrafy"}
+    ]
+    cursor = get_law_collection(db_name, collection_name).aggregate(
+        pipeline, batchSize=batch_size or settings.MONGO_BATCH_SIZE
+    )
+    law_object_id = None
+    law = None
+    with cursor:
+        for row in cursor:
+            object_id = row.pop('_id', None)
+            try:
+                paragraph = Paragraf(**row.pop('paragrafy'))
+                if object_id != law_object_id:
+                    # A law that fails to parse yields none of its rows, they must not inherit the previous law
+                    law_object_id, law = object_id, None
+                    law = Law(**row)
+                if law is None:
+                    continue
+                yield law, paragraph
+            except Exception as e:
+                logger.error(f"Failed to parse paragraph data: {e}")
+
+def fetch_laws_from_mongodb(db_name: Optional[str] = None, collection_name: Optional[str] = None) -> List[Law]:
+    # Loads the whole collection, prefer iter_laws_from_mongodb for anything corpus-sized
+    return list(iter_laws_from_mongodb(db_name, collection_name))
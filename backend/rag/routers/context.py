@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from rag.models.types import QueryRequest, QueryResponse, RelevantDocument
-from rag.services.langtail_service import enhance_query_with_langtail
-from rag.services.embedding_service import embed_query
-from rag.services.qdrant_service import search_qdrant
+from rag.models.types import BatchQueryRequest, BatchQueryResponse, QueryRequest, QueryResponse, RelevantDocument
+from rag.services.context_service import cancel_task, search_batch, search_with_enhancement
+from rag.services.embedding_service import aembed_query, query_embedding_cache
+from rag.services.langtail_service import enhanced_query_cache
+from rag.services.result_cache import context_cache, store_response, uses_context_cache
 from rag.config.settings import settings
 from rag.services.auth_service import get_current_username
+import asyncio
 import secrets
 
 router = APIRouter()
@@ -20,17 +22,52 @@ async def get_context(
 ):
     # The rest of your code remains the same
     try:
-        # Enhance the query using Langtail
-        enhanced_query = enhance_query_with_langtail(request.query)
+        # Paraphrases of a recent query reuse its documents and skip Qdrant, the raw query is embedded alongside Langtail
+        mode = request.mode or settings.SEARCH_MODE
+        embedding_task = asyncio.create_task(aembed_query(request.query)) if uses_context_cache(mode) else None
 
-        # Embed the enhanced query
-        embedding = embed_query(enhanced_query)
+        # Enhance the query using Langtail, embed it and search Qdrant for relevant documents
+        try:
+            documents, query_source = await search_with_enhancement(request.query, embedding_task, n, mode)
+        finally:
+            await cancel_task(embedding_task)
 
-        # Search Qdrant for relevant documents
-        documents = search_qdrant(embedding=embedding, top_n=n)
+        response = QueryResponse(relevant_docs=documents, query_source=query_source)
+        if embedding_task is not None and query_source != "cache":
+            store_response(embedding_task.result(), n, mode, response)
+        return response
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except RuntimeError as re:
+        raise HTTPException(status_code=500, detail=str(re))
 
-        return QueryResponse(relevant_docs=documents)
+@router.post("/context/batch", response_model=BatchQueryResponse)
+async def get_context_batch(
+    request: BatchQueryRequest = Body(...),
+    username: str = Depends(get_current_username)
+):
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(request.queries) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_QUERIES} queries are allowed per batch")
+    try:
+        results = await search_batch(
+            [item.query for item in request.queries],
+            [item.n or settings.DEFAULT_N for item in request.queries],
+            [item.mode or settings.SEARCH_MODE for item in request.queries]
+        )
+        return BatchQueryResponse(results=[
+            QueryResponse(relevant_docs=documents, query_source=query_source) for documents, query_source in results
+        ])
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except RuntimeError as re:
         raise HTTPException(status_code=500, detail=str(re))
+
+@router.get("/cache/stats")
+async def get_cache_stats(username: str = Depends(get_current_username)):
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "context": context_cache.stats(),
+        "enhanced_queries": {"entries": len(enhanced_query_cache)}
+    }
@@ -0,0 +1,117 @@
+# services/context_service.py
+import asyncio
+from typing import List, Optional, Tuple
+from rag.config.settings import settings
+from rag.logger import logger
+from rag.models.types import RelevantDocument
+from rag.services.embedding_service import aembed_queries, aembed_query
+from rag.services.keyword_service import fuse_rrf, search_keywords
+from rag.services.langtail_service import aenhance_query_with_langtail, cached_enhancement
+from rag.services.qdrant_service import asearch_qdrant, asearch_qdrant_batch
+from rag.services.result_cache import cached_response
+
+def candidate_depth(top_n: int, mode: str) -> int:
+    return top_n * settings.HYBRID_CANDIDATE_FACTOR if mode == "hybrid" else top_n
+
+async def retrieve(query: str, embedding: Optional[List[float]], top_n: int, mode: str) -> List[RelevantDocument]:
+    # The query is only embedded when dense search needs it and the caller has no embedding yet
+    if embedding is None and mode != "bm25":
+        embedding = await aembed_query(query)
+    if mode == "dense":
+        return await asearch_qdrant(embedding, top_n)
+    if mode == "bm25":
+        return await asyncio.to_thread(search_keywords, query, top_n)
+    depth = candidate_depth(top_n, mode)
+    dense, keyword = await asyncio.gather(
+        asearch_qdrant(embedding, depth),
+        asyncio.to_thread(search_keywords, query, depth)
+    )
+    return fuse_rrf([dense, keyword], top_n, k=settings.HYBRID_RRF_K)
+
+async def search_enhanced(enhanced_query: str, top_n: int, mode: str) -> List[RelevantDocument]:
+    return await retrieve(enhanced_query, None, top_n, mode)
+
+async def cancel_task(task: Optional[asyncio.Task]) -> None:
+    # Waits for the task to wind down and marks its outcome as retrieved, a cancel of the caller still propagates
+    if task is None:
+        return
+    task.cancel()
+    await asyncio.wait({task})
+    if not task.cancelled():
+        task.exception()
+
+async def search_with_enhancement(
+    query: str,
+    query_embedding: Optional[asyncio.Task],
+    top_n: int,
+    mode: str
+) -> Tuple[List[RelevantDocument], str]:
+    # query_embedding is the caller's running embedding of the raw query, used for the context cache.
+    # Langtail starts before it is awaited, so a cache miss does not wait for Voyage and Langtail in turn.
+    enhanced_query = cached_enhancement(query)
+    enhance_task = None
+    if enhanced_query is None:
+        enhance_task = asyncio.create_task(aenhance_query_with_langtail(query))
+        enhance_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    embedding = await query_embedding if query_embedding is not None else None
+    if embedding is not None:
+        cached = cached_response(embedding, top_n, mode)
+        if cached is not None:
+            # A running enhancement still lands in the Langtail cache
+            return cached.relevant_docs, "cache"
+
+    if enhance_task is None:
+        return await search_enhanced(enhanced_query, top_n, mode), "enhanced"
+    if not settings.LANGTAIL_RACE:
+        return await search_enhanced(await enhance_task, top_n, mode), "enhanced"
+
+    # Search with the raw query while Langtail runs, its result still lands in the cache if it is late
+    raw_task = asyncio.create_task(retrieve(query, embedding, top_n, mode))
+    try:
+        try:
+            enhanced_query = await asyncio.wait_for(asyncio.shield(enhance_task), settings.LANGTAIL_RACE_BUDGET_SECONDS)
+        except asyncio.TimeoutError:
+            logger.info(f"Langtail missed the {settings.LANGTAIL_RACE_BUDGET_SECONDS}s budget, using the raw query")
+            return await raw_task, "raw"
+        except (RuntimeError, ValueError) as e:
+            logger.warning(f"Langtail failed, using the raw query: {e}")
+            return await raw_task, "raw"
+    finally:
+        # Covers every other Langtail error and a cancelled request, the raw search must not outlive it
+        await cancel_task(raw_task)
+
+    return await search_enhanced(enhanced_query, top_n, mode), "enhanced"
+
+async def search_batch(queries: List[str], top_ns: List[int], modes: List[str]) -> List[Tuple[List[RelevantDocument], str]]:
+    # Langtail runs per query, embedding and search are one request each for the whole batch
+    enhanced = await asyncio.gather(*(aenhance_query_with_langtail(query) for query in queries), return_exceptions=True)
+    enhanced_queries = []
+    query_sources = []
+    for query, result in zip(queries, enhanced):
+        if isinstance(result, (RuntimeError, ValueError)):
+            # One failed enhancement must not fail the other queries in the batch
+            logger.warning(f"Langtail failed, using the raw query: {result}")
+            enhanced_queries.append(query)
+            query_sources.append("raw")
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        enhanced_queries.append(result)
+        query_sources.append("enhanced")
+    dense = [index for index, mode in enumerate(modes) if mode != "bm25"]
+    dense_results: List[List[RelevantDocument]] = [[] for _ in queries]
+    if dense:
+        embeddings = await aembed_queries([enhanced_queries[index] for index in dense])
+        searched = await asearch_qdrant_batch(embeddings, [candidate_depth(top_ns[index], modes[index]) for index in dense])
+        for index, documents in zip(dense, searched):
+            dense_results[index] = documents
+
+    results = []
+    for query, documents, top_n, mode in zip(enhanced_queries, dense_results, top_ns, modes):
+        if mode == "dense":
+            results.append(documents)
+            continue
+        keyword = await asyncio.to_thread(search_keywords, query, candidate_depth(top_n, mode))
+        results.append(keyword if mode == "bm25" else fuse_rrf([documents, keyword], top_n, k=settings.HYBRID_RRF_K))
+    return list(zip(results, query_sources))
@@ -1,9 +1,77 @@
 # services/embedding_service.py
-from typing import List
-from rag.voyage_embed.embed import get_embeddings
+import hashlib
+from typing import Dict, List
+from metrics import timed
+from caching import LRUCache
+from rag.cache import SqliteVectorStore, VectorCache
+from rag.config.settings import settings
+from rag.voyage_embed.embed import DEFAULT_MODEL, aget_embeddings, get_embeddings
 
+QUERY_INPUT_TYPE = "query"
+
+query_embedding_cache = VectorCache(
+    "query_embedding",
+    LRUCache(max_entries=settings.EMBEDDING_CACHE_SIZE, ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS),
+    SqliteVectorStore(
+        settings.EMBEDDING_CACHE_DB_PATH,
+        max_entries=settings.EMBEDDING_CACHE_DB_MAX_ENTRIES,
+        ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS
+    ) if settings.EMBEDDING_CACHE_DB_PATH else None
+)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+def query_cache_key(query: str, model: str = DEFAULT_MODEL, input_type: str = QUERY_INPUT_TYPE) -> str:
+    return hashlib.sha256(f"{model}\0{input_type}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+@timed("embedding")
 def embed_query(query: str) -> List[float]:
-    embeddings = get_embeddings([query], input_type="query")
+    cache_key = query_cache_key(query)
+    cached = query_embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    embeddings = get_embeddings([query], input_type=QUERY_INPUT_TYPE)
     if not embeddings:
         raise RuntimeError("Failed to obtain embeddings for the query")
-    return embeddings[0]
\ No newline at end of file
+    query_embedding_cache.set(cache_key, embeddings[0])
+    return embeddings[0]
+
+@timed("embedding")
+async def aembed_query(query: str) -> List[float]:
+    cache_key = query_cache_key(query)
+    cached = query_embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    embeddings = await aget_embeddings([query], input_type=QUERY_INPUT_TYPE)
+    if not embeddings:
+        raise RuntimeError("Failed to obtain embeddings for the query")
+    query_embedding_cache.set(cache_key, embeddings[0])
+    return embeddings[0]
+
+@timed("embedding")
+async def aembed_queries(queries: List[str]) -> List[List[float]]:
+    embeddings: Dict[str, List[float]] = {}
+    # cache key -> query, so repeated or differently spaced queries are embedded once
+    missing: Dict[str, str] = {}
+    for query in queries:
+        cache_key = query_cache_key(query)
+        if cache_key in embeddings or cache_key in missing:
+            continue
+        cached = query_embedding_cache.get(cache_key)
+        if cached is not None:
+            embeddings[cache_key] = cached
+        else:
+            missing[cache_key] = query
+
+    # Everything not cached goes out in a single Voyage request
+    if missing:
+        fetched = await aget_embeddings(list(missing.values()), input_type=QUERY_INPUT_TYPE)
+        if len(fetched) != len(missing):
+            raise RuntimeError("Failed to obtain embeddings for the queries")
+        for cache_key, embedding in zip(missing, fetched):
+            embeddings[cache_key] = embedding
+            query_embedding_cache.set(cache_key, embedding)
+    return [embeddings[query_cache_key(query)] for query in queries]
@@ -0,0 +1,30 @@
+# services/keyword_service.py
+from typing import Dict, List, Optional, Tuple
+from metrics import timed
+from rag.config.settings import settings
+from rag.index import BM25Index
+from rag.models.types import RelevantDocument
+from rag.services.qdrant_service import document_key, hydrate_results, search_depth
+
+keyword_index: Optional[BM25Index] = BM25Index(
+    settings.BM25_INDEX_DIR,
+    title_weight=settings.BM25_TITLE_WEIGHT
+) if settings.BM25_INDEX_DIR else None
+
+@timed("bm25")
+def search_keywords(query: str, top_n: int) -> List[RelevantDocument]:
+    if keyword_index is None or not keyword_index.available:
+        raise RuntimeError("Keyword search is not available, build the BM25 index first")
+    results = keyword_index.search(query, search_depth(top_n))
+    return hydrate_results([(point_id, payload) for _, point_id, payload in results], top_n)
+
+def fuse_rrf(rankings: List[List[RelevantDocument]], top_n: int, k: int = 60) -> List[RelevantDocument]:
+    scores: Dict[Tuple[str, str, str], float] = {}
+    documents: Dict[Tuple[str, str, str], RelevantDocument] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:top_n]]
@@ -1,7 +1,27 @@
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional, Tuple
+from metrics import llm_tokens, timed
+from caching import LRUCache
+from rag.clients import async_clients
 from rag.config.settings import settings
 
-def enhance_query_with_langtail(query: str) -> str:
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=settings.LANGTAIL_POOL_SIZE))
+
+enhanced_query_cache: LRUCache[str] = LRUCache(
+    max_entries=settings.LANGTAIL_CACHE_SIZE,
+    ttl_seconds=settings.LANGTAIL_CACHE_TTL_SECONDS
+)
+
+def enhancement_cache_key(query: str) -> str:
+    return " ".join(query.split())
+
+def cached_enhancement(query: str) -> Optional[str]:
+    return enhanced_query_cache.get(enhancement_cache_key(query))
+
+def langtail_request(query: str) -> Tuple[str, dict, dict]:
     url = f"https://api.langtail.com/{settings.LANGTAIL_WORKSPACE}/{settings.LANGTAIL_PROJECT}/{settings.LANGTAIL_PROMPT}/{settings.LANGTAIL_ENVIRONMENT}"
     headers = {
         "X-API-Key": settings.LANGTAIL_API_KEY,
@@ -11,15 +31,57 @@ def enhance_query_with_langtail(query: str) -> str:
         "variables": {"query": query},
         "stream": False,
     }
+    return url, headers, payload
+
+def parse_langtail_response(data: dict) -> str:
+    usage = data.get('usage') or {}
+    llm_tokens.inc(usage.get('prompt_tokens', 0), model="langtail", kind="prompt")
+    llm_tokens.inc(usage.get('completion_tokens', 0), model="langtail", kind="completion")
+    try:
+        # Extract the assistant's reply
+        return data['choices'][0]['message']['content']
+    except (KeyError, IndexError):
+        raise ValueError("Unexpected response format from Langtail")
+
+@timed("langtail")
+def enhance_query_with_langtail(query: str) -> str:
+    cache_key = enhancement_cache_key(query)
+    cached = enhanced_query_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
+    url, headers, payload = langtail_request(query)
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = session.post(
+            url,
+            json=payload,
+            headers=headers,
+            timeout=(settings.LANGTAIL_CONNECT_TIMEOUT_SECONDS, settings.LANGTAIL_TIMEOUT_SECONDS)
+        )
         response.raise_for_status()
         data = response.json()
-        # Extract the assistant's reply
-        enhanced_query = data['choices'][0]['message']['content']
-        return enhanced_query
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"Failed to enhance query with Langtail: {e}")
-    except KeyError:
-        raise ValueError("Unexpected response format from Langtail")
\ No newline at end of file
+
+    enhanced_query = parse_langtail_response(data)
+    enhanced_query_cache.set(cache_key, enhanced_query)
+    return enhanced_query
+
+@timed("langtail")
+async def aenhance_query_with_langtail(query: str) -> str:
+    cache_key = enhancement_cache_key(query)
+    cached = enhanced_query_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    url, headers, payload = langtail_request(query)
+    try:
+        response = await async_clients.langtail.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Failed to enhance query with Langtail: {e}")
+
+    enhanced_query = parse_langtail_response(data)
+    enhanced_query_cache.set(cache_key, enhanced_query)
+    return enhanced_query
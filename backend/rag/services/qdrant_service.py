@@ -1,31 +1,121 @@
 # services/qdrant_service.py
-from qdrant_client.http.models import Filter, SearchRequest, PointStruct
-from typing import List
+import asyncio
+from qdrant_client.http.models import SearchRequest
+from typing import List, Optional, Tuple
+from metrics import timed
+from rag.clients import async_clients
+from rag.index import DocumentStore, LocalVectorIndex
 from rag.qdrant.qdrant import qdrant_client
 from rag.config.settings import settings
+from rag.logger import logger
 from rag.models.types import RelevantDocument
 
+local_index: Optional[LocalVectorIndex] = LocalVectorIndex(settings.LOCAL_INDEX_DIR) if settings.LOCAL_INDEX_DIR else None
+document_store: Optional[DocumentStore] = DocumentStore(settings.DOCUMENT_STORE_DIR) if settings.DOCUMENT_STORE_DIR else None
+
+def use_local_index() -> bool:
+    return local_index is not None and local_index.available
+
+def search_depth(top_n: int) -> int:
+    return top_n + settings.SEARCH_CHUNK_HEADROOM
+
+def document_key(document: RelevantDocument) -> Tuple[str, str, str]:
+    return document.law_id, document.law_year, document.paragraph_cislo
+
+def unique_documents(documents: List[RelevantDocument], top_n: int) -> List[RelevantDocument]:
+    # Chunks of one long paragraph hydrate to the same document, only the best ranked one is kept
+    seen = set()
+    unique = []
+    for document in documents:
+        key = document_key(document)
+        if key not in seen:
+            seen.add(key)
+            unique.append(document)
+    return unique[:top_n]
+
+def hydrate_results(results, top_n: int) -> List[RelevantDocument]:
+    documents = [hydrate_document(point_id, payload) for point_id, payload in results]
+    return unique_documents([document for document in documents if document is not None], top_n)
+
+def search_local_index(embedding: List[float], top_n: int) -> List[RelevantDocument]:
+    results = local_index.search(embedding, search_depth(top_n))
+    return hydrate_results([(point_id, payload) for _, point_id, payload in results], top_n)
+
+def to_relevant_document(payload: dict) -> RelevantDocument:
+    return RelevantDocument(
+        law_nazev=payload.get('law_nazev'),
+        law_id=payload.get('law_id'),
+        law_year=payload.get('law_year'),
+        law_category=payload.get('law_category'),
+        law_date=payload.get('law_date'),
+        law_staleURL=payload.get('law_staleURL'),
+        paragraph_cislo=payload.get('paragraph_cislo'),
+        paragraph_zneni=payload.get('paragraph_zneni')
+    )
+
+def full_payload(point_id, payload: Optional[dict]) -> Optional[dict]:
+    # Slim payloads only carry identifiers, text and law metadata come from the document store
+    if document_store is not None:
+        stored = document_store.payload(point_id)
+        if stored is not None:
+            return stored
+    if not payload or payload.get('paragraph_zneni') is None:
+        return None
+    return payload
+
+def hydrate_document(point_id, payload: Optional[dict]) -> Optional[RelevantDocument]:
+    # A hit the document store does not cover is dropped, one stale point must not fail the whole search
+    payload = full_payload(point_id, payload)
+    if payload is None:
+        logger.warning(f"No document found for point {point_id}, dropping it from the results")
+        return None
+    return to_relevant_document(payload)
+
+@timed("qdrant")
 def search_qdrant(embedding: List[float], top_n: int) -> List[RelevantDocument]:
     try:
+        if use_local_index():
+            return search_local_index(embedding, top_n)
         results = qdrant_client.search(
             collection_name=settings.QDRANT_COLLECTION_NAME,
             query_vector=embedding,
-            limit=top_n
+            limit=search_depth(top_n)
         )
-        documents = []
-        for result in results:
-            payload = result.payload
-            document = RelevantDocument(
-                law_nazev=payload.get('law_nazev'),
-                law_id=payload.get('law_id'),
-                law_year=payload.get('law_year'),
-                law_category=payload.get('law_category'),
-                law_date=payload.get('law_date'),
-                law_staleURL=payload.get('law_staleURL'),
-                paragraph_cislo=payload.get('paragraph_cislo'),
-                paragraph_zneni=payload.get('paragraph_zneni')
+        return hydrate_results([(result.id, result.payload) for result in results], top_n)
+    except Exception as e:
+        raise RuntimeError(f"Failed to search Qdrant: {e}")
+
+@timed("qdrant")
+async def asearch_qdrant(embedding: List[float], top_n: int) -> List[RelevantDocument]:
+    try:
+        if use_local_index():
+            return await asyncio.to_thread(search_local_index, embedding, top_n)
+        results = await async_clients.qdrant.search(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            query_vector=embedding,
+            limit=search_depth(top_n)
+        )
+        return hydrate_results([(result.id, result.payload) for result in results], top_n)
+    except Exception as e:
+        raise RuntimeError(f"Failed to search Qdrant: {e}")
+
+@timed("qdrant")
+async def asearch_qdrant_batch(embeddings: List[List[float]], top_ns: List[int]) -> List[List[RelevantDocument]]:
+    try:
+        if use_local_index():
+            return await asyncio.to_thread(
+                lambda: [search_local_index(embedding, top_n) for embedding, top_n in zip(embeddings, top_ns)]
             )
-            documents.append(document)
-        return documents
+        results = await async_clients.qdrant.search_batch(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            requests=[
+                SearchRequest(vector=embedding, limit=search_depth(top_n), with_payload=True)
+                for embedding, top_n in zip(embeddings, top_ns)
+            ]
+        )
+        return [
+            hydrate_results([(point.id, point.payload) for point in points], top_n)
+            for points, top_n in zip(results, top_ns)
+        ]
     except Exception as e:
-        raise RuntimeError(f"Failed to search Qdrant: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Failed to search Qdrant: {e}")
@@ -0,0 +1,26 @@
+# services/result_cache.py
+from typing import List, Optional
+from rag.cache import SemanticCache
+from rag.config.settings import settings
+from rag.models.types import QueryResponse
+
+context_cache = SemanticCache(
+    "context",
+    max_entries=settings.SEMANTIC_CACHE_SIZE,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    marker_path=settings.QDRANT_SEED_MARKER_PATH
+)
+
+def uses_context_cache(mode: str) -> bool:
+    # Keyword-only searches never embed the query, so they cannot be matched semantically
+    return settings.SEMANTIC_CACHE_SIZE > 0 and mode != "bm25"
+
+def cached_response(query_embedding: List[float], top_n: int, mode: str) -> Optional[QueryResponse]:
+    # Entries searched with a smaller n or another mode cannot answer the request
+    cached = context_cache.get(query_embedding, accept=lambda entry: entry[0] >= top_n and entry[1] == mode)
+    if cached is None:
+        return None
+    return QueryResponse(relevant_docs=cached[2].relevant_docs[:top_n], query_source="cache")
+
+def store_response(query_embedding: List[float], top_n: int, mode: str, response: QueryResponse) -> None:
+    context_cache.set(query_embedding, (top_n, mode, response))
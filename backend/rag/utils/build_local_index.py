@@ -0,0 +1,60 @@
+from rag.logger import logger
+from rag.qdrant import qdrant_client
+from rag.config import settings
+from rag.index import BM25IndexWriter, DocumentStore, LocalIndexWriter
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def build_local_indexes(collection_name: str) -> None:
+    logger.info(f"Building local indexes from Qdrant collection '{collection_name}'")
+    writer = LocalIndexWriter(settings.LOCAL_INDEX_DIR, settings.LOCAL_INDEX_DTYPE) if settings.LOCAL_INDEX_DIR else None
+    keyword_writer = BM25IndexWriter(settings.BM25_INDEX_DIR) if settings.BM25_INDEX_DIR else None
+    # Slim payloads have no text to index, it is read back from the document store
+    document_store = DocumentStore(settings.DOCUMENT_STORE_DIR) if settings.DOCUMENT_STORE_DIR else None
+    offset = None
+    count = 0
+    try:
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=writer is not None
+            )
+            if writer:
+                writer.add([p.id for p in points], [p.vector for p in points], [p.payload for p in points])
+            if keyword_writer:
+                stored_payloads = [p.payload for p in points]
+                payloads = [
+                    (document_store.payload(p.id) if document_store else None) or p.payload
+                    for p in points
+                ]
+                keyword_writer.add([p.id for p in points], payloads, stored_payloads)
+            count += len(points)
+            if offset is None:
+                break
+    except Exception:
+        if writer:
+            writer.abort()
+        if keyword_writer:
+            keyword_writer.abort()
+        raise
+
+    if writer:
+        writer.commit()
+        logger.info(f"Local index with {count} points written to '{settings.LOCAL_INDEX_DIR}'")
+    if keyword_writer:
+        keyword_writer.commit()
+        logger.info(f"BM25 index with {count} points written to '{settings.BM25_INDEX_DIR}'")
+
+
+def main() -> None:
+    if not settings.LOCAL_INDEX_DIR and not settings.BM25_INDEX_DIR:
+        logger.error("Neither LOCAL_INDEX_DIR nor BM25_INDEX_DIR is set")
+        return
+    build_local_indexes(settings.QDRANT_COLLECTION_NAME)
+
+if __name__ == "__main__":
+    main()
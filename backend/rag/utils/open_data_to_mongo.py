@@ -1,5 +1,6 @@
 import os
 import re
+from datetime import datetime, timezone
 from typing import List, Optional
 from urllib.parse import quote
 
@@ -77,6 +78,8 @@ def save_law_to_mongodb(law: Law, db_name='law_database_mvp', collection_name='M
     db = client[db_name]
     collection = db[collection_name]
     law_doc = law.dict()
+    # Incremental readers pick up laws changed since their last run by this timestamp
+    law_doc['updated_at'] = datetime.now(timezone.utc)
     collection.insert_one(law_doc)
     print(f"Law {law.year}/{law.id} saved to collection '{collection_name}'.")
 
@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+from rag.logger import logger
+
+DONE = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class RateLimiter:
+    # Token buckets for requests and tokens per minute, a limit of 0 disables that bucket
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens: int = 0) -> None:
+        while True:
+            with self._lock:
+                self._refill()
+                # A request larger than the whole bucket waits for a full bucket instead of forever
+                tokens_needed = min(tokens, self.tokens_per_minute)
+                has_request = not self.requests_per_minute or self._requests >= 1
+                has_tokens = not self.tokens_per_minute or self._tokens >= tokens_needed
+                if has_request and has_tokens:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens_needed
+                    return
+                waits = []
+                if not has_request:
+                    waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+                if not has_tokens:
+                    waits.append((tokens_needed - self._tokens) * 60 / self.tokens_per_minute)
+            time.sleep(max(waits))
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, busy: float = 0.0, blocked: float = 0.0, items: int = 0) -> None:
+        with self._lock:
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            self.items += items
+
+    def report(self, wall_seconds: float) -> str:
+        capacity = max(wall_seconds * self.workers, 1e-9)
+        return (f"{self.name} (workers={self.workers}): {self.items} items, "
+                f"busy {self.busy_seconds / capacity:.0%}, "
+                f"blocked on downstream {self.blocked_seconds / capacity:.0%}")
+
+
+class Pipeline:
+    def __init__(self):
+        self.stats: List[StageStats] = []
+        self.failed = threading.Event()
+        self.errors: List[BaseException] = []
+        self._threads: List[threading.Thread] = []
+        self.started = time.monotonic()
+
+    def put(self, target: queue.Queue, item: Any, stats: Optional[StageStats] = None) -> None:
+        # Bounded queues apply backpressure, the timeout only lets a failed pipeline unblock producers
+        started = time.monotonic()
+        while True:
+            if self.failed.is_set():
+                raise PipelineAborted()
+            try:
+                target.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        if stats is not None:
+            stats.record(blocked=time.monotonic() - started)
+
+    def get(self, source: queue.Queue) -> Any:
+        while True:
+            if self.failed.is_set():
+                raise PipelineAborted()
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def fail(self, error: BaseException) -> None:
+        self.errors.append(error)
+        self.failed.set()
+
+    def source_stats(self, name: str) -> StageStats:
+        stats = StageStats(name, 1)
+        self.stats.append(stats)
+        return stats
+
+    def stage(
+        self,
+        name: str,
+        work: Callable[[Any], Any],
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue],
+        workers: int
+    ) -> None:
+        # work returns the item for the next stage, or None to drop it
+        stats = StageStats(name, workers)
+        self.stats.append(stats)
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def run() -> None:
+            try:
+                while True:
+                    item = self.get(inbox)
+                    if item is DONE:
+                        # Let the sibling workers see the end of the stream as well
+                        self.put(inbox, DONE)
+                        break
+                    started = time.monotonic()
+                    result = work(item)
+                    stats.record(busy=time.monotonic() - started, items=1)
+                    if outbox is not None and result is not None:
+                        self.put(outbox, result, stats)
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and outbox is not None:
+                    self.put(outbox, DONE)
+            except PipelineAborted:
+                pass
+            except BaseException as e:
+                logger.error(f"Stage '{name}' failed: {e}")
+                self.fail(e)
+
+        for index in range(workers):
+            thread = threading.Thread(target=run, name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self) -> float:
+        for thread in self._threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+        return time.monotonic() - self.started
+
+    def report(self, wall_seconds: float) -> None:
+        for stats in self.stats:
+            logger.info(stats.report(wall_seconds))
@@ -1,23 +1,249 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
 from rag.logger import logger
-from rag.mongo import fetch_laws_from_mongodb
+from rag.mongo import close_mongo_clients, iter_laws_from_mongodb
 from rag.qdrant import qdrant_client
-from qdrant_client.models import PointStruct, Distance, VectorParams
+from qdrant_client.models import Distance, Filter, IsEmptyCondition, PayloadField, PayloadSchemaType, PointIdsList, PointStruct, UpdateStatus, VectorParams
 from tqdm import tqdm
 from dotenv import load_dotenv
-from rag.voyage_embed import get_embeddings
-from rag.models import Law, Paragraf
+from rag.voyage_embed import get_embeddings, get_embeddings_batched, split_paragraph
+from rag.cache import mark_collection_seeded
+from rag.index import STORED_FIELDS, DocumentStoreWriter
+from rag.config import settings
+from rag.models import Law
+from rag.utils.build_local_index import build_local_indexes
+from rag.utils.pipeline import DONE, Pipeline, RateLimiter
 load_dotenv()
 
+POINT_NAMESPACE = uuid.UUID("5b0c3f3e-6f51-4c1e-9a57-2f1d0c6a7e21")
 
-def main() -> None:
-    # Fetch laws from MongoDB
-    logger.info("Fetching laws from MongoDB")
-    laws: list[Law] = fetch_laws_from_mongodb()
 
-    if not laws:
-        logger.error("No laws found in MongoDB")
-        return
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id_for(law: Law, cislo: str, chunk_index: int, text_hash: str) -> str:
+    # Same law, paragraph and text always map to the same point, so unchanged points are never re-embedded
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{law.id}:{law.year}:{cislo}:{chunk_index}:{text_hash}"))
+
+
+def law_key(law: Law) -> str:
+    return f"{law.id}:{law.year}"
+
+
+class SeedCheckpoint:
+    # Laws whose points are all in Qdrant, keyed by law and mapped to a hash of their point IDs
+    def __init__(self, path: str, collection_name: str):
+        self.path = path
+        self.collection_name = collection_name
+        self.laws: dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("collection") == collection_name:
+                self.laws = data.get("laws", {})
+                logger.info(f"Resuming from checkpoint with {len(self.laws)} completed laws")
+
+    def is_done(self, key: str, ids_hash: str) -> bool:
+        return self.laws.get(key) == ids_hash
+
+    def mark_done(self, completed: list[tuple[str, str]]) -> None:
+        if not completed:
+            return
+        self.laws.update(completed)
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".part", "w") as f:
+            json.dump({"collection": self.collection_name, "laws": self.laws}, f)
+        os.replace(self.path + ".part", self.path)
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SeedBatch:
+    def __init__(self):
+        self.point_ids: list[str] = []
+        self.texts: list[str] = []
+        self.token_counts: list[int] = []
+        self.payloads: list[dict[str, str | None]] = []
+        self.law_keys: set[str] = set()
+        self.embeddings: list[list[float]] = []
+
+    @property
+    def tokens(self) -> int:
+        return sum(self.token_counts)
+
+    def fits(self, tokens: int) -> bool:
+        if not self.texts:
+            return True
+        return (self.tokens + tokens <= settings.EMBEDDING_BATCH_MAX_TOKENS
+                and len(self.texts) < settings.EMBEDDING_BATCH_MAX_TEXTS)
+
+    def add(self, point_id: str, text: str, tokens: int, payload: dict) -> None:
+        self.point_ids.append(point_id)
+        self.texts.append(text)
+        self.token_counts.append(tokens)
+        self.payloads.append(payload)
+
+
+class LawProgress:
+    # A law is checkpointed once it has been fully read and every batch holding its points is upserted
+    def __init__(self, checkpoint: SeedCheckpoint):
+        self.checkpoint = checkpoint
+        self._outstanding: dict[str, int] = {}
+        self._closed: dict[str, str] = {}
+        self.upserted_points = 0
+        self._lock = threading.Lock()
+
+    def add_to_batch(self, key: str, batch: SeedBatch) -> None:
+        with self._lock:
+            if key not in batch.law_keys:
+                batch.law_keys.add(key)
+                self._outstanding[key] = self._outstanding.get(key, 0) + 1
+
+    def close_law(self, key: str, ids_hash: str) -> None:
+        with self._lock:
+            self._closed[key] = ids_hash
+            self._flush([key])
+
+    def batch_upserted(self, batch: SeedBatch) -> None:
+        with self._lock:
+            self.upserted_points += len(batch.point_ids)
+            for key in batch.law_keys:
+                self._outstanding[key] -= 1
+            self._flush(batch.law_keys)
+
+    def _flush(self, keys) -> None:
+        completed = [
+            (key, self._closed.pop(key)) for key in list(keys)
+            if key in self._closed and not self._outstanding.get(key)
+        ]
+        self.checkpoint.mark_done(completed)
+
+
+def embed_batch(batch: SeedBatch, limiter: RateLimiter) -> SeedBatch:
+    limiter.acquire(batch.tokens)
+    embeddings = get_embeddings_batched(batch.texts, token_counts=batch.token_counts)
+    if len(embeddings) != len(batch.texts):
+        # Failing the pipeline keeps the checkpoint, a dropped batch would leave its laws marked as seeded
+        raise RuntimeError(f"Got {len(embeddings)} embeddings for {len(batch.texts)} texts")
+    batch.embeddings = embeddings
+    return batch
+
+
+def upsert_batch(collection_name: str, batch: SeedBatch, progress: LawProgress) -> None:
+    # Build point structs
+    batch_points = [
+        PointStruct(
+            id=pid,
+            vector=embedding,
+            payload=pl
+        ) for pid, embedding, pl in zip(batch.point_ids, batch.embeddings, batch.payloads)
+    ]
+    # Upload to Qdrant, waiting keeps the checkpoint honest and only blocks this background stage
+    result = qdrant_client.upsert(
+        collection_name=collection_name,
+        wait=True,
+        points=batch_points
+    )
+    if result.status != UpdateStatus.COMPLETED:
+        raise RuntimeError(f"Upsert of {len(batch_points)} points finished with status '{result.status}'")
+    progress.batch_upserted(batch)
+
+
+def law_points(law: Law, document_writer: DocumentStoreWriter | None) -> list[tuple[str, str, int, dict]]:
+    law_row = document_writer.add_law(law) if document_writer else None
+    points = []
+    for para in law.paragrafy:
+        paragraph_text = para.zneni
+        if not paragraph_text.strip():
+            continue  # Skip empty paragraphs
+
+        # Paragraphs over the chunk limit become overlapping chunks, one point each.
+        # Every chunk carries the whole paragraph, so a hit on any of them returns the paragraph.
+        paragraph_row = document_writer.add_paragraph(law_row, para.cislo, paragraph_text) if document_writer else None
+        chunks = split_paragraph(paragraph_text)
+        for chunk_index, (chunk_text, tokens) in enumerate(chunks):
+            text_hash = content_hash(chunk_text)
+            point_id = point_id_for(law, para.cislo, chunk_index, text_hash)
+            # Prepare payload with all the info
+            payload = {
+                "law_nazev": law.nazev,
+                "law_id": law.id,
+                "law_year": law.year,
+                "law_category": law.category,
+                "law_date": law.date,
+                "law_staleURL": law.staleURL,
+                "paragraph_cislo": para.cislo,
+                "paragraph_zneni": paragraph_text,
+                "content_hash": text_hash,
+            }
+            if document_writer:
+                # Text and law metadata move to the document store, see slim_points
+                document_writer.add_point(point_id, paragraph_row)
+            if len(chunks) > 1:
+                payload["paragraph_chunk"] = chunk_index
+            points.append((point_id, chunk_text, tokens, payload))
+    return points
+
+
+def existing_point_ids(collection_name: str, point_ids: list[str]) -> set[str]:
+    if not point_ids:
+        return set()
+    points = qdrant_client.retrieve(
+        collection_name=collection_name,
+        ids=point_ids,
+        with_payload=False,
+        with_vectors=False
+    )
+    return {str(point.id) for point in points}
+
 
+def slim_points(collection_name: str) -> None:
+    # Points are upserted with full payloads so they can be served before the new document store is published,
+    # the stored fields are only dropped once it is
+    qdrant_client.delete_payload(
+        collection_name=collection_name,
+        keys=list(STORED_FIELDS),
+        points=Filter(must_not=[IsEmptyCondition(is_empty=PayloadField(key="paragraph_zneni"))]),
+        wait=True
+    )
+
+
+def delete_stale_points(collection_name: str, seen_ids: set[str]) -> int:
+    stale: list = []
+    offset = None
+    while True:
+        points, offset = qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False
+        )
+        stale.extend(point.id for point in points if str(point.id) not in seen_ids)
+        if offset is None:
+            break
+    for start in range(0, len(stale), 1000):
+        qdrant_client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=stale[start:start + 1000]),
+            wait=True
+        )
+    return len(stale)
+
+
+def main() -> None:
     # Name of the collection
     collection_name = "LAWS_MVP"
 
@@ -39,80 +265,113 @@ def main() -> None:
             collection_name=collection_name,
             vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
         )
+        # Slim payloads keep these fields so searches can still filter on them
+        for field_name in ("law_id", "law_year", "law_category"):
+            qdrant_client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
 
-    point_id: int= 0  # Unique ID for each point
-    batch_size: int= 100  # Adjust as needed
-    texts_to_embed: list[str] = []
-    point_ids: list[int] = []
-    payloads: ist[dict[str, str | None]] = []
+    # The document store is cheap to rebuild and always covers every point, even skipped ones
+    document_writer = DocumentStoreWriter(settings.DOCUMENT_STORE_DIR) if settings.DOCUMENT_STORE_DIR else None
+    checkpoint = SeedCheckpoint(settings.SEED_CHECKPOINT_PATH, collection_name)
+    progress = LawProgress(checkpoint)
+    limiter = RateLimiter(settings.SEED_EMBED_REQUESTS_PER_MINUTE, settings.SEED_EMBED_TOKENS_PER_MINUTE)
 
-    for law in tqdm(laws, desc="Processing laws"):
-        for para in law.paragrafy:
-            paragraph_text = para.zneni
-            if not paragraph_text.strip():
-                continue  # Skip empty paragraphs
+    # Reading laws, embedding and upserting overlap, bounded queues keep memory flat
+    pipeline = Pipeline()
+    embed_queue: queue.Queue = queue.Queue(maxsize=settings.SEED_QUEUE_SIZE)
+    upsert_queue: queue.Queue = queue.Queue(maxsize=settings.SEED_QUEUE_SIZE)
+    pipeline.stage("embed", lambda batch: embed_batch(batch, limiter), embed_queue, upsert_queue, settings.SEED_EMBED_CONCURRENCY)
+    pipeline.stage("upsert", lambda batch: upsert_batch(collection_name, batch, progress), upsert_queue, None, settings.SEED_UPSERT_CONCURRENCY)
+    read_stats = pipeline.source_stats("read")
 
-            # Prepare the text for embedding
-            texts_to_embed.append(paragraph_text)
-            point_ids.append(point_id)
+    seen_ids: set[str] = set()
+    unparsed: list = []
+    batch = SeedBatch()
+    law_count = 0
+    skipped = 0
+    tokens = 0
 
-            # Prepare payload with all the info
-            payload = {
-                "law_nazev": law.nazev,
-                "law_id": law.id,
-                "law_year": law.year,
-                "law_category": law.category,
-                "law_date": law.date,
-                "law_staleURL": law.staleURL,
-                "paragraph_cislo": para.cislo,
-                "paragraph_zneni": para.zneni,
-            }
-            payloads.append(payload)
-            point_id += 1
-
-            # If batch size is reached, process embeddings and upload
-            if len(texts_to_embed) >= batch_size:
-                embeddings = get_embeddings(texts_to_embed)
-                if len(embeddings) != len(texts_to_embed):
-                    logger.error("Number of embeddings does not match number of texts")
-                else:
-                    # Build point structs
-                    batch_points = [
-                        PointStruct(
-                            id=pid,
-                            vector=embedding,
-                            payload=pl
-                        ) for pid, embedding, pl in zip(point_ids, embeddings, payloads)
-                    ]
-                    # Upload to Qdrant
-                    qdrant_client.upsert(
-                        collection_name=collection_name,
-                        wait=True,
-                        points=batch_points
-                    )
-                # Reset lists
-                texts_to_embed = []
-                point_ids = []
-                payloads = []
-
-    # Process any remaining texts
-    if texts_to_embed:
-        embeddings = get_embeddings(texts_to_embed)
-        if len(embeddings) != len(texts_to_embed):
-            logger.error("Number of embeddings does not match number of texts")
-        else:
-            batch_points = [
-                PointStruct(
-                    id=pid,
-                    vector=embedding,
-                    payload=pl
-                ) for pid, embedding, pl in zip(point_ids, embeddings, payloads)
-            ]
-            qdrant_client.upsert(
-                collection_name=collection_name,
-                wait=True,
-                points=batch_points
-            )
+    logger.info("Streaming laws from MongoDB")
+    try:
+        laws = iter(tqdm(iter_laws_from_mongodb(failed=unparsed), desc="Processing laws"))
+        while True:
+            started = time.monotonic()
+            law = next(laws, None)
+            if law is None:
+                read_stats.record(busy=time.monotonic() - started)
+                break
+            law_count += 1
+            points = law_points(law, document_writer)
+            law_ids = [point[0] for point in points]
+            seen_ids.update(law_ids)
+            key = law_key(law)
+            ids_hash = content_hash("\n".join(law_ids))
+            if checkpoint.is_done(key, ids_hash):
+                skipped += len(points)
+                read_stats.record(busy=time.monotonic() - started, items=1)
+                continue
+
+            existing = existing_point_ids(collection_name, law_ids)
+            read_stats.record(busy=time.monotonic() - started, items=1)
+            for point_id, chunk_text, point_tokens, payload in points:
+                if point_id in existing:
+                    skipped += 1
+                    continue
+                # Hand the batch over once the next text would push the request over the token budget
+                if not batch.fits(point_tokens):
+                    pipeline.put(embed_queue, batch, read_stats)
+                    batch = SeedBatch()
+                progress.add_to_batch(key, batch)
+                batch.add(point_id, chunk_text, point_tokens, payload)
+                tokens += point_tokens
+            progress.close_law(key, ids_hash)
+
+        if batch.texts:
+            pipeline.put(embed_queue, batch, read_stats)
+        pipeline.put(embed_queue, DONE, read_stats)
+    except BaseException as e:
+        pipeline.fail(e)
+    finally:
+        close_mongo_clients()
+    wall_seconds = pipeline.join()
+
+    if not law_count:
+        # Nothing was read, deleting stale points now would empty the collection
+        logger.error("No laws found in MongoDB")
+        return
+
+    uploaded = progress.upserted_points
+    logger.info(
+        f"Uploaded {uploaded} points ({tokens} tokens) from {law_count} laws in {wall_seconds:.1f}s, "
+        f"{uploaded / max(wall_seconds, 1e-9):.1f} points/s, {tokens / max(wall_seconds, 1e-9):.0f} tokens/s"
+    )
+    pipeline.report(wall_seconds)
+
+    if unparsed:
+        # Points of a law that could not be read were never seen, the stale pass would delete all of them
+        # and the new document store would not cover them. The checkpoint keeps the rerun cheap.
+        if document_writer:
+            document_writer.abort()
+        raise RuntimeError(f"{len(unparsed)} laws could not be parsed, fix them in MongoDB and seed again: {unparsed[:10]}")
+
+    # Points of changed or removed paragraphs are no longer produced by any law
+    deleted = delete_stale_points(collection_name, seen_ids)
+    logger.info(f"Skipped {skipped} unchanged points, deleted {deleted} stale points")
+
+    if document_writer:
+        document_writer.commit()
+        logger.info(f"Document store written to '{settings.DOCUMENT_STORE_DIR}'")
+        slim_points(collection_name)
+    if settings.LOCAL_INDEX_DIR or settings.BM25_INDEX_DIR:
+        build_local_indexes(collection_name)
+
+    checkpoint.clear()
+    # Running API workers drop their semantic result caches when they see the new marker
+    mark_collection_seeded(settings.QDRANT_SEED_MARKER_PATH)
+    logger.info("Seeding finished")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1 +1,2 @@
 from .embed import *
+from .batching import *
@@ -0,0 +1,99 @@
+# voyage_embed/batching.py
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from rag.config import settings
+from rag.logger import logger
+from rag.voyage_embed.embed import DEFAULT_MODEL, get_embeddings
+
+TOKENIZER_MODEL = "gpt-4o"
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # A missing tokenizer is remembered too, so its BPE files are not fetched again for every text
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except Exception as e:
+        logger.warning(f"tiktoken is unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    # tiktoken only approximates Voyage's tokenizer, the configured budgets leave headroom for that
+    encoding = _encoding()
+    if encoding is None:
+        return [len(text) // 3 + 1 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def count_tokens(text: str) -> int:
+    return count_tokens_batch([text])[0]
+
+
+def split_into_chunks(text: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    # Windows are cut at word boundaries and repeat about overlap_tokens of the previous window
+    words = text.split()
+    if not words:
+        return []
+    word_tokens = count_tokens_batch([" " + word for word in words])
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = start
+        tokens = 0
+        while end < len(words) and (end == start or tokens + word_tokens[end] <= max_tokens):
+            tokens += word_tokens[end]
+            end += 1
+        chunks.append(" ".join(words[start:end]))
+        if end == len(words):
+            break
+        next_start = end
+        overlap = 0
+        while next_start - 1 > start and overlap + word_tokens[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += word_tokens[next_start]
+        start = next_start
+    return chunks
+
+
+def split_paragraph(text: str) -> List[Tuple[str, int]]:
+    # Returns (chunk, token count) pairs, a single pair when the paragraph fits
+    tokens = count_tokens(text)
+    if tokens <= settings.EMBEDDING_CHUNK_MAX_TOKENS:
+        return [(text, tokens)]
+    chunks = split_into_chunks(text, settings.EMBEDDING_CHUNK_MAX_TOKENS, settings.EMBEDDING_CHUNK_OVERLAP_TOKENS)
+    return list(zip(chunks, count_tokens_batch(chunks)))
+
+
+def pack_by_tokens(token_counts: List[int], max_tokens: int, max_texts: int) -> List[range]:
+    # Consecutive ranges, so embeddings come back in input order
+    batches = []
+    start = 0
+    tokens = 0
+    for index, count in enumerate(token_counts):
+        if index > start and (tokens + count > max_tokens or index - start >= max_texts):
+            batches.append(range(start, index))
+            start = index
+            tokens = 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append(range(start, len(token_counts)))
+    return batches
+
+
+def get_embeddings_batched(
+    texts: List[str],
+    input_type: str = "document",
+    model: str = DEFAULT_MODEL,
+    token_counts: Optional[List[int]] = None
+) -> List[List[float]]:
+    batches = pack_by_tokens(
+        token_counts or count_tokens_batch(texts),
+        settings.EMBEDDING_BATCH_MAX_TOKENS,
+        settings.EMBEDDING_BATCH_MAX_TEXTS
+    )
+    embeddings: List[List[float]] = []
+    for batch in batches:
+        embeddings.extend(get_embeddings(texts[batch.start:batch.stop], input_type=input_type, model=model))
+    return embeddings
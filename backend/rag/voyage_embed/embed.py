@@ -1,18 +1,37 @@
 # voyage_embed/embed.py
+import voyageai
 from voyageai import Client as VoyageClient
 from typing import List
+from metrics import embedding_tokens
+from rag.clients import async_clients
 from rag.config import settings
 
 vo_client = VoyageClient(api_key=settings.VOYAGE_API_KEY)
 
+DEFAULT_MODEL = "voyage-multilingual-2"
+
 def get_embeddings(
     texts: List[str],
     input_type: str = "document",
-    model: str = "voyage-multilingual-2"
+    model: str = DEFAULT_MODEL
 ) -> List[List[float]]:
     try:
         result = vo_client.embed(texts, model=model, input_type=input_type)
+        embedding_tokens.inc(result.total_tokens, model=model)
         return result.embeddings
     except Exception as e:
         # Log the error or handle it appropriately
+        raise RuntimeError(f"Failed to get embeddings: {e}")
+
+async def aget_embeddings(
+    texts: List[str],
+    input_type: str = "document",
+    model: str = DEFAULT_MODEL
+) -> List[List[float]]:
+    try:
+        voyageai.aiosession.set(async_clients.voyage_session)
+        result = await async_clients.voyage.embed(texts, model=model, input_type=input_type)
+        embedding_tokens.inc(result.total_tokens, model=model)
+        return result.embeddings
+    except Exception as e:
         raise RuntimeError(f"Failed to get embeddings: {e}")
\ No newline at end of file
@@ -0,0 +1,192 @@
+# app/stt/audio.py
+
+import io
+import logging
+import shutil
+import subprocess
+import threading
+import wave
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def _decode_with_ffmpeg(filepath: str, sample_rate: int) -> Optional[np.ndarray]:
+    command = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", filepath,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "-"
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning(f"ffmpeg failed to decode {filepath}: {e}")
+        return None
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class PcmStream:
+    # Raw 16-bit little-endian mono PCM at SAMPLE_RATE, an odd trailing byte waits for the next chunk
+    def __init__(self):
+        self._pcm = bytearray()
+        self._lock = threading.Lock()
+
+    def _append(self, data: bytes) -> None:
+        with self._lock:
+            self._pcm.extend(data)
+
+    def feed(self, chunk: bytes) -> None:
+        self._append(chunk)
+
+    def read_samples(self) -> np.ndarray:
+        with self._lock:
+            usable = len(self._pcm) - len(self._pcm) % 2
+            data = bytes(self._pcm[:usable])
+            del self._pcm[:usable]
+        return pcm16_to_float(data)
+
+    def finish(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class FfmpegStream(PcmStream):
+    # Decodes a growing container stream (e.g. webm from MediaRecorder) with one long-lived ffmpeg process.
+    # Chunks go to its stdin and a reader thread collects the PCM as ffmpeg produces it, so audio is decoded once.
+    def __init__(self, sample_rate: int = SAMPLE_RATE):
+        super().__init__()
+        if not shutil.which("ffmpeg"):
+            raise ValueError("ffmpeg is required to decode live audio in a container format")
+        command = [
+            "ffmpeg", "-v", "error",
+            # Start decoding as soon as the stream header is in
+            "-fflags", "+nobuffer", "-probesize", "32768",
+            "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+            "pipe:1"
+        ]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        while True:
+            data = self._process.stdout.read1(65536)
+            if not data:
+                return
+            self._append(data)
+
+    def feed(self, chunk: bytes) -> None:
+        # Blocks while ffmpeg is behind, call it off the event loop
+        try:
+            self._process.stdin.write(chunk)
+            self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise ValueError("ffmpeg stopped decoding the live audio stream")
+
+    def finish(self) -> None:
+        # Closing stdin makes ffmpeg flush the rest of the stream and exit
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._process.wait()
+        self._reader.join()
+
+    def close(self) -> None:
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        self._reader.join()
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _decode_wav(filepath: str) -> Optional[Tuple[np.ndarray, int]]:
+    try:
+        with wave.open(filepath, "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                return None
+            channels = wav_file.getnchannels()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError) as e:
+        logger.warning(f"Failed to read {filepath} as WAV: {e}")
+        return None
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    if from_rate == to_rate or samples.size == 0:
+        return samples
+    duration = len(samples) / from_rate
+    target_times = np.arange(int(duration * to_rate)) / to_rate
+    source_times = np.arange(len(samples)) / from_rate
+    return np.interp(target_times, source_times, samples).astype(np.float32)
+
+
+def decode_audio(filepath: str, sample_rate: int = SAMPLE_RATE) -> Optional[Tuple[np.ndarray, int]]:
+    # Returns mono float32 samples in [-1, 1], or None when the file cannot be decoded here
+    if shutil.which("ffmpeg"):
+        samples = _decode_with_ffmpeg(filepath, sample_rate)
+        if samples is not None:
+            return samples, sample_rate
+    if filepath.lower().endswith(".wav"):
+        decoded = _decode_wav(filepath)
+        if decoded is not None:
+            return resample(decoded[0], decoded[1], sample_rate), sample_rate
+    return None
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _encode_with_ffmpeg(samples: np.ndarray, sample_rate: int, codec_args: list) -> Optional[bytes]:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    command = [
+        "ffmpeg", "-v", "error",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+        *codec_args,
+        "-"
+    ]
+    try:
+        result = subprocess.run(command, input=pcm.tobytes(), capture_output=True, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    return result.stdout
+
+
+def encode_audio(samples: np.ndarray, sample_rate: int, bitrate: str = "24k") -> Tuple[str, bytes]:
+    # Prefer a compact codec Whisper accepts, fall back to lossless FLAC and finally plain WAV
+    if shutil.which("ffmpeg"):
+        encoded = _encode_with_ffmpeg(samples, sample_rate, ["-c:a", "libopus", "-b:a", bitrate, "-f", "ogg"])
+        if encoded:
+            return ".ogg", encoded
+        encoded = _encode_with_ffmpeg(samples, sample_rate, ["-c:a", "flac", "-f", "flac"])
+        if encoded:
+            return ".flac", encoded
+    return ".wav", encode_wav(samples, sample_rate)
@@ -0,0 +1,60 @@
+# app/stt/batch.py
+
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from pydantic import BaseModel
+
+from stt.config import settings
+from stt.models import BatchItemResult, JobStatus
+from stt.services import atranscribe_audio_file, acorrect_transcript
+
+# One limit per upstream, so a large batch cannot flood either API
+whisper_limit = asyncio.Semaphore(settings.STT_BATCH_WHISPER_CONCURRENCY)
+llm_limit = asyncio.Semaphore(settings.STT_BATCH_LLM_CONCURRENCY)
+
+
+class BatchItem(BaseModel):
+    index: int
+    upload_id: Optional[str] = None
+    filename: Optional[str] = None
+    filepath: Optional[str] = None
+    error: Optional[str] = None
+
+
+async def process_batch_item(item: BatchItem) -> BatchItemResult:
+    result = BatchItemResult(
+        index=item.index,
+        upload_id=item.upload_id,
+        filename=item.filename,
+        status=JobStatus.failed,
+        error=item.error
+    )
+    if item.filepath is None:
+        return result
+
+    try:
+        async with whisper_limit:
+            transcription = await atranscribe_audio_file(item.filepath)
+        async with llm_limit:
+            correction = await acorrect_transcript(transcription)
+    except Exception as e:
+        result.error = str(e)
+        return result
+
+    result.status = JobStatus.succeeded
+    result.transcription = correction.transcription
+    result.substitutions = correction.substitutions
+    return result
+
+
+async def run_batch(items: List[BatchItem]) -> AsyncIterator[str]:
+    tasks = [asyncio.create_task(process_batch_item(item)) for item in items]
+    try:
+        # Results are emitted as they complete, "index" maps them back to the request
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            yield result.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,147 @@
+# app/stt/cache.py
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from caching import LRUCache
+
+HASH_CHUNK_SIZE = 1024 * 1024
+TMP_SUFFIX = ".tmp"
+
+
+def _finish_key(digest, params) -> str:
+    for param in params:
+        digest.update(b"\0")
+        digest.update(param.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def content_key(data: bytes, *params: str) -> str:
+    return _finish_key(hashlib.sha256(data), params)
+
+
+def file_content_key(filepath: str, *params: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    # Same key as content_key over the file's bytes, without holding the whole file in memory
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return _finish_key(digest, params)
+
+
+class DiskCache:
+    # Safe to share between workers: writes are atomic renames and eviction tolerates races.
+    # Sizes are tracked in memory, the directory is only rescanned to pick up other workers' entries.
+    def __init__(self, directory: str, max_bytes: int, rescan_seconds: float = 300.0):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._rescan_seconds = rescan_seconds
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._index: OrderedDict = OrderedDict()
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._rescan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+            # Touch the entry so eviction removes the least recently used files first
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        partial_path = f"{path}.{uuid.uuid4().hex}{TMP_SUFFIX}"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(value)
+        size = os.path.getsize(partial_path)
+        os.replace(partial_path, path)
+        with self._lock:
+            if time.monotonic() - self._scanned_at >= self._rescan_seconds:
+                self._rescan()
+            else:
+                self._total_bytes += size - self._index.pop(key, 0)
+                self._index[key] = size
+            self._evict()
+
+    def _rescan(self) -> None:
+        entries = []
+        with os.scandir(self._directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(TMP_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(self._index.values())
+        self._scanned_at = time.monotonic()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self._max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class TieredCache:
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "memory_hits": self.memory.hits,
+            "memory_entries": len(self.memory),
+        }
+        if self.disk is not None:
+            stats["disk_hits"] = self.disk.hits
+            stats["misses"] = self.disk.misses
+        else:
+            stats["misses"] = self.memory.misses
+        return stats
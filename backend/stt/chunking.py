@@ -0,0 +1,71 @@
+# app/stt/chunking.py
+
+import logging
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    # A missing tokenizer is remembered too, so its BPE files are not fetched again for every sentence
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"tiktoken is unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        # tiktoken needs its BPE files, fall back to a conservative estimate for Czech text
+        return len(text) // 3 + 1
+    return len(encoding.encode(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+
+
+def _split_long_sentence(sentence: str, max_tokens: int) -> List[Tuple[str, int]]:
+    # Returns (piece, token count) pairs. Each word is encoded once with its leading space and the counts are summed,
+    # re-encoding the growing piece for every word is quadratic on long unpunctuated transcripts.
+    pieces = []
+    current: List[str] = []
+    current_tokens = 0
+    for word in sentence.split():
+        word_tokens = count_tokens(" " + word)
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append((" ".join(current), current_tokens))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append((" ".join(current), current_tokens))
+    return pieces
+
+
+def chunk_transcript(text: str, max_tokens: int) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        pieces = _split_long_sentence(sentence, max_tokens) if tokens > max_tokens else [(sentence, tokens)]
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
@@ -7,11 +7,91 @@ load_dotenv()
 class Settings(BaseSettings):
     # Extra settings for .env.stt file
     OPENAI_API_KEY: str = Field(..., env='OPENAI_API_KEY')
+    OPENAI_BASE_URL: str = Field(default='', env='OPENAI_BASE_URL')
     LANGCHAIN_TRACING_V2: bool = Field(..., env='LANGCHAIN_TRACING_V2')
     LANGCHAIN_ENDPOINT: str = Field(..., env='LANGCHAIN_ENDPOINT')
     LANGCHAIN_PROJECT: str = Field(..., env='LANGCHAIN_PROJECT')
     LANGCHAIN_API_KEY: str = Field(..., env='LANGCHAIN_API_KEY')
 
+    # Upload settings
+    UPLOAD_FOLDER: str = Field(default='uploads', env='UPLOAD_FOLDER')
+    UPLOAD_MAX_BYTES: int = Field(default=25 * 1024 * 1024, env='UPLOAD_MAX_BYTES')
+    UPLOAD_CHUNK_SIZE: int = Field(default=1024 * 1024, env='UPLOAD_CHUNK_SIZE')
+    UPLOAD_RETENTION_SECONDS: int = Field(default=24 * 60 * 60, env='UPLOAD_RETENTION_SECONDS')
+    UPLOAD_CLEANUP_INTERVAL_SECONDS: int = Field(default=10 * 60, env='UPLOAD_CLEANUP_INTERVAL_SECONDS')
+
+    # Transcription job settings
+    STT_JOB_WORKERS: int = Field(default=4, env='STT_JOB_WORKERS')
+    STT_JOB_QUEUE_DEPTH: int = Field(default=32, env='STT_JOB_QUEUE_DEPTH')
+    STT_JOB_RETENTION_SECONDS: int = Field(default=60 * 60, env='STT_JOB_RETENTION_SECONDS')
+    STT_JOB_RETRY_AFTER_SECONDS: int = Field(default=5, env='STT_JOB_RETRY_AFTER_SECONDS')
+    STT_JOB_CALLBACK_TIMEOUT_SECONDS: float = Field(default=10.0, env='STT_JOB_CALLBACK_TIMEOUT_SECONDS')
+    # Comma-separated hosts that may receive job callbacks, "*.example.com" allows subdomains, empty disables callbacks
+    STT_JOB_CALLBACK_ALLOWED_HOSTS: str = Field(default='', env='STT_JOB_CALLBACK_ALLOWED_HOSTS')
+
+    # Segmentation settings for long dictations
+    STT_SEGMENT_MAX_SECONDS: float = Field(default=120.0, env='STT_SEGMENT_MAX_SECONDS')
+    STT_SEGMENT_OVERLAP_SECONDS: float = Field(default=1.0, env='STT_SEGMENT_OVERLAP_SECONDS')
+    STT_SEGMENT_CONCURRENCY: int = Field(default=4, env='STT_SEGMENT_CONCURRENCY')
+    STT_VAD_FRAME_MS: int = Field(default=30, env='STT_VAD_FRAME_MS')
+    STT_VAD_THRESHOLD_DB: float = Field(default=10.0, env='STT_VAD_THRESHOLD_DB')
+    STT_VAD_MIN_SILENCE_SECONDS: float = Field(default=0.4, env='STT_VAD_MIN_SILENCE_SECONDS')
+
+    # Audio normalization before Whisper: trim silence, mono, 16 kHz, compact codec
+    STT_AUDIO_NORMALIZE: bool = Field(default=True, env='STT_AUDIO_NORMALIZE')
+    STT_AUDIO_TRIM_PADDING_SECONDS: float = Field(default=0.25, env='STT_AUDIO_TRIM_PADDING_SECONDS')
+    STT_AUDIO_BITRATE: str = Field(default='24k', env='STT_AUDIO_BITRATE')
+
+    # Live dictation over WebSocket
+    STT_LIVE_CHECK_INTERVAL_SECONDS: float = Field(default=2.0, env='STT_LIVE_CHECK_INTERVAL_SECONDS')
+    STT_LIVE_WINDOW_SECONDS: float = Field(default=8.0, env='STT_LIVE_WINDOW_SECONDS')
+    STT_LIVE_MIN_COMMIT_SECONDS: float = Field(default=4.0, env='STT_LIVE_MIN_COMMIT_SECONDS')
+    STT_LIVE_MAX_WINDOW_SECONDS: float = Field(default=25.0, env='STT_LIVE_MAX_WINDOW_SECONDS')
+    STT_LIVE_MAX_BYTES: int = Field(default=100 * 1024 * 1024, env='STT_LIVE_MAX_BYTES')
+
+    # Transcription cache settings, an empty directory disables the disk tier
+    STT_TRANSCRIPTION_CACHE_ENTRIES: int = Field(default=256, env='STT_TRANSCRIPTION_CACHE_ENTRIES')
+    STT_TRANSCRIPTION_CACHE_DIR: str = Field(default='cache/transcriptions', env='STT_TRANSCRIPTION_CACHE_DIR')
+    STT_TRANSCRIPTION_CACHE_MAX_BYTES: int = Field(default=50 * 1024 * 1024, env='STT_TRANSCRIPTION_CACHE_MAX_BYTES')
+
+    # LLM correction settings, only deterministic corrections are cached
+    STT_LLM_DETERMINISTIC: bool = Field(default=False, env='STT_LLM_DETERMINISTIC')
+    STT_LLM_SEED: int = Field(default=42, env='STT_LLM_SEED')
+    STT_CORRECTION_CACHE_ENTRIES: int = Field(default=512, env='STT_CORRECTION_CACHE_ENTRIES')
+    STT_CORRECTION_CACHE_TTL_SECONDS: int = Field(default=24 * 60 * 60, env='STT_CORRECTION_CACHE_TTL_SECONDS')
+
+    # Long transcripts are corrected in sentence-aligned chunks, in parallel
+    STT_LLM_CHUNKING: bool = Field(default=True, env='STT_LLM_CHUNKING')
+    STT_LLM_CHUNK_THRESHOLD_TOKENS: int = Field(default=1500, env='STT_LLM_CHUNK_THRESHOLD_TOKENS')
+    STT_LLM_CHUNK_MAX_TOKENS: int = Field(default=800, env='STT_LLM_CHUNK_MAX_TOKENS')
+    STT_LLM_CHUNK_CONCURRENCY: int = Field(default=4, env='STT_LLM_CHUNK_CONCURRENCY')
+
+    # Local medication-name correction, runs before the LLM when enabled
+    STT_LOCAL_CORRECTION: bool = Field(default=False, env='STT_LOCAL_CORRECTION')
+    STT_MEDICATION_LEXICON_PATH: str = Field(default='', env='STT_MEDICATION_LEXICON_PATH')
+    STT_MEDICATION_MIN_SCORE: float = Field(default=0.8, env='STT_MEDICATION_MIN_SCORE')
+    STT_LOCAL_CORRECTION_SKIP_LLM: bool = Field(default=False, env='STT_LOCAL_CORRECTION_SKIP_LLM')
+    STT_LOCAL_CORRECTION_MAX_WORDS: int = Field(default=30, env='STT_LOCAL_CORRECTION_MAX_WORDS')
+    STT_LOCAL_CORRECTION_SKIP_SCORE: float = Field(default=0.9, env='STT_LOCAL_CORRECTION_SKIP_SCORE')
+
+    # Batch transcription settings, limits are shared by all running batches
+    STT_BATCH_MAX_FILES: int = Field(default=100, env='STT_BATCH_MAX_FILES')
+    STT_BATCH_WHISPER_CONCURRENCY: int = Field(default=4, env='STT_BATCH_WHISPER_CONCURRENCY')
+    STT_BATCH_LLM_CONCURRENCY: int = Field(default=4, env='STT_BATCH_LLM_CONCURRENCY')
+
+    # Upstream client settings, shared by the sync and async paths
+    STT_UPSTREAM_MAX_CONNECTIONS: int = Field(default=20, env='STT_UPSTREAM_MAX_CONNECTIONS')
+    STT_UPSTREAM_MAX_KEEPALIVE: int = Field(default=10, env='STT_UPSTREAM_MAX_KEEPALIVE')
+    STT_UPSTREAM_CONNECT_TIMEOUT: float = Field(default=5.0, env='STT_UPSTREAM_CONNECT_TIMEOUT')
+    STT_WHISPER_DEADLINE_SECONDS: float = Field(default=120.0, env='STT_WHISPER_DEADLINE_SECONDS')
+    STT_LLM_DEADLINE_SECONDS: float = Field(default=90.0, env='STT_LLM_DEADLINE_SECONDS')
+    STT_UPSTREAM_MAX_RETRIES: int = Field(default=3, env='STT_UPSTREAM_MAX_RETRIES')
+    STT_UPSTREAM_BACKOFF_SECONDS: float = Field(default=0.5, env='STT_UPSTREAM_BACKOFF_SECONDS')
+    STT_UPSTREAM_BACKOFF_MAX_SECONDS: float = Field(default=8.0, env='STT_UPSTREAM_BACKOFF_MAX_SECONDS')
+    STT_UPSTREAM_HEDGE: bool = Field(default=False, env='STT_UPSTREAM_HEDGE')
+    STT_UPSTREAM_HEDGE_PERCENTILE: float = Field(default=95.0, env='STT_UPSTREAM_HEDGE_PERCENTILE')
+    STT_UPSTREAM_HEDGE_MIN_SAMPLES: int = Field(default=20, env='STT_UPSTREAM_HEDGE_MIN_SAMPLES')
+
     model_config = SettingsConfigDict(env_file=os.getenv('ENV_FILE_STT', None))
 
 
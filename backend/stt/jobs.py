@@ -0,0 +1,164 @@
+# app/stt/jobs.py
+
+import asyncio
+import contextvars
+import ipaddress
+import logging
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from stt.config import settings
+from stt.models import CorrectionResult, JobStatus, TranscriptionJob
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class InvalidCallbackError(ValueError):
+    pass
+
+
+def allowed_callback_hosts() -> List[str]:
+    return [host.strip().lower() for host in settings.STT_JOB_CALLBACK_ALLOWED_HOSTS.split(",") if host.strip()]
+
+
+def host_is_allowed(host: str, allowed: List[str]) -> bool:
+    # "*.example.com" matches subdomains of example.com but not example.com itself
+    for pattern in allowed:
+        if pattern.startswith("*.") and host.endswith(pattern[1:]):
+            return True
+        if host == pattern:
+            return True
+    return False
+
+
+def resolve_public_addresses(host: str, port: int) -> List[str]:
+    try:
+        infos = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise InvalidCallbackError(f"Callback host '{host}' cannot be resolved: {e}")
+    addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise InvalidCallbackError(f"Callback host '{host}' resolves to a non-public address")
+    return addresses
+
+
+def validate_callback_url(url: str) -> str:
+    # Callbacks are sent from inside our network, so only allowlisted public hosts may receive them
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidCallbackError("Callback URL must be an absolute http or https URL")
+    if parts.username or parts.password:
+        raise InvalidCallbackError("Callback URL must not contain credentials")
+    host = parts.hostname.lower()
+    if not host_is_allowed(host, allowed_callback_hosts()):
+        raise InvalidCallbackError(f"Callback host '{host}' is not allowed")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise InvalidCallbackError("Callback URL has an invalid port")
+    resolve_public_addresses(host, port)
+    return url
+
+
+class TranscriptionJobQueue:
+    def __init__(self, workers: int, queue_depth: int, retention_seconds: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt-job")
+        # Jobs being worked on plus jobs waiting for a free worker
+        self._max_outstanding = workers + queue_depth
+        self._outstanding = 0
+        self._retention_seconds = retention_seconds
+        self._jobs: Dict[str, TranscriptionJob] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., CorrectionResult], *args, callback_url: Optional[str] = None) -> TranscriptionJob:
+        if callback_url:
+            validate_callback_url(callback_url)
+        with self._lock:
+            self._prune_finished()
+            if self._outstanding >= self._max_outstanding:
+                raise QueueFullError("Transcription queue is full, try again later")
+            self._outstanding += 1
+            job = TranscriptionJob(
+                job_id=uuid.uuid4().hex,
+                status=JobStatus.queued,
+                created_at=time.time(),
+                callback_url=callback_url
+            )
+            self._jobs[job.job_id] = job
+            # Carry the request context over so stage timings reach the caller
+            context = contextvars.copy_context()
+            self._futures[job.job_id] = self._executor.submit(context.run, self._run, job, fn, *args)
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> CorrectionResult:
+        return await asyncio.wrap_future(self._futures[job_id])
+
+    def _run(self, job: TranscriptionJob, fn: Callable[..., CorrectionResult], *args) -> CorrectionResult:
+        job.status = JobStatus.running
+        job.started_at = time.time()
+        try:
+            result = fn(*args)
+            job.transcription = result.transcription
+            job.substitutions = result.substitutions
+            job.status = JobStatus.succeeded
+            return result
+        except Exception as e:
+            job.error = str(e)
+            job.status = JobStatus.failed
+            raise
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._outstanding -= 1
+            if job.callback_url:
+                self._notify(job)
+
+    def _notify(self, job: TranscriptionJob) -> None:
+        try:
+            # Checked again because DNS may have changed since the job was submitted
+            validate_callback_url(job.callback_url)
+            response = requests.post(
+                job.callback_url,
+                json=job.model_dump(mode="json"),
+                timeout=settings.STT_JOB_CALLBACK_TIMEOUT_SECONDS,
+                allow_redirects=False
+            )
+            response.raise_for_status()
+        except (InvalidCallbackError, requests.exceptions.RequestException) as e:
+            logger.error(f"Failed to deliver callback for job {job.job_id}: {e}")
+
+    def _prune_finished(self) -> None:
+        cutoff = time.time() - self._retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            del self._futures[job_id]
+
+
+job_queue = TranscriptionJobQueue(
+    workers=settings.STT_JOB_WORKERS,
+    queue_depth=settings.STT_JOB_QUEUE_DEPTH,
+    retention_seconds=settings.STT_JOB_RETENTION_SECONDS
+)
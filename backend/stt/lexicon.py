@@ -0,0 +1,182 @@
+# app/stt/lexicon.py
+
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from stt.models import MedicationSubstitution
+
+WORD_PATTERN = re.compile(r"[\w-]+")
+
+# Czech case endings with diacritics folded, e.g. "Tobrexem" is "Tobrex" + "em"
+CASE_ENDINGS = sorted("""
+ech ich ami emi ovi ove em ou um am ach at a e i o u y
+""".split(), key=len, reverse=True)
+MIN_STEM_LENGTH = 4
+
+
+def normalize_term(text: str) -> str:
+    # Lowercase, fold diacritics and drop punctuation so "Spersadex Comp." == "spersadex comp"
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", folded))
+
+
+def split_ending(word: str) -> Tuple[str, str]:
+    # Returns (stem, ending) of a normalized single word
+    for ending in CASE_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)], ending
+    return word, ""
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    # 1 - normalized Levenshtein distance
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return 1.0 - previous[-1] / max(len(a), len(b))
+
+
+class MedicationLexicon:
+    # Single-word terms are indexed by their stem, so inflected forms match and keep their ending
+    def __init__(self, terms: Iterable[str], min_candidate_overlap: float = 0.3):
+        self.terms: List[str] = []
+        # The term without its own ending, in its original spelling, or None for multi-word terms
+        self._stems: List[Optional[str]] = []
+        self._keys: List[str] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._trigram_counts: List[int] = []
+        self._min_candidate_overlap = min_candidate_overlap
+        seen = set()
+        for term in terms:
+            term = term.strip()
+            normalized = normalize_term(term)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            term_id = len(self.terms)
+            self.terms.append(term)
+            key, stem = normalized, None
+            # Only plain words can be cut back to their stem without touching punctuation
+            if " " not in normalized and len(normalized) == len(term):
+                key, ending = split_ending(normalized)
+                stem = term[:len(term) - len(ending)]
+            self._stems.append(stem)
+            self._keys.append(key)
+            grams = trigrams(key)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(term_id)
+        self.max_words = max((len(normalize_term(term).split()) for term in self.terms), default=1)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def match(self, phrase: str) -> Optional[Tuple[str, float]]:
+        # Returns (replacement, score), inflected like the phrase when the term is a single word
+        normalized = normalize_term(phrase)
+        if not normalized:
+            return None
+        single_word = " " not in normalized and len(normalized) == len(phrase)
+        stem, ending = split_ending(normalized) if single_word else (normalized, "")
+        grams = trigrams(stem)
+
+        # Only terms sharing enough trigrams are compared character by character
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for term_id in self._postings.get(gram, ()):
+                shared[term_id] += 1
+
+        best = None
+        for term_id, count in shared.items():
+            dice = 2 * count / (len(grams) + self._trigram_counts[term_id])
+            if dice < self._min_candidate_overlap:
+                continue
+            term_stem = self._stems[term_id]
+            if single_word and term_stem is not None:
+                score = similarity(stem, self._keys[term_id])
+                replacement = term_stem + phrase[len(phrase) - len(ending):] if ending else term_stem
+            else:
+                score = similarity(normalized, self._keys[term_id] if term_stem is None else normalize_term(self.terms[term_id]))
+                replacement = self.terms[term_id]
+            if best is None or score > best[1]:
+                best = (replacement, score)
+        return best
+
+
+def load_lexicon(terms: Iterable[str], path: Optional[str] = None) -> MedicationLexicon:
+    terms = list(terms)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            terms.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return MedicationLexicon(terms)
+
+
+def correct_medications(
+    text: str,
+    lexicon: MedicationLexicon,
+    min_score: float = 0.8,
+    min_length: int = 4
+) -> Tuple[str, List[MedicationSubstitution]]:
+    words = list(WORD_PATTERN.finditer(text))
+    substitutions: List[MedicationSubstitution] = []
+    pieces: List[str] = []
+    cursor = 0
+    i = 0
+    while i < len(words):
+        best = None
+        for size in range(1, min(lexicon.max_words, len(words) - i) + 1):
+            start, end = words[i].start(), words[i + size - 1].end()
+            phrase = text[start:end]
+            if len(normalize_term(phrase)) < min_length:
+                continue
+            match = lexicon.match(phrase)
+            if match is None or match[1] < min_score:
+                continue
+            if best is None or match[1] >= best[2]:
+                best = (size, match[0], match[1])
+
+        if best is None:
+            i += 1
+            continue
+
+        size, term, score = best
+        start, end = words[i].start(), words[i + size - 1].end()
+        original = text[start:end]
+        replacement = term
+        # Avoid doubling the period of terms like "Spersadex Comp." at the end of a sentence
+        if replacement.endswith(".") and text[end:end + 1] == ".":
+            replacement = replacement[:-1]
+        # Words that already spell the term, up to case and diacritics, are left as dictated
+        if normalize_term(original) != normalize_term(replacement):
+            pieces.append(text[cursor:start])
+            pieces.append(replacement)
+            cursor = end
+            substitutions.append(MedicationSubstitution(
+                original=original,
+                replacement=replacement,
+                score=round(score, 3)
+            ))
+        i += size
+
+    pieces.append(text[cursor:])
+    return "".join(pieces), substitutions
@@ -0,0 +1,159 @@
+# app/stt/live.py
+
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from stt.audio import SAMPLE_RATE, FfmpegStream, PcmStream, encode_audio
+from stt.config import settings
+from stt.medications import medications
+from stt.segmentation import find_silences, stitch_transcripts
+from stt.services import WHISPER_MODEL, WHISPER_LANGUAGE, acorrect_transcript
+from stt.upstream import atranscribe_audio
+
+logger = logging.getLogger(__name__)
+
+AUDIO_FORMATS = ("webm", "pcm16")
+MIN_SEGMENT_SECONDS = 0.3
+
+
+class LiveTranscriber:
+    # Audio before committed_samples is transcribed and never sent to Whisper again,
+    # only the decoded samples after it are kept
+    def __init__(self, audio_format: str):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format '{audio_format}', expected one of {AUDIO_FORMATS}")
+        self.audio_format = audio_format
+        self.committed_samples = 0
+        self.texts: List[str] = []
+        # Whether each text starts inside the audio of the previous one, only then is stitching allowed to dedupe
+        self.overlaps: List[bool] = []
+        self._next_overlaps = False
+        self.received_bytes = 0
+        self._stream = PcmStream() if audio_format == "pcm16" else FfmpegStream()
+        self._pending = np.empty(0, dtype=np.float32)
+
+    @property
+    def transcript(self) -> str:
+        return stitch_transcripts(self.texts, self.overlaps)
+
+    async def add_chunk(self, chunk: bytes) -> None:
+        if self.received_bytes + len(chunk) > settings.STT_LIVE_MAX_BYTES:
+            raise ValueError("Live dictation exceeds the maximum recording size")
+        self.received_bytes += len(chunk)
+        await asyncio.to_thread(self._stream.feed, chunk)
+
+    async def _decode(self, final: bool = False) -> np.ndarray:
+        # Returns the decoded audio that is not committed yet
+        if final:
+            await asyncio.to_thread(self._stream.finish)
+        samples = self._stream.read_samples()
+        if len(samples):
+            self._pending = np.concatenate([self._pending, samples])
+        return self._pending
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def _next_cut(self, pending: np.ndarray) -> Optional[tuple]:
+        # Returns (end, next_start) relative to the pending audio
+        if len(pending) < settings.STT_LIVE_WINDOW_SECONDS * SAMPLE_RATE:
+            return None
+        silences = find_silences(
+            pending,
+            SAMPLE_RATE,
+            frame_ms=settings.STT_VAD_FRAME_MS,
+            threshold_db=settings.STT_VAD_THRESHOLD_DB,
+            min_silence_seconds=settings.STT_VAD_MIN_SILENCE_SECONDS
+        )
+        min_length = settings.STT_LIVE_MIN_COMMIT_SECONDS * SAMPLE_RATE
+        cuts = [(start + end) // 2 for start, end in silences if (start + end) // 2 >= min_length]
+        if cuts:
+            return cuts[-1], cuts[-1]
+        if len(pending) >= settings.STT_LIVE_MAX_WINDOW_SECONDS * SAMPLE_RATE:
+            # No pause for too long, cut mid-speech and let stitching remove the overlap
+            overlap = int(settings.STT_SEGMENT_OVERLAP_SECONDS * SAMPLE_RATE)
+            return len(pending), len(pending) - overlap
+        return None
+
+    async def commit(self, final: bool = False) -> Optional[str]:
+        pending = await self._decode(final)
+        cut = (len(pending), len(pending)) if final else self._next_cut(pending)
+        if cut is None:
+            return None
+
+        end, next_start = cut
+        segment = pending[:end]
+        text = ""
+        if len(segment) >= MIN_SEGMENT_SECONDS * SAMPLE_RATE and np.max(np.abs(segment)) > 1e-3:
+            extension, encoded = await asyncio.to_thread(encode_audio, segment, SAMPLE_RATE, settings.STT_AUDIO_BITRATE)
+            text = await atranscribe_audio(
+                (f"live{extension}", encoded), WHISPER_MODEL, WHISPER_LANGUAGE, medications, len(segment) / SAMPLE_RATE
+            )
+            self.texts.append(text)
+            self.overlaps.append(self._next_overlaps)
+            self._next_overlaps = next_start < end
+        else:
+            # Nothing was transcribed, so the next text cannot repeat any of it
+            self._next_overlaps = False
+        self.committed_samples += next_start
+        self._pending = pending[next_start:]
+        return text
+
+
+async def commit_and_report(websocket: WebSocket, transcriber: LiveTranscriber) -> None:
+    text = await transcriber.commit()
+    if text:
+        await websocket.send_json({"type": "partial", "delta": text, "committed": transcriber.transcript})
+
+
+async def run_live_session(websocket: WebSocket, audio_format: str) -> None:
+    await websocket.accept()
+    window_task: Optional[asyncio.Task] = None
+    transcriber: Optional[LiveTranscriber] = None
+    try:
+        transcriber = LiveTranscriber(audio_format)
+        last_check = time.monotonic()
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await transcriber.add_chunk(message["bytes"])
+            elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                break
+
+            # Only one window is transcribed at a time so committed text stays in order
+            idle = window_task is None or window_task.done()
+            if idle and time.monotonic() - last_check >= settings.STT_LIVE_CHECK_INTERVAL_SECONDS:
+                if window_task is not None:
+                    window_task.result()
+                last_check = time.monotonic()
+                window_task = asyncio.create_task(commit_and_report(websocket, transcriber))
+
+        if window_task is not None:
+            await window_task
+        await transcriber.commit(final=True)
+        transcript = transcriber.transcript
+        await websocket.send_json({"type": "transcript", "text": transcript})
+
+        # Only the correction of the final text is left once recording stops
+        correction = await acorrect_transcript(transcript)
+        await websocket.send_json({"type": "final", **correction.model_dump()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Live dictation failed: {e}")
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        if window_task is not None and not window_task.done():
+            window_task.cancel()
+        if transcriber is not None:
+            transcriber.close()
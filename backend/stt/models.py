@@ -1,12 +1,78 @@
+from enum import Enum
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class UploadResponse(BaseModel):
     message: str
     path: str
+    upload_id: str
+
+class MedicationSubstitution(BaseModel):
+    original: str
+    replacement: str
+    score: float
+
+class CorrectionResult(BaseModel):
+    transcription: str
+    substitutions: List[MedicationSubstitution] = []
+    llm_skipped: bool = False
 
 class TranscriptionResponse(BaseModel):
     transcription: str
+    substitutions: List[MedicationSubstitution] = []
 
 class ErrorResponse(BaseModel):
     error: str
-    
\ No newline at end of file
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+class TranscriptionJobRequest(BaseModel):
+    upload_id: str
+    callback_url: Optional[str] = None
+
+class TranscriptionJob(BaseModel):
+    job_id: str
+    status: JobStatus
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    transcription: Optional[str] = None
+    substitutions: List[MedicationSubstitution] = []
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    upload_id: Optional[str] = None
+    filename: Optional[str] = None
+    status: JobStatus
+    transcription: Optional[str] = None
+    substitutions: List[MedicationSubstitution] = []
+    error: Optional[str] = None
+
+class AudioStats(BaseModel):
+    passthrough: bool
+    original_bytes: int
+    processed_bytes: int
+    original_seconds: Optional[float] = None
+    processed_seconds: Optional[float] = None
+    segments: int = 1
+    # Whether each segment starts inside the audio of the previous one, see split_on_silence
+    overlaps: List[bool] = [False]
+    # Duration of each upload, empty when the audio could not be decoded
+    segment_seconds: List[float] = []
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+    @property
+    def seconds_removed(self) -> float:
+        if self.original_seconds is None or self.processed_seconds is None:
+            return 0.0
+        return self.original_seconds - self.processed_seconds
@@ -0,0 +1,113 @@
+# app/stt/preprocessing.py
+
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from stt.audio import decode_audio, encode_audio
+from stt.config import settings
+from stt.models import AudioStats
+from stt.segmentation import find_silences, split_on_silence, trim_silence
+
+logger = logging.getLogger(__name__)
+
+# Running totals since startup
+preprocessing_totals: Dict[str, float] = {
+    "files": 0,
+    "passthrough_files": 0,
+    "bytes_saved": 0,
+    "seconds_removed": 0.0
+}
+_totals_lock = threading.Lock()
+
+
+def _record(stats: AudioStats) -> None:
+    with _totals_lock:
+        preprocessing_totals["files"] += 1
+        preprocessing_totals["passthrough_files"] += stats.passthrough
+        preprocessing_totals["bytes_saved"] += stats.bytes_saved
+        preprocessing_totals["seconds_removed"] += stats.seconds_removed
+    logger.info(
+        f"Audio preprocessing: {stats.bytes_saved} bytes saved, "
+        f"{stats.seconds_removed:.1f}s removed, {stats.segments} segment(s)"
+    )
+
+
+def passthrough(filepath: str, seconds: Optional[float] = None) -> Tuple[List[Tuple[str, bytes]], AudioStats]:
+    # The original file is only read into memory when it is sent as is
+    with open(filepath, "rb") as audio_file:
+        data = audio_file.read()
+    stats = AudioStats(passthrough=True, original_bytes=len(data), processed_bytes=len(data))
+    if seconds is not None:
+        stats.original_seconds = stats.processed_seconds = seconds
+        stats.segment_seconds = [seconds]
+    return [(os.path.basename(filepath), data)], stats
+
+
+def preprocess_audio(filepath: str) -> Tuple[List[Tuple[str, bytes]], AudioStats]:
+    # Returns the (filename, bytes) uploads to send to Whisper, in order
+    original_bytes = os.path.getsize(filepath)
+    decoded = decode_audio(filepath)
+    if decoded is None:
+        uploads, stats = passthrough(filepath)
+        _record(stats)
+        return uploads, stats
+
+    samples, sample_rate = decoded
+    original_seconds = len(samples) / sample_rate
+    if settings.STT_AUDIO_NORMALIZE:
+        samples = trim_silence(
+            samples,
+            sample_rate,
+            frame_ms=settings.STT_VAD_FRAME_MS,
+            threshold_db=settings.STT_VAD_THRESHOLD_DB,
+            padding_seconds=settings.STT_AUDIO_TRIM_PADDING_SECONDS
+        )
+
+    # Long dictations are split at pauses so each request stays small
+    bounds = [(0, len(samples))]
+    overlaps = [False]
+    if len(samples) > settings.STT_SEGMENT_MAX_SECONDS * sample_rate:
+        silences = find_silences(
+            samples,
+            sample_rate,
+            frame_ms=settings.STT_VAD_FRAME_MS,
+            threshold_db=settings.STT_VAD_THRESHOLD_DB,
+            min_silence_seconds=settings.STT_VAD_MIN_SILENCE_SECONDS
+        )
+        bounds, overlaps = split_on_silence(
+            len(samples),
+            sample_rate,
+            silences,
+            max_seconds=settings.STT_SEGMENT_MAX_SECONDS,
+            overlap_seconds=settings.STT_SEGMENT_OVERLAP_SECONDS
+        )
+    elif not settings.STT_AUDIO_NORMALIZE:
+        uploads, stats = passthrough(filepath, original_seconds)
+        _record(stats)
+        return uploads, stats
+
+    uploads = []
+    for index, (start, end) in enumerate(bounds):
+        extension, encoded = encode_audio(samples[start:end], sample_rate, settings.STT_AUDIO_BITRATE)
+        uploads.append((f"segment-{index}{extension}", encoded))
+
+    processed_bytes = sum(len(encoded) for _, encoded in uploads)
+    processed_seconds = sum(end - start for start, end in bounds) / sample_rate
+    if len(uploads) == 1 and processed_bytes >= original_bytes and original_seconds - processed_seconds < 1.0:
+        # Re-encoding did not pay off, the original upload is the better request
+        uploads, stats = passthrough(filepath, original_seconds)
+    else:
+        stats = AudioStats(
+            passthrough=False,
+            original_bytes=original_bytes,
+            processed_bytes=processed_bytes,
+            original_seconds=original_seconds,
+            processed_seconds=processed_seconds,
+            segments=len(uploads),
+            overlaps=overlaps,
+            segment_seconds=[(end - start) / sample_rate for start, end in bounds]
+        )
+    _record(stats)
+    return uploads, stats
@@ -1,38 +1,131 @@
 # app/stt/routers.py
 
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Body, UploadFile, File, Form, HTTPException, Query, WebSocket
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 
-from stt.services import transcribe_audio_file, run_pipeline
-from stt.models import UploadResponse, TranscriptionResponse, ErrorResponse
+from stt.batch import BatchItem, run_batch
+from stt.config import settings
+from stt.jobs import job_queue, InvalidCallbackError, QueueFullError
+from stt.live import run_live_session
+from stt.services import transcribe_and_correct, transcription_cache, correction_cache
+from stt.models import UploadResponse, TranscriptionResponse, ErrorResponse, TranscriptionJob, TranscriptionJobRequest
+from stt.preprocessing import preprocessing_totals
+from stt.streaming import stream_transcription_events
+from stt.uploads import save_upload, resolve_upload, maybe_cleanup_uploads, UploadTooLargeError
 
 router = APIRouter()
 
-UPLOAD_FOLDER = 'uploads'
-
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+def submit_job(filepath: str, callback_url: str = None) -> TranscriptionJob:
+    try:
+        return job_queue.submit(transcribe_and_correct, filepath, callback_url=callback_url)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.STT_JOB_RETRY_AFTER_SECONDS)}
+        )
+    except InvalidCallbackError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post('/upload', response_model=UploadResponse, responses={400: {"model": ErrorResponse}})
-async def upload_file(file: UploadFile = File(...)):
+@router.post('/upload', response_model=UploadResponse, responses={400: {"model": ErrorResponse}, 413: {"model": ErrorResponse}})
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No selected file")
-    filepath = os.path.join(UPLOAD_FOLDER, file.filename)
-    with open(filepath, "wb") as buffer:
-        buffer.write(await file.read())
-    return {"message": "File uploaded successfully", "path": filepath}
-
-@router.get('/transcribe', response_model=TranscriptionResponse, responses={404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def transcribe_audio():
-    filename = 'recording.webm'
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    if not os.path.exists(filepath):
+    try:
+        upload_id, filepath = await save_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    background_tasks.add_task(maybe_cleanup_uploads)
+    return {"message": "File uploaded successfully", "path": filepath, "upload_id": upload_id}
+
+@router.get('/transcribe', response_model=TranscriptionResponse, responses={404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def transcribe_audio(upload_id: str = Query(...)):
+    filepath = resolve_upload(upload_id)
+    if filepath is None:
         raise HTTPException(status_code=404, detail="File not found")
 
+    # Runs on the shared worker pool so the event loop stays free
+    job = submit_job(filepath)
     try:
-        transcription = transcribe_audio_file(filepath)
-        postprocessed_text = run_pipeline(transcription)
-        return {"transcription": postprocessed_text}
+        result = await job_queue.wait(job.job_id)
+        return {"transcription": result.transcription, "substitutions": result.substitutions}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get('/transcribe/stream', responses={404: {"model": ErrorResponse}})
+async def transcribe_audio_stream(upload_id: str = Query(...)):
+    filepath = resolve_upload(upload_id)
+    if filepath is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # The generator is blocking, StreamingResponse iterates it in a worker thread
+    return StreamingResponse(
+        stream_transcription_events(filepath),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post('/transcribe/batch', responses={400: {"model": ErrorResponse}})
+async def transcribe_batch(
+    background_tasks: BackgroundTasks,
+    files: Optional[List[UploadFile]] = File(None),
+    upload_ids: Optional[List[str]] = Form(None)
+):
+    files = files or []
+    upload_ids = upload_ids or []
+    if not files and not upload_ids:
+        raise HTTPException(status_code=400, detail="No files or upload IDs provided")
+    if len(files) + len(upload_ids) > settings.STT_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.STT_BATCH_MAX_FILES} files")
+
+    # A file that fails to upload or resolve only fails its own entry
+    items = []
+    for file in files:
+        item = BatchItem(index=len(items), filename=file.filename)
+        try:
+            item.upload_id, item.filepath = await save_upload(file)
+        except UploadTooLargeError as e:
+            item.error = str(e)
+        items.append(item)
+    for upload_id in upload_ids:
+        filepath = resolve_upload(upload_id)
+        items.append(BatchItem(
+            index=len(items),
+            upload_id=upload_id,
+            filepath=filepath,
+            error=None if filepath else "File not found"
+        ))
+
+    background_tasks.add_task(maybe_cleanup_uploads)
+    return StreamingResponse(run_batch(items), media_type="application/x-ndjson")
+
+@router.websocket('/live')
+async def live_dictation(websocket: WebSocket, audio_format: str = Query(default="webm", alias="format")):
+    # Binary messages carry audio chunks, {"type": "end"} finishes the dictation
+    await run_live_session(websocket, audio_format)
+
+@router.post('/jobs', status_code=202, response_model=TranscriptionJob, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def submit_transcription_job(request: TranscriptionJobRequest = Body(...)):
+    filepath = resolve_upload(request.upload_id)
+    if filepath is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return submit_job(filepath, callback_url=request.callback_url)
+
+@router.get('/jobs/{job_id}', response_model=TranscriptionJob, responses={404: {"model": ErrorResponse}})
+async def get_transcription_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get('/cache/stats')
+async def get_cache_stats():
+    return {
+        "transcriptions": transcription_cache.stats(),
+        "corrections": correction_cache.stats()
+    }
+
+@router.get('/audio/stats')
+async def get_audio_stats():
+    return preprocessing_totals
@@ -0,0 +1,132 @@
+# app/stt/segmentation.py
+
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def frame_energies_db(samples: np.ndarray, sample_rate: int, frame_ms: int) -> Tuple[np.ndarray, int]:
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float32), frame_length
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(rms + 1e-10), frame_length
+
+
+def silent_frames(energies: np.ndarray, threshold_db: float) -> np.ndarray:
+    # A frame is silent when it is close to the recording's own noise floor
+    # and clearly below its typical speech level
+    noise_floor, speech_level = np.percentile(energies, [10, 90])
+    return energies < min(noise_floor + threshold_db, speech_level - threshold_db)
+
+
+def find_silences(
+    samples: np.ndarray,
+    sample_rate: int,
+    frame_ms: int = 30,
+    threshold_db: float = 10.0,
+    min_silence_seconds: float = 0.4
+) -> List[Tuple[int, int]]:
+    energies, frame_length = frame_energies_db(samples, sample_rate, frame_ms)
+    if energies.size == 0:
+        return []
+    silent = silent_frames(energies, threshold_db)
+
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    min_frames = math.ceil(min_silence_seconds * 1000 / frame_ms)
+    return [
+        (int(start) * frame_length, int(end) * frame_length)
+        for start, end in zip(starts, ends)
+        if end - start >= min_frames
+    ]
+
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    frame_ms: int = 30,
+    threshold_db: float = 10.0,
+    padding_seconds: float = 0.25
+) -> np.ndarray:
+    energies, frame_length = frame_energies_db(samples, sample_rate, frame_ms)
+    if energies.size == 0:
+        return samples
+    voiced = np.flatnonzero(~silent_frames(energies, threshold_db))
+    if voiced.size == 0:
+        return samples
+    padding = int(padding_seconds * sample_rate)
+    start = max(0, int(voiced[0]) * frame_length - padding)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame_length + padding)
+    return samples[start:end]
+
+
+def split_on_silence(
+    total_samples: int,
+    sample_rate: int,
+    silences: List[Tuple[int, int]],
+    max_seconds: float,
+    overlap_seconds: float
+) -> Tuple[List[Tuple[int, int]], List[bool]]:
+    # Also returns, for every segment, whether it starts inside the audio of the previous one
+    max_length = int(max_seconds * sample_rate)
+    # Overlap is only needed when no silence was found and we have to cut mid-speech
+    overlap = min(int(overlap_seconds * sample_rate), max_length // 2)
+    cut_points = [(start + end) // 2 for start, end in silences]
+
+    segments = []
+    overlaps = [False]
+    start = 0
+    while total_samples - start > max_length:
+        limit = start + max_length
+        candidates = [cut for cut in cut_points if start < cut <= limit]
+        if candidates:
+            end = candidates[-1]
+            next_start = end
+        else:
+            end = limit
+            next_start = end - overlap
+        segments.append((start, end))
+        overlaps.append(next_start < end)
+        start = next_start
+    segments.append((start, total_samples))
+    return segments, overlaps
+
+
+def _normalize_word(word: str) -> str:
+    return "".join(ch for ch in word.lower() if ch.isalnum())
+
+
+def stitch_transcripts(
+    texts: List[str],
+    overlaps: Sequence[bool],
+    max_overlap_words: int = 12,
+    min_overlap_words: int = 2
+) -> str:
+    # overlaps[i] tells whether texts[i] was transcribed from audio that starts inside the previous segment.
+    # Only those boundaries are deduplicated, a phrase repeated across a pause is real speech.
+    words: List[str] = []
+    previous_empty = True
+    for text, overlapping in zip(texts, overlaps):
+        segment_words = text.split()
+        if not segment_words:
+            previous_empty = True
+            continue
+        overlap = 0
+        if overlapping and not previous_empty:
+            limit = min(max_overlap_words, len(words), len(segment_words))
+            tail = [_normalize_word(word) for word in words[len(words) - limit:]]
+            head = [_normalize_word(word) for word in segment_words[:limit]]
+
+            # Drop the longest prefix of this segment that repeats the end of the previous one
+            for size in range(limit, min_overlap_words - 1, -1):
+                if tail[limit - size:] == head[:size]:
+                    overlap = size
+                    break
+        words.extend(segment_words[overlap:])
+        previous_empty = False
+    return " ".join(words)
@@ -1,31 +1,116 @@
+import asyncio
+import contextvars
+import hashlib
 import json
-from openai import OpenAI
-from typing import List
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple, TypeVar
 
+from caching import LRUCache
+from metrics import record_stage, timed
+from stt.cache import DiskCache, TieredCache, content_key, file_content_key
+from stt.chunking import chunk_transcript, count_tokens
 from stt.config import settings
+from stt.lexicon import correct_medications, load_lexicon
 from stt.medications import medications
-# Load the OpenAI API key from environment variables or .env.rag file
+from stt.models import AudioStats, CorrectionResult, MedicationSubstitution
+from stt.preprocessing import preprocess_audio
+from stt.segmentation import stitch_transcripts
+from stt.upstream import acomplete_chat, atranscribe_audio, complete_chat, stream_chat, transcribe_audio
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+WHISPER_MODEL = "whisper-1"
+WHISPER_LANGUAGE = "cs"
 
+T = TypeVar("T")
 
-def transcribe_audio_file(filepath: str) -> str:
-    with open(filepath, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            response_format="text",
-            language="cs",
-            prompt=medications
-        )
+medication_lexicon = load_lexicon(medications, settings.STT_MEDICATION_LEXICON_PATH)
+
+transcription_cache = TieredCache(
+    LRUCache(max_entries=settings.STT_TRANSCRIPTION_CACHE_ENTRIES),
+    DiskCache(
+        directory=settings.STT_TRANSCRIPTION_CACHE_DIR,
+        max_bytes=settings.STT_TRANSCRIPTION_CACHE_MAX_BYTES
+    ) if settings.STT_TRANSCRIPTION_CACHE_DIR else None
+)
+
+
+def submit_in_context(executor: ThreadPoolExecutor, fn: Callable[..., T], *args) -> "Future[T]":
+    # Pool threads do not inherit contextvars, each call runs in a copy of the caller's context
+    # so the stages it records still reach the request's Server-Timing header
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def map_in_context(executor: ThreadPoolExecutor, fn: Callable[..., T], *iterables) -> List[T]:
+    # Results keep the order of the inputs
+    futures = [submit_in_context(executor, fn, *args) for args in zip(*iterables)]
+    return [future.result() for future in futures]
+
+
+def transcribe_upload(upload: Tuple[str, bytes], seconds: Optional[float] = None) -> str:
+    return transcribe_audio(upload, WHISPER_MODEL, WHISPER_LANGUAGE, medications, seconds)
+
+
+async def atranscribe_upload(upload: Tuple[str, bytes], seconds: Optional[float] = None) -> str:
+    return await atranscribe_audio(upload, WHISPER_MODEL, WHISPER_LANGUAGE, medications, seconds)
+
+
+def upload_seconds(uploads: List[Tuple[str, bytes]], stats: Optional[AudioStats]) -> List[Optional[float]]:
+    # Durations are unknown for audio that could not be decoded
+    if stats is None or len(stats.segment_seconds) != len(uploads):
+        return [None] * len(uploads)
+    return list(stats.segment_seconds)
+
+
+def transcribe_uploads(uploads: List[Tuple[str, bytes]], stats: Optional[AudioStats] = None) -> List[str]:
+    seconds = upload_seconds(uploads, stats)
+    if len(uploads) == 1:
+        return [transcribe_upload(uploads[0], seconds[0])]
+    with ThreadPoolExecutor(max_workers=settings.STT_SEGMENT_CONCURRENCY) as executor:
+        return map_in_context(executor, transcribe_upload, uploads, seconds)
+
+
+async def atranscribe_uploads(uploads: List[Tuple[str, bytes]], stats: Optional[AudioStats] = None) -> List[str]:
+    limit = asyncio.Semaphore(settings.STT_SEGMENT_CONCURRENCY)
+
+    async def transcribe(upload: Tuple[str, bytes], seconds: Optional[float]) -> str:
+        async with limit:
+            return await atranscribe_upload(upload, seconds)
+
+    return list(await asyncio.gather(*(transcribe(upload, seconds) for upload, seconds in zip(uploads, upload_seconds(uploads, stats)))))
+
+
+def transcription_cache_key(filepath: str) -> str:
+    return file_content_key(filepath, WHISPER_MODEL, WHISPER_LANGUAGE, json.dumps(medications, ensure_ascii=False))
+
+
+def finish_transcription(cache_key: str, texts: List[str], stats: AudioStats) -> str:
+    transcription = stitch_transcripts(texts, stats.overlaps) if len(texts) > 1 else texts[0]
+    transcription_cache.set(cache_key, transcription)
     return transcription
 
 
-def format_prompt(text: str) -> List[dict]:
-    return [
-        {
-            "role": "system",
-            "content": """
+def transcribe_audio_file(filepath: str) -> str:
+    cache_key = transcription_cache_key(filepath)
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    uploads, stats = preprocess_audio(filepath)
+    return finish_transcription(cache_key, transcribe_uploads(uploads, stats), stats)
+
+
+async def atranscribe_audio_file(filepath: str) -> str:
+    cache_key = await asyncio.to_thread(transcription_cache_key, filepath)
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Decoding and encoding is CPU and subprocess work, keep it off the event loop
+    uploads, stats = await asyncio.to_thread(preprocess_audio, filepath)
+    return finish_transcription(cache_key, await atranscribe_uploads(uploads, stats), stats)
+
+
+SYSTEM_PROMPT = """
 __ASK__
 You are a professional copywriter tasked with correcting misspellings and grammatical errors in a text containing an ophthalmologist's diagnosis. The text may include technical terms and recommendations. Your goal is to produce a corrected version of the text and extract any recommendations mentioned.
 
@@ -66,6 +151,23 @@ After correcting the text and identifying any recommendations, prepare your outp
   "recommendations": ["Recommendation 1", "Recommendation 2", "etc."]
 }
 """
+
+# Changes whenever the system prompt does, so cached corrections never outlive their prompt
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+LLM_MODEL = "gpt-4o"
+
+correction_cache = LRUCache(
+    max_entries=settings.STT_CORRECTION_CACHE_ENTRIES,
+    ttl_seconds=settings.STT_CORRECTION_CACHE_TTL_SECONDS
+)
+
+
+def format_prompt(text: str) -> List[dict]:
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
         },
         {
             "role": "user",
@@ -74,29 +176,178 @@ After correcting the text and identifying any recommendations, prepare your outp
     ]
 
 
-def invoke_llm(messages: List[dict]) -> dict:
-    response = client.chat.completions.create(
-        messages=messages,
-        model="gpt-4o",
-        temperature=1,
-        response_format={"type": "json_object"}
-    )
-    return response.choices[0].message.content
+def llm_options(deterministic: bool) -> dict:
+    if deterministic:
+        return {"temperature": 0, "seed": settings.STT_LLM_SEED}
+    return {"temperature": 1}
 
 
-def parse_output(response: str) -> str:
+@timed("llm")
+def invoke_llm(messages: List[dict], deterministic: bool = False) -> str:
+    return complete_chat(messages, LLM_MODEL, **llm_options(deterministic))
+
+
+@timed("llm")
+async def ainvoke_llm(messages: List[dict], deterministic: bool = False) -> str:
+    return await acomplete_chat(messages, LLM_MODEL, **llm_options(deterministic))
+
+
+def stream_llm(messages: List[dict], deterministic: bool = False) -> Iterator[str]:
+    started = time.perf_counter()
+    yield from stream_chat(messages, LLM_MODEL, **llm_options(deterministic))
+    record_stage("llm", time.perf_counter() - started)
+
+
+def parse_response(response: str) -> Tuple[str, List[str]]:
     response_json = json.loads(response)
+    return response_json.get("text"), response_json.get("recommendations") or []
+
+
+def format_output(text: str, recommendations: List[str]) -> str:
+    if recommendations == []:
+        return text
+    return text + "\nDoporučení:\n" + "\n".join([f"• {rec}" for rec in recommendations])
+
+
+def parse_output(response: str) -> str:
+    return format_output(*parse_response(response))
+
+
+def merge_responses(responses: List[str]) -> Tuple[str, List[str]]:
+    texts = []
+    recommendations = []
+    seen = set()
+    for response in responses:
+        text, chunk_recommendations = parse_response(response)
+        texts.append(text or "")
+        for recommendation in chunk_recommendations:
+            # Neighbouring chunks often extract the same recommendation
+            key = " ".join(recommendation.casefold().split())
+            if key not in seen:
+                seen.add(key)
+                recommendations.append(recommendation)
+    return " ".join(text.strip() for text in texts if text.strip()), recommendations
+
+
+def chunk_for_llm(text: str) -> List[str]:
+    if not settings.STT_LLM_CHUNKING or count_tokens(text, LLM_MODEL) <= settings.STT_LLM_CHUNK_THRESHOLD_TOKENS:
+        return [text]
+    return chunk_transcript(text, settings.STT_LLM_CHUNK_MAX_TOKENS)
+
+
+def combine_responses(responses: List[str]) -> Tuple[str, List[str]]:
+    return parse_response(responses[0]) if len(responses) == 1 else merge_responses(responses)
+
+
+def correct_with_llm(text: str, deterministic: bool) -> Tuple[str, List[str]]:
+    prompts = [format_prompt(chunk) for chunk in chunk_for_llm(text)]
+    if len(prompts) == 1:
+        return combine_responses([invoke_llm(prompts[0], deterministic=deterministic)])
+    with ThreadPoolExecutor(max_workers=settings.STT_LLM_CHUNK_CONCURRENCY) as executor:
+        responses = map_in_context(executor, lambda prompt: invoke_llm(prompt, deterministic=deterministic), prompts)
+    return combine_responses(responses)
+
+
+async def acorrect_with_llm(text: str, deterministic: bool) -> Tuple[str, List[str]]:
+    prompts = [format_prompt(chunk) for chunk in chunk_for_llm(text)]
+    limit = asyncio.Semaphore(settings.STT_LLM_CHUNK_CONCURRENCY)
+
+    async def correct_chunk(prompt: List[dict]) -> str:
+        async with limit:
+            return await ainvoke_llm(prompt, deterministic=deterministic)
+
+    return combine_responses(list(await asyncio.gather(*(correct_chunk(prompt) for prompt in prompts))))
+
+
+def normalize_transcript(text: str) -> str:
+    return " ".join(text.split())
+
+
+def correction_cache_key(text: str) -> str:
+    return content_key(normalize_transcript(text).encode("utf-8"), PROMPT_VERSION, LLM_MODEL, str(settings.STT_LLM_SEED))
+
+
+def cached_correction(text: str, deterministic: Optional[bool]) -> Tuple[bool, Optional[str], Optional[Tuple[str, List[str]]]]:
+    # Returns (deterministic, cache key, cached result), only deterministic corrections are repeatable and cached
+    if deterministic is None:
+        deterministic = settings.STT_LLM_DETERMINISTIC
+    if not deterministic:
+        return False, None, None
+    cache_key = correction_cache_key(text)
+    return True, cache_key, correction_cache.get(cache_key)
+
+
+def store_correction(cache_key: Optional[str], result: Tuple[str, List[str]]) -> Tuple[str, List[str]]:
+    if cache_key:
+        correction_cache.set(cache_key, result)
+    return result
+
+
+def llm_correction(text: str, deterministic: Optional[bool] = None) -> Tuple[str, List[str]]:
+    # Returns (corrected text, recommendations)
+    deterministic, cache_key, cached = cached_correction(text, deterministic)
+    if cached is not None:
+        return cached
+    return store_correction(cache_key, correct_with_llm(text, deterministic))
+
+
+async def allm_correction(text: str, deterministic: Optional[bool] = None) -> Tuple[str, List[str]]:
+    deterministic, cache_key, cached = cached_correction(text, deterministic)
+    if cached is not None:
+        return cached
+    return store_correction(cache_key, await acorrect_with_llm(text, deterministic))
+
+
+def run_llm_correction(text: str, deterministic: Optional[bool] = None) -> str:
+    return format_output(*llm_correction(text, deterministic))
+
+
+async def arun_llm_correction(text: str, deterministic: Optional[bool] = None) -> str:
+    return format_output(*await allm_correction(text, deterministic))
+
+
+def correct_locally(text: str) -> Tuple[str, List[MedicationSubstitution]]:
+    if not settings.STT_LOCAL_CORRECTION:
+        return text, []
+    return correct_medications(text, medication_lexicon, min_score=settings.STT_MEDICATION_MIN_SCORE)
+
+
+def can_skip_llm(text: str, substitutions: List[MedicationSubstitution]) -> bool:
+    # Without any substitution there is no evidence the local pass understood the dictation
+    return (
+        settings.STT_LOCAL_CORRECTION_SKIP_LLM
+        and bool(substitutions)
+        and len(text.split()) <= settings.STT_LOCAL_CORRECTION_MAX_WORDS
+        and all(sub.score >= settings.STT_LOCAL_CORRECTION_SKIP_SCORE for sub in substitutions)
+    )
+
+
+def prepare_correction(text: str) -> Tuple[str, List[MedicationSubstitution], Optional[CorrectionResult]]:
+    # Returns the locally corrected text, its substitutions and the final result when the LLM can be skipped
+    corrected, substitutions = correct_locally(text)
+    if can_skip_llm(corrected, substitutions):
+        return corrected, substitutions, CorrectionResult(transcription=corrected, substitutions=substitutions, llm_skipped=True)
+    return corrected, substitutions, None
+
+
+def correct_transcript(text: str, deterministic: Optional[bool] = None) -> CorrectionResult:
+    corrected, substitutions, skipped = prepare_correction(text)
+    if skipped is not None:
+        return skipped
+    return CorrectionResult(transcription=run_llm_correction(corrected, deterministic), substitutions=substitutions)
+
+
+async def acorrect_transcript(text: str, deterministic: Optional[bool] = None) -> CorrectionResult:
+    corrected, substitutions, skipped = prepare_correction(text)
+    if skipped is not None:
+        return skipped
+    return CorrectionResult(transcription=await arun_llm_correction(corrected, deterministic), substitutions=substitutions)
 
-    if response_json.get("recommendations") == []:
-        response_text = response_json.get("text")
-    else:
-        recommendations = "\nDoporučení:\n" + "\n".join([f"• {rec}" for rec in response_json.get("recommendations")])
-        response_text = response_json.get("text") + recommendations
 
-    return response_text
+def run_pipeline(text: str, deterministic: Optional[bool] = None) -> str:
+    return correct_transcript(text, deterministic).transcription
 
 
-def run_pipeline(text: str) -> str:
-    messages = format_prompt(text)
-    response = invoke_llm(messages)
-    return parse_output(response)
+def transcribe_and_correct(filepath: str) -> CorrectionResult:
+    transcription = transcribe_audio_file(filepath)
+    return correct_transcript(transcription)
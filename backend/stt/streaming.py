@@ -0,0 +1,136 @@
+# app/stt/streaming.py
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from stt.config import settings
+from stt.services import (
+    transcribe_audio_file,
+    correct_locally,
+    can_skip_llm,
+    chunk_for_llm,
+    format_prompt,
+    invoke_llm,
+    stream_llm,
+    parse_response,
+    combine_responses,
+    submit_in_context,
+    cached_correction,
+    store_correction
+)
+
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonStringFieldStream:
+    # Decodes one string field of a JSON object while the object is still being generated
+    def __init__(self, field: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._position is None:
+            match = self._pattern.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        buffer = self._buffer
+        position = self._position
+        decoded = []
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self.done = True
+                position += 1
+                break
+            if char != '\\':
+                decoded.append(char)
+                position += 1
+                continue
+            # Escape sequences may be split across chunks, wait for the rest
+            if position + 1 >= len(buffer):
+                break
+            escape = buffer[position + 1]
+            if escape != 'u':
+                decoded.append(JSON_ESCAPES.get(escape, escape))
+                position += 2
+                continue
+            if position + 6 > len(buffer):
+                break
+            code = int(buffer[position + 2:position + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if position + 12 > len(buffer):
+                    break
+                low = int(buffer[position + 8:position + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                position += 6
+            decoded.append(chr(code))
+            position += 6
+        self._position = position
+        return "".join(decoded)
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def result_event(text: str, recommendations: List[str]) -> str:
+    # Every path ends with the same shape: the corrected text without recommendations, and the list of them
+    return sse_event("result", {"transcription": text, "recommendations": recommendations})
+
+
+def stream_transcription_events(filepath: str, deterministic: Optional[bool] = None) -> Iterator[str]:
+    try:
+        transcription = transcribe_audio_file(filepath)
+        yield sse_event("transcript", {"text": transcription})
+
+        corrected, substitutions = correct_locally(transcription)
+        yield sse_event("substitutions", {"substitutions": [sub.model_dump() for sub in substitutions]})
+        if can_skip_llm(corrected, substitutions):
+            yield sse_event("correction", {"delta": corrected})
+            yield result_event(corrected, [])
+            return
+
+        deterministic, cache_key, cached = cached_correction(corrected, deterministic)
+        if cached is not None:
+            text, recommendations = cached
+            yield sse_event("correction", {"delta": text})
+            yield result_event(text, recommendations)
+            return
+
+        # Long transcripts are corrected in chunks like the other paths. Only the first one is streamed,
+        # the rest are corrected in parallel meanwhile and sent whole, in order, once it is done.
+        prompts = [format_prompt(chunk) for chunk in chunk_for_llm(corrected)]
+        with ThreadPoolExecutor(max_workers=settings.STT_LLM_CHUNK_CONCURRENCY) as executor:
+            later = [submit_in_context(executor, invoke_llm, prompt, deterministic) for prompt in prompts[1:]]
+            try:
+                text_stream = JsonStringFieldStream("text")
+                chunks = []
+                for chunk in stream_llm(prompts[0], deterministic=deterministic):
+                    chunks.append(chunk)
+                    delta = text_stream.feed(chunk)
+                    if delta:
+                        yield sse_event("correction", {"delta": delta})
+
+                responses = ["".join(chunks)]
+                for future in later:
+                    responses.append(future.result())
+                    chunk_text = (parse_response(responses[-1])[0] or "").strip()
+                    if chunk_text:
+                        yield sse_event("correction", {"delta": " " + chunk_text})
+            finally:
+                for future in later:
+                    future.cancel()
+
+        text, recommendations = store_correction(cache_key, combine_responses(responses))
+        yield result_event(text, recommendations)
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
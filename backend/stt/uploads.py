@@ -0,0 +1,98 @@
+# app/stt/uploads.py
+
+import os
+import re
+import time
+import uuid
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+
+from stt.config import settings
+
+# Whisper infers the audio format from the file extension, so we keep it
+ALLOWED_EXTENSIONS = ('.webm', '.wav', '.mp3', '.mp4', '.m4a', '.mpeg', '.mpga', '.ogg', '.oga', '.flac')
+DEFAULT_EXTENSION = '.webm'
+PARTIAL_SUFFIX = '.part'
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
+
+_last_cleanup: float = 0.0
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def _extension_for(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if extension in ALLOWED_EXTENSIONS else DEFAULT_EXTENSION
+
+
+def _remove_quietly(filepath: str) -> bool:
+    try:
+        os.remove(filepath)
+        return True
+    except FileNotFoundError:
+        # Another worker sharing the uploads folder got there first
+        return False
+
+
+async def save_upload(file: UploadFile) -> Tuple[str, str]:
+    upload_id = uuid.uuid4().hex
+    filepath = os.path.join(settings.UPLOAD_FOLDER, upload_id + _extension_for(file.filename))
+    partial_path = filepath + PARTIAL_SUFFIX
+
+    written = 0
+    try:
+        with open(partial_path, "wb") as buffer:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > settings.UPLOAD_MAX_BYTES:
+                    raise UploadTooLargeError(f"File exceeds the upload limit of {settings.UPLOAD_MAX_BYTES} bytes")
+                buffer.write(chunk)
+        # Readers only ever see complete files
+        os.replace(partial_path, filepath)
+    except BaseException:
+        _remove_quietly(partial_path)
+        raise
+
+    return upload_id, filepath
+
+
+def resolve_upload(upload_id: str) -> Optional[str]:
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        return None
+    for extension in ALLOWED_EXTENSIONS:
+        filepath = os.path.join(settings.UPLOAD_FOLDER, upload_id + extension)
+        if os.path.isfile(filepath):
+            return filepath
+    return None
+
+
+def cleanup_expired_uploads(now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    cutoff = now - settings.UPLOAD_RETENTION_SECONDS
+    removed = 0
+    with os.scandir(settings.UPLOAD_FOLDER) as entries:
+        for entry in entries:
+            name = entry.name.removesuffix(PARTIAL_SUFFIX)
+            # Only touch files we created ourselves
+            if not UPLOAD_ID_PATTERN.match(os.path.splitext(name)[0]):
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    removed += _remove_quietly(entry.path)
+            except FileNotFoundError:
+                continue
+    return removed
+
+
+def maybe_cleanup_uploads() -> None:
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < settings.UPLOAD_CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_cleanup = now
+    cleanup_expired_uploads(now)
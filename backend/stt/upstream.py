@@ -0,0 +1,274 @@
+# app/stt/upstream.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from metrics import audio_seconds, record_llm_usage, timed, upstream_retries
+from stt.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # Covers timeouts and dropped connections
+    return isinstance(error, openai.APIConnectionError)
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    if isinstance(error, openai.APIStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.STT_UPSTREAM_BACKOFF_MAX_SECONDS)
+            except ValueError:
+                pass
+    backoff = settings.STT_UPSTREAM_BACKOFF_SECONDS * (2 ** attempt)
+    # Full jitter keeps parallel retries from hitting the API in lockstep
+    return random.uniform(0, min(backoff, settings.STT_UPSTREAM_BACKOFF_MAX_SECONDS))
+
+
+class UpstreamClient:
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self._latencies: Dict[str, LatencyTracker] = {}
+
+    def _tracker(self, name: str) -> LatencyTracker:
+        return self._latencies.setdefault(name, LatencyTracker())
+
+    async def _timed(self, name: str, make_call: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await make_call()
+        self._tracker(name).record(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, name: str, make_call: Callable[[], Awaitable[T]]) -> T:
+        threshold = None
+        if settings.STT_UPSTREAM_HEDGE:
+            threshold = self._tracker(name).percentile(
+                settings.STT_UPSTREAM_HEDGE_PERCENTILE,
+                settings.STT_UPSTREAM_HEDGE_MIN_SAMPLES
+            )
+        first = asyncio.create_task(self._timed(name, make_call))
+        if threshold is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=threshold)
+        if done:
+            return first.result()
+
+        # The first request is slower than usual, race a second one against it
+        logger.info(f"Hedging {name} request after {threshold:.2f}s")
+        pending = {first, asyncio.create_task(self._timed(name, make_call))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, name: str, make_call: Callable[[], Awaitable[T]], deadline: float) -> T:
+        async def attempts() -> T:
+            attempt = 0
+            while True:
+                try:
+                    return await self._hedged(name, make_call)
+                except Exception as e:
+                    if attempt >= settings.STT_UPSTREAM_MAX_RETRIES or not is_retryable(e):
+                        raise
+                    upstream_retries.inc(upstream=name, error=type(e).__name__)
+                    delay = retry_delay(e, attempt)
+                    logger.warning(f"{name} request failed ({e}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+        try:
+            return await asyncio.wait_for(attempts(), timeout=deadline)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"{name} request did not finish within {deadline}s")
+
+
+class SyncUpstreamClient:
+    # Same retry policy and deadlines as UpstreamClient for the blocking paths, without hedging.
+    # make_call receives the time left before the deadline and passes it on as the request timeout.
+    def __init__(self, client: OpenAI):
+        self.client = client
+
+    def call(self, name: str, make_call: Callable[[float], T], deadline: float) -> T:
+        expires_at = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"{name} request did not finish within {deadline}s")
+            try:
+                return make_call(remaining)
+            except Exception as e:
+                if attempt >= settings.STT_UPSTREAM_MAX_RETRIES or not is_retryable(e):
+                    raise
+                delay = retry_delay(e, attempt)
+                if time.monotonic() + delay >= expires_at:
+                    raise RuntimeError(f"{name} request did not finish within {deadline}s")
+                upstream_retries.inc(upstream=name, error=type(e).__name__)
+                logger.warning(f"{name} request failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.STT_UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.STT_UPSTREAM_MAX_KEEPALIVE
+    )
+
+
+def http_timeout() -> httpx.Timeout:
+    # Overall time is bounded by the per-upstream deadlines
+    return httpx.Timeout(None, connect=settings.STT_UPSTREAM_CONNECT_TIMEOUT)
+
+
+def create_async_openai_client(base_url: Optional[str] = None) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=base_url or settings.OPENAI_BASE_URL or None,
+        http_client=httpx.AsyncClient(limits=http_limits(), timeout=http_timeout()),
+        # Retries and deadlines are handled by UpstreamClient
+        max_retries=0
+    )
+
+
+def create_openai_client(base_url: Optional[str] = None) -> OpenAI:
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=base_url or settings.OPENAI_BASE_URL or None,
+        http_client=httpx.Client(limits=http_limits(), timeout=http_timeout()),
+        # Retries and deadlines are handled by SyncUpstreamClient
+        max_retries=0
+    )
+
+
+upstream = UpstreamClient(create_async_openai_client())
+sync_upstream = SyncUpstreamClient(create_openai_client())
+
+
+def transcription_request(audio_file, model: str, language: str, prompt) -> dict:
+    return {
+        "model": model,
+        "file": audio_file,
+        "response_format": "text",
+        "language": language,
+        "prompt": prompt
+    }
+
+
+def chat_request(messages: List[dict], model: str, **options) -> dict:
+    return {
+        "messages": messages,
+        "model": model,
+        "response_format": {"type": "json_object"},
+        **options
+    }
+
+
+def chat_content(response, model: str) -> str:
+    record_llm_usage(model, response.usage)
+    return response.choices[0].message.content
+
+
+# Timed and counted here so cache hits and preprocessing never show up as Whisper time.
+# seconds is the duration of the uploaded audio, it is only counted once Whisper has transcribed it.
+@timed("whisper")
+def transcribe_audio(audio_file, model: str, language: str, prompt, seconds: Optional[float] = None) -> str:
+    request = transcription_request(audio_file, model, language, prompt)
+    text = sync_upstream.call(
+        "whisper",
+        lambda timeout: sync_upstream.client.audio.transcriptions.create(**request, timeout=timeout),
+        deadline=settings.STT_WHISPER_DEADLINE_SECONDS
+    )
+    if seconds is not None:
+        audio_seconds.inc(seconds)
+    return text
+
+
+@timed("whisper")
+async def atranscribe_audio(audio_file, model: str, language: str, prompt, seconds: Optional[float] = None) -> str:
+    request = transcription_request(audio_file, model, language, prompt)
+    text = await upstream.call(
+        "whisper",
+        lambda: upstream.client.audio.transcriptions.create(**request),
+        deadline=settings.STT_WHISPER_DEADLINE_SECONDS
+    )
+    if seconds is not None:
+        audio_seconds.inc(seconds)
+    return text
+
+
+def complete_chat(messages: List[dict], model: str, **options) -> str:
+    request = chat_request(messages, model, **options)
+    response = sync_upstream.call(
+        "llm",
+        lambda timeout: sync_upstream.client.chat.completions.create(**request, timeout=timeout),
+        deadline=settings.STT_LLM_DEADLINE_SECONDS
+    )
+    return chat_content(response, model)
+
+
+async def acomplete_chat(messages: List[dict], model: str, **options) -> str:
+    request = chat_request(messages, model, **options)
+    response = await upstream.call(
+        "llm",
+        lambda: upstream.client.chat.completions.create(**request),
+        deadline=settings.STT_LLM_DEADLINE_SECONDS
+    )
+    return chat_content(response, model)
+
+
+def stream_chat(messages: List[dict], model: str, **options) -> Iterator[str]:
+    # Only opening the stream is retried, a stream that fails halfway has already been partly delivered
+    request = chat_request(messages, model, stream=True, stream_options={"include_usage": True}, **options)
+    stream = sync_upstream.call(
+        "llm",
+        lambda timeout: sync_upstream.client.chat.completions.create(**request, timeout=timeout),
+        deadline=settings.STT_LLM_DEADLINE_SECONDS
+    )
+    for chunk in stream:
+        # The last chunk carries usage and no choices
+        record_llm_usage(model, chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when the packages are imported, so the environment is prepared before any test module loads
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+
+for name in (
+    "OPENAI_API_KEY", "LANGCHAIN_ENDPOINT", "LANGCHAIN_PROJECT", "LANGCHAIN_API_KEY",
+    "LANGTAIL_API_KEY", "LANGTAIL_WORKSPACE", "LANGTAIL_PROJECT", "LANGTAIL_PROMPT", "LANGTAIL_ENVIRONMENT",
+    "QDRANT_COLLECTION_NAME", "VOYAGE_API_KEY", "VOYAGE_MODEL", "OPEN_DATA_API_KEY",
+    "AUTH_USERNAME1", "AUTH_PASSWORD1"
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+os.environ["UPLOAD_FOLDER"] = os.path.join(TEST_DIR, "uploads")
+os.environ["STT_TRANSCRIPTION_CACHE_DIR"] = os.path.join(TEST_DIR, "transcriptions")
+os.environ["QDRANT_SEED_MARKER_PATH"] = os.path.join(TEST_DIR, "qdrant_seeded")
+os.environ["SEED_CHECKPOINT_PATH"] = os.path.join(TEST_DIR, "seed_checkpoint.json")
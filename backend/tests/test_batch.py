@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from stt import batch
+from stt.models import CorrectionResult
+
+
+async def collect(items):
+    return [json.loads(line) async for line in batch.run_batch(items)]
+
+
+def test_batch_reports_each_item_and_isolates_failures(monkeypatch):
+    async def transcribe(filepath):
+        if filepath == "broken.webm":
+            raise RuntimeError("decoding failed")
+        await asyncio.sleep(0.05 if filepath == "slow.webm" else 0)
+        return f"text of {filepath}"
+
+    async def correct(text):
+        return CorrectionResult(transcription=text.upper())
+
+    monkeypatch.setattr(batch, "atranscribe_audio_file", transcribe)
+    monkeypatch.setattr(batch, "acorrect_transcript", correct)
+    items = [
+        batch.BatchItem(index=0, filename="slow.webm", filepath="slow.webm"),
+        batch.BatchItem(index=1, filename="broken.webm", filepath="broken.webm"),
+        batch.BatchItem(index=2, upload_id="f" * 32, error="File not found"),
+        batch.BatchItem(index=3, filename="fast.webm", filepath="fast.webm"),
+    ]
+
+    results = asyncio.run(collect(items))
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "succeeded" and by_index[0]["transcription"] == "TEXT OF SLOW.WEBM"
+    assert by_index[1]["status"] == "failed" and by_index[1]["error"] == "decoding failed"
+    assert by_index[2]["status"] == "failed" and by_index[2]["error"] == "File not found"
+    assert by_index[3]["status"] == "succeeded"
+    # Results stream in completion order, the slow item comes last
+    assert results[-1]["index"] == 0
+
+
+def test_batch_respects_the_whisper_limit(monkeypatch):
+    running = []
+    peak = []
+
+    async def transcribe(filepath):
+        running.append(filepath)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(filepath)
+        return filepath
+
+    async def correct(text):
+        return CorrectionResult(transcription=text)
+
+    async def run():
+        monkeypatch.setattr(batch, "whisper_limit", asyncio.Semaphore(2))
+        items = [batch.BatchItem(index=index, filepath=f"{index}.webm") for index in range(6)]
+        return await collect(items)
+
+    monkeypatch.setattr(batch, "atranscribe_audio_file", transcribe)
+    monkeypatch.setattr(batch, "acorrect_transcript", correct)
+    assert len(asyncio.run(run())) == 6
+    assert max(peak) == 2
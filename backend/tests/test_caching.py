@@ -0,0 +1,53 @@
+import time
+
+from caching import LRUCache
+from rag.cache import VectorCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "entries": 2}
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=2, ttl_seconds=10)
+    cache.set("a", 1)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_clear_and_disabled_cache():
+    cache = LRUCache(max_entries=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_vector_cache_promotes_persistent_hits():
+    persistent = LRUCache(max_entries=10)
+    persistent.set("query", [0.1, 0.2])
+    cache = VectorCache("test_vectors", LRUCache(max_entries=10), persistent)
+
+    assert cache.get("query") == [0.1, 0.2]
+    assert cache.get("query") == [0.1, 0.2]
+    assert cache.get("other") is None
+    assert cache.stats() == {
+        "memory_hits": 1,
+        "persistent_hits": 1,
+        "misses": 1,
+        "memory_entries": 1,
+        "hit_ratio": 2 / 3
+    }
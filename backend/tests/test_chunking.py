@@ -0,0 +1,68 @@
+import pytest
+
+from stt import chunking
+from stt.chunking import chunk_transcript, split_sentences
+
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    # Three characters per token, the same estimate used when tiktoken is unavailable
+    monkeypatch.setattr(chunking, "_encoding", lambda model: None)
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences(" Oko klidné. Vizus 1,0! Kontrola? ") == ["Oko klidné.", "Vizus 1,0!", "Kontrola?"]
+
+
+def test_short_transcripts_are_one_chunk(estimated_tokens):
+    assert chunk_transcript("Oko klidné. Vizus 1,0.", max_tokens=100) == ["Oko klidné. Vizus 1,0."]
+
+
+def test_chunks_break_between_sentences_and_keep_all_text(estimated_tokens):
+    sentences = [f"Věta číslo {index} je o oku." for index in range(20)]
+    text = " ".join(sentences)
+    chunks = chunk_transcript(text, max_tokens=30)
+
+    assert len(chunks) > 1
+    assert " ".join(chunks) == text
+    assert all(chunking.count_tokens(chunk) <= 30 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_long_sentences_are_split_between_words(estimated_tokens):
+    sentence = " ".join(["slovo"] * 100) + "."
+    chunks = chunk_transcript(sentence, max_tokens=20)
+
+    assert len(chunks) > 1
+    assert " ".join(chunks) == sentence
+    assert all(chunking.count_tokens(chunk) <= 20 for chunk in chunks)
+
+
+def test_long_sentences_encode_each_word_once(estimated_tokens, monkeypatch):
+    calls = []
+    count_tokens = chunking.count_tokens
+    monkeypatch.setattr(chunking, "count_tokens", lambda text, model="gpt-4o": calls.append(text) or count_tokens(text, model))
+    sentence = " ".join(["slovo"] * 1000)
+
+    chunks = chunk_transcript(sentence, max_tokens=20)
+    assert " ".join(chunks) == sentence
+    # The whole sentence once, then every word once
+    assert len(calls) == 1001
+
+
+def test_missing_tokenizer_is_only_looked_up_once(monkeypatch):
+    tiktoken = pytest.importorskip("tiktoken")
+    chunking._encoding.cache_clear()
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        raise OSError("no network")
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", encoding_for_model)
+    try:
+        assert chunking.count_tokens("abcdef") == 3
+        assert chunking.count_tokens("abcdefghi") == 4
+        assert calls == ["gpt-4o"]
+    finally:
+        chunking._encoding.cache_clear()
@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+
+from caching import LRUCache
+from rag.cache import VectorCache
+from rag.clients import AsyncClients
+from rag.config.settings import settings
+from rag.services import embedding_service, langtail_service
+
+REPLY = {"choices": [{"message": {"content": "zdravotní dokumentace"}}], "usage": {"prompt_tokens": 5, "completion_tokens": 2}}
+
+
+def test_async_clients_are_created_once_and_reset_on_close():
+    clients = AsyncClients()
+
+    async def run():
+        await clients.open()
+        langtail, qdrant, session = clients.langtail, clients.qdrant, clients.voyage_session
+        assert clients.langtail is langtail and clients.qdrant is qdrant and clients.voyage_session is session
+        await clients.close()
+        assert session.closed
+        return langtail
+
+    langtail = asyncio.run(run())
+    assert langtail.is_closed
+    assert clients._langtail is None and clients._qdrant is None and clients._voyage_session is None
+
+
+def test_query_embeddings_are_batched_and_deduplicated(monkeypatch):
+    monkeypatch.setattr(embedding_service, "query_embedding_cache", VectorCache("test_embeddings", LRUCache(max_entries=10)))
+    requests_seen = []
+
+    async def aget_embeddings(texts, input_type=None):
+        requests_seen.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(embedding_service, "aget_embeddings", aget_embeddings)
+
+    async def run():
+        first = await embedding_service.aembed_queries(["oko", "Oko ", "víčko"])
+        second = await embedding_service.aembed_query("víčko")
+        return first, second
+
+    assert asyncio.run(run()) == ([[3.0], [3.0], [5.0]], [5.0])
+    assert requests_seen == [["oko", "víčko"]]
+
+
+def test_async_enhancement_uses_the_shared_client(monkeypatch):
+    monkeypatch.setattr(langtail_service, "enhanced_query_cache", LRUCache(max_entries=10))
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        return httpx.Response(200, json=REPLY)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(langtail_service.async_clients, "_langtail", client)
+
+    async def run():
+        first = await langtail_service.aenhance_query_with_langtail("dotaz")
+        second = await langtail_service.aenhance_query_with_langtail("dotaz")
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(run()) == ("zdravotní dokumentace", "zdravotní dokumentace")
+    assert len(requests_seen) == 1
+    assert requests_seen[0].headers["X-API-Key"] == settings.LANGTAIL_API_KEY
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from rag.cache import SemanticCache, mark_collection_seeded
+from rag.config.settings import settings
+from rag.models.types import BatchQuery, BatchQueryRequest, QueryRequest, RelevantDocument
+from rag.routers import context as router
+from rag.services import context_service, result_cache
+
+
+def document(cislo: str) -> RelevantDocument:
+    return RelevantDocument(
+        law_nazev="Zákon o zdravotních službách",
+        law_id="372",
+        law_year="2011",
+        law_category=None,
+        law_date=None,
+        law_staleURL=None,
+        paragraph_cislo=cislo,
+        paragraph_zneni=f"Znění § {cislo}"
+    )
+
+
+def test_semantic_cache_matches_close_embeddings_only():
+    cache = SemanticCache("test", max_entries=2, threshold=0.95)
+    cache.set([1.0, 0.0], "a")
+
+    assert cache.get([0.99, 0.05]) == "a"
+    assert cache.get([0.0, 1.0]) is None
+    assert cache.get([0.99, 0.05], accept=lambda value: value != "a") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache("test", max_entries=2, threshold=0.95)
+    cache.set([1.0, 0.0], "a")
+    cache.set([0.0, 1.0], "b")
+    assert cache.get([1.0, 0.0]) == "a"
+    cache.set([0.7, 0.7], "c")
+
+    assert cache.get([0.0, 1.0]) is None
+    assert cache.get([1.0, 0.0]) == "a"
+
+
+def test_semantic_cache_is_cleared_after_reseeding(tmp_path):
+    marker = str(tmp_path / "seeded")
+    cache = SemanticCache("test", max_entries=2, threshold=0.95, marker_path=marker)
+    cache.set([1.0, 0.0], "a")
+    mark_collection_seeded(marker)
+    assert cache.get([1.0, 0.0]) is None
+
+
+@pytest.fixture
+def search(monkeypatch):
+    # Records every query embedding and returns one document per search
+    embedded = []
+
+    async def aembed_query(query):
+        embedded.append(query)
+        return [1.0, 0.0]
+
+    async def asearch_qdrant(embedding, top_n):
+        return [document("1")]
+
+    async def aenhance_query_with_langtail(query):
+        return f"{query} enhanced"
+
+    monkeypatch.setattr(router, "aembed_query", aembed_query)
+    monkeypatch.setattr(context_service, "aembed_query", aembed_query)
+    monkeypatch.setattr(context_service, "asearch_qdrant", asearch_qdrant)
+    monkeypatch.setattr(context_service, "search_keywords", lambda query, top_n: [document("2")])
+    monkeypatch.setattr(context_service, "cached_enhancement", lambda query: None)
+    monkeypatch.setattr(context_service, "aenhance_query_with_langtail", aenhance_query_with_langtail)
+    monkeypatch.setattr(settings, "LANGTAIL_RACE", False)
+    monkeypatch.setattr(result_cache, "context_cache", SemanticCache("test", max_entries=10, threshold=0.95))
+    return embedded
+
+
+def get_context(query: str, mode: str):
+    return asyncio.run(router.get_context(request=QueryRequest(query=query, mode=mode), n=3, username="test"))
+
+
+def test_bm25_requests_never_embed(search):
+    response = get_context("lékařská zpráva", "bm25")
+    assert [doc.paragraph_cislo for doc in response.relevant_docs] == ["2"]
+    assert search == []
+
+
+def test_dense_requests_reuse_cached_context(search):
+    assert get_context("lékařská zpráva", "dense").query_source == "enhanced"
+    assert get_context("lékařská zpráva", "dense").query_source == "cache"
+    assert search == ["lékařská zpráva", "lékařská zpráva enhanced", "lékařská zpráva"]
+
+
+def test_raw_embedding_runs_alongside_langtail(search, monkeypatch):
+    # Each call waits for the other one to start, which only works if neither waits for the other to finish
+    async def run():
+        started = {"embedding": asyncio.Event(), "langtail": asyncio.Event()}
+
+        async def aembed_query(query):
+            started["embedding"].set()
+            await asyncio.wait_for(started["langtail"].wait(), 1)
+            search.append(query)
+            return [1.0, 0.0]
+
+        async def aenhance_query_with_langtail(query):
+            started["langtail"].set()
+            await asyncio.wait_for(started["embedding"].wait(), 1)
+            return f"{query} enhanced"
+
+        monkeypatch.setattr(router, "aembed_query", aembed_query)
+        monkeypatch.setattr(context_service, "aenhance_query_with_langtail", aenhance_query_with_langtail)
+        return await router.get_context(request=QueryRequest(query="lékařská zpráva", mode="dense"), n=3, username="test")
+
+    assert asyncio.run(run()).query_source == "enhanced"
+    assert search == ["lékařská zpráva", "lékařská zpráva enhanced"]
+
+
+def test_disabled_semantic_cache_only_embeds_the_searched_query(search, monkeypatch):
+    monkeypatch.setattr(settings, "SEMANTIC_CACHE_SIZE", 0)
+    assert get_context("lékařská zpráva", "hybrid").query_source == "enhanced"
+    assert search == ["lékařská zpráva enhanced"]
+
+
+def test_batch_falls_back_to_raw_query_per_item(search, monkeypatch):
+    async def aenhance_query_with_langtail(query):
+        if query == "selhání":
+            raise RuntimeError("Langtail is down")
+        return f"{query} enhanced"
+
+    async def aembed_queries(queries):
+        search.extend(queries)
+        return [[1.0, 0.0] for _ in queries]
+
+    async def asearch_qdrant_batch(embeddings, top_ns):
+        return [[document("1")] for _ in embeddings]
+
+    monkeypatch.setattr(context_service, "aenhance_query_with_langtail", aenhance_query_with_langtail)
+    monkeypatch.setattr(context_service, "aembed_queries", aembed_queries)
+    monkeypatch.setattr(context_service, "asearch_qdrant_batch", asearch_qdrant_batch)
+
+    results = asyncio.run(context_service.search_batch(["dotaz", "selhání"], [3, 3], ["dense", "dense"]))
+    assert [query_source for _, query_source in results] == ["enhanced", "raw"]
+    assert search == ["dotaz enhanced", "selhání"]
+
+
+def test_batch_responses_report_their_query_source(search, monkeypatch):
+    async def search_batch(queries, top_ns, modes):
+        return [([document("1")], "enhanced"), ([document("2")], "raw")]
+
+    monkeypatch.setattr(router, "search_batch", search_batch)
+    request = BatchQueryRequest(queries=[BatchQuery(query="dotaz"), BatchQuery(query="selhání")])
+    response = asyncio.run(router.get_context_batch(request=request, username="test"))
+    assert [result.query_source for result in response.results] == ["enhanced", "raw"]
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from stt import services
+from caching import LRUCache
+from stt.config import settings
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    def invoke_llm(messages, deterministic=False):
+        calls.append((messages[-1]["content"], deterministic))
+        return json.dumps({"text": "Opravený text.", "recommendations": ["Kontrola za týden"]}, ensure_ascii=False)
+
+    monkeypatch.setattr(services, "invoke_llm", invoke_llm)
+    monkeypatch.setattr(services, "correction_cache", LRUCache(max_entries=10))
+    return calls
+
+
+def test_format_output_appends_recommendations():
+    assert services.format_output("Text.", []) == "Text."
+    assert services.format_output("Text.", ["A", "B"]) == "Text.\nDoporučení:\n• A\n• B"
+
+
+def test_deterministic_corrections_are_memoized(llm):
+    first = services.run_llm_correction("pacient  bez obtizi", deterministic=True)
+    second = services.run_llm_correction("pacient bez obtizi ", deterministic=True)
+
+    assert first == second == "Opravený text.\nDoporučení:\n• Kontrola za týden"
+    assert len(llm) == 1
+    assert llm[0][1] is True
+
+
+def test_sampled_corrections_are_never_cached(llm):
+    services.run_llm_correction("pacient bez obtizi", deterministic=False)
+    services.run_llm_correction("pacient bez obtizi", deterministic=False)
+    assert [deterministic for _, deterministic in llm] == [False, False]
+
+
+def test_cache_key_depends_on_seed(monkeypatch):
+    key = services.correction_cache_key("text")
+    monkeypatch.setattr(settings, "STT_LLM_SEED", settings.STT_LLM_SEED + 1)
+    assert services.correction_cache_key("text") != key
+
+
+def test_llm_options():
+    assert services.llm_options(True) == {"temperature": 0, "seed": settings.STT_LLM_SEED}
+    assert services.llm_options(False) == {"temperature": 1}
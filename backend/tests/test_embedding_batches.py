@@ -0,0 +1,92 @@
+import pytest
+
+from rag.config.settings import settings
+from rag.models.types import RelevantDocument
+from rag.services import qdrant_service
+from rag.services.qdrant_service import unique_documents
+from rag.voyage_embed import batching
+from rag.voyage_embed.batching import get_embeddings_batched, pack_by_tokens, split_into_chunks, split_paragraph
+
+
+def document(cislo: str) -> RelevantDocument:
+    return RelevantDocument(
+        law_nazev="Zákon",
+        law_id="372",
+        law_year="2011",
+        law_category=None,
+        law_date=None,
+        law_staleURL=None,
+        paragraph_cislo=cislo,
+        paragraph_zneni=f"Znění § {cislo}"
+    )
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # One token per three characters, plus one
+    monkeypatch.setattr(batching, "_encoding", lambda: None)
+
+
+def test_pack_by_tokens_keeps_order_and_limits():
+    assert pack_by_tokens([5, 5, 5, 20, 1], max_tokens=10, max_texts=10) == [range(0, 2), range(2, 3), range(3, 4), range(4, 5)]
+    assert pack_by_tokens([1, 1, 1], max_tokens=100, max_texts=2) == [range(0, 2), range(2, 3)]
+    assert pack_by_tokens([], max_tokens=10, max_texts=2) == []
+
+
+def test_split_into_chunks_overlaps_and_covers_every_word():
+    words = [f"w{index:02d}" for index in range(30)]
+    chunks = split_into_chunks(" ".join(words), max_tokens=10, overlap_tokens=4)
+
+    assert len(chunks) > 1
+    assert chunks[0].split()[0] == "w00" and chunks[-1].split()[-1] == "w29"
+    for previous, following in zip(chunks, chunks[1:]):
+        # The next chunk starts inside the previous one and moves forward
+        assert following.split()[0] in previous.split()
+        assert following.split()[0] != previous.split()[0]
+    assert all(sum(batching.count_tokens_batch([" " + word for word in chunk.split()])) <= 10 for chunk in chunks)
+
+
+def test_split_paragraph_keeps_short_paragraphs_whole(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_CHUNK_MAX_TOKENS", 100)
+    assert split_paragraph("Krátký odstavec.") == [("Krátký odstavec.", 6)]
+
+
+def test_batched_embeddings_come_back_in_input_order(monkeypatch):
+    requests = []
+
+    def get_embeddings(texts, input_type=None, model=None):
+        requests.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(batching, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_TOKENS", 10)
+    texts = ["a" * 12, "b" * 3, "c" * 20, "d"]
+    assert get_embeddings_batched(texts) == [[12.0], [3.0], [20.0], [1.0]]
+    assert len(requests) > 1
+
+
+def test_dense_results_collapse_chunks_of_one_paragraph(monkeypatch):
+    class Index:
+        def search(self, embedding, top_n):
+            ids = ["1a", "1b", "2", "1c", "3"][:top_n]
+            return [(1.0, point_id, document(point_id[0]).model_dump()) for point_id in ids]
+
+    monkeypatch.setattr(qdrant_service, "local_index", Index())
+    monkeypatch.setattr(qdrant_service, "document_store", None)
+    monkeypatch.setattr(settings, "SEARCH_CHUNK_HEADROOM", 3)
+
+    assert [doc.paragraph_cislo for doc in qdrant_service.search_local_index([1.0], 2)] == ["1", "2"]
+    assert [doc.paragraph_cislo for doc in unique_documents([document("1"), document("1"), document("2")], 5)] == ["1", "2"]
+
+
+def test_hits_missing_from_the_document_store_are_dropped(monkeypatch):
+    class Store:
+        def payload(self, point_id):
+            return document("1").model_dump() if point_id == "1" else None
+
+    slim = {"law_id": "372", "law_year": "2011", "paragraph_cislo": "2"}
+    monkeypatch.setattr(qdrant_service, "document_store", Store())
+
+    results = qdrant_service.hydrate_results([("1", slim), ("2", slim), ("3", document("3").model_dump())], 5)
+    # Point 2 only has a slim payload, point 3 still carries its full payload
+    assert [doc.paragraph_cislo for doc in results] == ["1", "3"]
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+
+from rag.index import (
+    BM25Index,
+    BM25IndexWriter,
+    DocumentStore,
+    DocumentStoreWriter,
+    LocalIndexWriter,
+    LocalVectorIndex,
+    PublishedState,
+    publish_version
+)
+from rag.models.types import Law
+
+LAW = Law(nazev="Zákon o zdravotních službách", id="372", year="2011", category="zdravotnictví")
+PAYLOADS = [
+    {"law_nazev": LAW.nazev, "paragraph_cislo": "1", "paragraph_zneni": "Zdravotní dokumentace pacienta"},
+    {"law_nazev": LAW.nazev, "paragraph_cislo": "2", "paragraph_zneni": "Poskytovatel vede zdravotní dokumentaci"},
+    {"law_nazev": LAW.nazev, "paragraph_cislo": "3", "paragraph_zneni": "Oprávnění k nahlížení"}
+]
+
+
+def build_all(directory: str) -> None:
+    vectors = LocalIndexWriter(directory)
+    vectors.add([1, 2, 3], [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]], PAYLOADS)
+    vectors.commit()
+    keywords = BM25IndexWriter(directory)
+    keywords.add([1, 2, 3], PAYLOADS)
+    keywords.commit()
+    documents = DocumentStoreWriter(directory)
+    law_row = documents.add_law(LAW)
+    for point_id, payload in zip([1, 2, 3], PAYLOADS):
+        documents.add_point(point_id, documents.add_paragraph(law_row, payload["paragraph_cislo"], payload["paragraph_zneni"]))
+    documents.commit()
+
+
+def test_index_kinds_can_share_a_directory(tmp_path):
+    directory = str(tmp_path)
+    build_all(directory)
+    # A second build of every kind only removes that kind's previous files
+    build_all(directory)
+
+    assert [point_id for _, point_id, _ in LocalVectorIndex(directory).search([1.0, 0.1], 2)] == [1, 3]
+    assert [point_id for _, point_id, _ in BM25Index(directory).search("zdravotní dokumentace", 3)][:2] == [1, 2]
+    assert DocumentStore(directory).payload(2)["paragraph_zneni"] == PAYLOADS[1]["paragraph_zneni"]
+    versions = {name.rsplit("-", 1)[-1] for name in os.listdir(directory) if "-" in name}
+    assert len(versions) == 3
+
+
+def test_reload_closes_the_replaced_state(tmp_path):
+    directory = str(tmp_path)
+    build_all(directory)
+    store = DocumentStore(directory)
+    assert store.payload(1)["law_id"] == "372"
+    old_state = store._published._state
+
+    build_all(directory)
+    os.utime(os.path.join(directory, "documents.meta.json"), (0, 1))
+    assert store.payload(1)["law_id"] == "372"
+    assert store._published._state is not old_state
+    assert old_state["paragraphs"]._file.closed
+
+
+def test_pinned_state_is_closed_after_its_last_reader(tmp_path):
+    closed = []
+    publish_version(str(tmp_path), "test", {"version": "a"})
+    published = PublishedState(str(tmp_path), "test", lambda meta: dict(meta), closed.append)
+
+    with published.pin() as first:
+        assert first == {"version": "a"}
+        publish_version(str(tmp_path), "test", {"version": "b"})
+        os.utime(os.path.join(str(tmp_path), "test.meta.json"), (0, 1))
+        with published.pin() as second:
+            assert second == {"version": "b"}
+        assert closed == []
+    assert closed == [{"version": "a"}]
+
+    published.close()
+    assert closed == [{"version": "a"}, {"version": "b"}]
+
+
+def test_missing_index_raises(tmp_path):
+    with pytest.raises(RuntimeError, match="No local index"):
+        LocalVectorIndex(str(tmp_path)).search([1.0], 1)
+    assert DocumentStore(str(tmp_path)).payload(1) is None
+
+
+def test_float16_index_scores_match_float32(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(50, 8)).tolist()
+    for dtype in ("float32", "float16"):
+        writer = LocalIndexWriter(str(tmp_path / dtype), dtype)
+        writer.add(list(range(50)), vectors, [{} for _ in vectors])
+        writer.commit()
+    query = vectors[7]
+    full = [point_id for _, point_id, _ in LocalVectorIndex(str(tmp_path / "float32")).search(query, 5)]
+    half = [point_id for _, point_id, _ in LocalVectorIndex(str(tmp_path / "float16")).search(query, 5)]
+    assert full[0] == half[0] == 7
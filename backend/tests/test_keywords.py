@@ -0,0 +1,52 @@
+import pytest
+
+from rag.index.bm25 import stem, tokenize
+from rag.models.types import RelevantDocument
+from rag.services import keyword_service
+from rag.services.keyword_service import fuse_rrf
+
+
+def document(cislo: str, law_id: str = "372") -> RelevantDocument:
+    return RelevantDocument(
+        law_nazev="Zákon",
+        law_id=law_id,
+        law_year="2011",
+        law_category=None,
+        law_date=None,
+        law_staleURL=None,
+        paragraph_cislo=cislo,
+        paragraph_zneni=f"Znění § {cislo}"
+    )
+
+
+def test_tokenize_folds_diacritics_and_drops_stopwords():
+    assert tokenize("Zdravotní dokumentace a péče") == ["zdravotn", "dokumentac", "pec"]
+
+
+def test_tokenize_keeps_citations_whole_and_split():
+    assert tokenize("podle zákona 372/2011") == ["podl", "zakon", "372/2011", "372", "2011"]
+    assert tokenize(None) == []
+
+
+def test_stem_keeps_short_words_and_numbers():
+    assert stem("oko") == "oko"
+    assert stem("2011") == "2011"
+    assert stem("pacientem") == "pacient"
+
+
+def test_rrf_rewards_documents_found_by_both_rankings():
+    dense = [document("1"), document("2"), document("3")]
+    keyword = [document("3"), document("4"), document("1")]
+    fused = fuse_rrf([dense, keyword], top_n=3, k=60)
+    assert [doc.paragraph_cislo for doc in fused] == ["1", "3", "2"]
+
+
+def test_rrf_keeps_paragraphs_of_different_laws_apart():
+    fused = fuse_rrf([[document("1", "372")], [document("1", "89")]], top_n=5)
+    assert [doc.law_id for doc in fused] == ["372", "89"]
+
+
+def test_keyword_search_needs_an_index(monkeypatch):
+    monkeypatch.setattr(keyword_service, "keyword_index", None)
+    with pytest.raises(RuntimeError, match="build the BM25 index"):
+        keyword_service.search_keywords("dotaz", 3)
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+import requests
+
+from caching import LRUCache
+from rag.config.settings import settings
+from rag.services import context_service, langtail_service
+
+REPLY = {"choices": [{"message": {"content": "zdravotní dokumentace"}}], "usage": {"prompt_tokens": 5, "completion_tokens": 2}}
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LRUCache(max_entries=10)
+    monkeypatch.setattr(langtail_service, "enhanced_query_cache", cache)
+    return cache
+
+
+def test_enhancements_are_cached_by_normalized_query(cache, monkeypatch):
+    posts = []
+    monkeypatch.setattr(langtail_service.session, "post", lambda url, **kwargs: posts.append(kwargs["json"]) or FakeResponse(REPLY))
+
+    assert langtail_service.enhance_query_with_langtail("lékařská  zpráva") == "zdravotní dokumentace"
+    assert langtail_service.enhance_query_with_langtail(" lékařská zpráva\n") == "zdravotní dokumentace"
+    assert posts == [{"variables": {"query": "lékařská  zpráva"}, "stream": False}]
+    assert langtail_service.cached_enhancement("lékařská zpráva") == "zdravotní dokumentace"
+
+
+def test_failed_enhancements_raise_and_are_not_cached(cache, monkeypatch):
+    monkeypatch.setattr(langtail_service.session, "post", lambda url, **kwargs: FakeResponse({}, status_code=502))
+    with pytest.raises(RuntimeError, match="Failed to enhance query"):
+        langtail_service.enhance_query_with_langtail("dotaz")
+    assert len(cache) == 0
+
+
+def test_unexpected_responses_are_value_errors(cache, monkeypatch):
+    monkeypatch.setattr(langtail_service.session, "post", lambda url, **kwargs: FakeResponse({"choices": []}))
+    with pytest.raises(ValueError, match="Unexpected response format"):
+        langtail_service.enhance_query_with_langtail("dotaz")
+
+
+@pytest.fixture
+def race(cache, monkeypatch):
+    # Langtail answers after a scripted delay, searches return the query they ran with
+    langtail = {"delay": 0.0, "error": None}
+
+    async def aenhance_query_with_langtail(query):
+        await asyncio.sleep(langtail["delay"])
+        if langtail["error"]:
+            raise langtail["error"]
+        cache.set(langtail_service.enhancement_cache_key(query), f"{query} enhanced")
+        return f"{query} enhanced"
+
+    async def retrieve(query, embedding, top_n, mode):
+        return [query]
+
+    monkeypatch.setattr(context_service, "aenhance_query_with_langtail", aenhance_query_with_langtail)
+    monkeypatch.setattr(context_service, "cached_enhancement", langtail_service.cached_enhancement)
+    monkeypatch.setattr(context_service, "retrieve", retrieve)
+    monkeypatch.setattr(settings, "LANGTAIL_RACE", True)
+    monkeypatch.setattr(settings, "LANGTAIL_RACE_BUDGET_SECONDS", 0.05)
+    return langtail
+
+
+def test_race_uses_enhancement_within_budget(race):
+    result = asyncio.run(context_service.search_with_enhancement("dotaz", None, 3, "dense"))
+    assert result == (["dotaz enhanced"], "enhanced")
+
+
+def test_race_falls_back_to_raw_query_and_caches_late_enhancement(race, cache):
+    race["delay"] = 0.2
+
+    async def run():
+        result = await context_service.search_with_enhancement("dotaz", None, 3, "dense")
+        # The late Langtail call keeps running and fills the cache for the next request
+        await asyncio.sleep(0.3)
+        return result
+
+    assert asyncio.run(run()) == (["dotaz"], "raw")
+    assert langtail_service.cached_enhancement("dotaz") == "dotaz enhanced"
+    assert asyncio.run(context_service.search_with_enhancement("dotaz", None, 3, "dense")) == (["dotaz enhanced"], "enhanced")
+
+
+def test_race_falls_back_to_raw_query_when_langtail_fails(race):
+    race["error"] = RuntimeError("Langtail is down")
+    result = asyncio.run(context_service.search_with_enhancement("dotaz", None, 3, "dense"))
+    assert result == (["dotaz"], "raw")
+
+
+
+def test_race_cancels_the_raw_search_when_langtail_raises_anything_else(race, monkeypatch):
+    race["error"] = ConnectionError("connection reset")
+    raw = {}
+
+    async def retrieve(query, embedding, top_n, mode):
+        raw["task"] = asyncio.current_task()
+        await asyncio.sleep(1)
+        return [query]
+
+    monkeypatch.setattr(context_service, "retrieve", retrieve)
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await context_service.search_with_enhancement("dotaz", None, 3, "dense")
+        # Checked before asyncio.run cancels leftover tasks itself
+        return raw["task"].done()
+
+    assert asyncio.run(run())
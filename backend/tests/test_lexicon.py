@@ -0,0 +1,58 @@
+import pytest
+
+from stt import services
+from stt.config import settings
+from stt.lexicon import correct_medications, load_lexicon, split_ending
+from stt.medications import medications
+from stt.models import MedicationSubstitution
+
+lexicon = load_lexicon(medications)
+
+
+def correct(text: str) -> str:
+    return correct_medications(text, lexicon, min_score=0.8)[0]
+
+
+def test_split_ending_keeps_a_minimum_stem():
+    assert split_ending("tobrexem") == ("tobrex", "em")
+    assert split_ending("oko") == ("oko", "")
+
+
+@pytest.mark.parametrize("text", [
+    "Nasazen tobrexem třikrát denně.",
+    "Pokračovat v dexamethason kapkách.",
+    "Xalatanu ráno.",
+    "Firma má monopol na trhu.",
+    "Oko je klidné, tabletu večer.",
+])
+def test_correct_or_ordinary_words_are_left_alone(text):
+    assert correct_medications(text, lexicon, min_score=0.8) == (text, [])
+
+
+def test_misspelled_inflected_names_keep_their_ending():
+    text, substitutions = correct_medications("Nasazen xalatenem a maxytrolu.", lexicon, min_score=0.8)
+    assert text == "Nasazen Xalatanem a Maxitrolu."
+    assert [(sub.original, sub.replacement) for sub in substitutions] == [("xalatenem", "Xalatanem"), ("maxytrolu", "Maxitrolu")]
+
+
+def test_multi_word_terms_and_trailing_periods():
+    assert correct("Kapky kosopt bez konzervačních přísad.") == "Kapky Cosopt bez konzervačních přísad."
+    assert correct("Večer Spersadex komp.") == "Večer Spersadex Comp."
+
+
+def test_min_score_filters_weak_matches():
+    assert correct_medications("azopd", lexicon, min_score=0.8)[0] == "Azopt"
+    assert correct_medications("azopd", lexicon, min_score=0.85)[0] == "azopd"
+
+
+def test_local_correction_is_off_by_default():
+    assert settings.STT_LOCAL_CORRECTION is False
+    assert settings.STT_MEDICATION_MIN_SCORE >= 0.8
+
+
+def test_llm_is_never_skipped_without_substitutions(monkeypatch):
+    monkeypatch.setattr(settings, "STT_LOCAL_CORRECTION_SKIP_LLM", True)
+    confident = MedicationSubstitution(original="azopd", replacement="Azopt", score=0.95)
+    assert not services.can_skip_llm("Oko klidné.", [])
+    assert services.can_skip_llm("Azopt večer.", [confident])
+    assert not services.can_skip_llm("Azopt večer.", [confident.model_copy(update={"score": 0.8})])
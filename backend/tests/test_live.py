@@ -0,0 +1,146 @@
+import asyncio
+import shutil
+
+import numpy as np
+import pytest
+
+from stt import audio, live
+from stt.audio import SAMPLE_RATE, FfmpegStream, PcmStream, encode_wav
+from stt.config import settings
+
+
+def tone(seconds: float, amplitude: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def pcm16(samples: np.ndarray) -> bytes:
+    return (samples * 32767).astype(np.int16).tobytes()
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    # Records the length of every segment sent to Whisper
+    lengths = []
+    monkeypatch.setattr(live, "encode_audio", lambda samples, sample_rate, bitrate: lengths.append(len(samples)) or (".wav", b""))
+
+    async def atranscribe_audio(upload, model, language, prompt, seconds=None):
+        return f"segment {len(lengths)}"
+
+    monkeypatch.setattr(live, "atranscribe_audio", atranscribe_audio)
+    return lengths
+
+
+def test_pcm_stream_keeps_odd_bytes_for_the_next_chunk():
+    stream = PcmStream()
+    data = pcm16(tone(0.01))
+    stream.feed(data[:7])
+    assert len(stream.read_samples()) == 3
+    stream.feed(data[7:])
+    assert len(stream.read_samples()) == len(data) // 2 - 3
+    assert len(stream.read_samples()) == 0
+
+
+def test_next_cut_waits_for_the_window_and_prefers_pauses(monkeypatch):
+    monkeypatch.setattr(settings, "STT_LIVE_WINDOW_SECONDS", 4.0)
+    monkeypatch.setattr(settings, "STT_LIVE_MIN_COMMIT_SECONDS", 2.0)
+    transcriber = live.LiveTranscriber("pcm16")
+
+    assert transcriber._next_cut(tone(3.0)) is None
+    end, next_start = transcriber._next_cut(np.concatenate([tone(2.5), silence(1.0), tone(1.0)]))
+    assert end == next_start
+    assert abs(end / SAMPLE_RATE - 3.0) < 0.1
+
+
+def test_next_cut_splits_long_speech_with_overlap(monkeypatch):
+    monkeypatch.setattr(settings, "STT_LIVE_WINDOW_SECONDS", 4.0)
+    monkeypatch.setattr(settings, "STT_LIVE_MAX_WINDOW_SECONDS", 6.0)
+    transcriber = live.LiveTranscriber("pcm16")
+    pending = tone(6.0)
+
+    assert transcriber._next_cut(tone(5.0)) is None
+    end, next_start = transcriber._next_cut(pending)
+    assert end == len(pending)
+    assert end - next_start == int(settings.STT_SEGMENT_OVERLAP_SECONDS * SAMPLE_RATE)
+
+
+def test_pcm16_audio_is_committed_once(whisper, monkeypatch):
+    monkeypatch.setattr(settings, "STT_LIVE_WINDOW_SECONDS", 4.0)
+    monkeypatch.setattr(settings, "STT_LIVE_MIN_COMMIT_SECONDS", 2.0)
+    transcriber = live.LiveTranscriber("pcm16")
+    data = pcm16(np.concatenate([tone(2.5), silence(1.0), tone(1.0), silence(0.5), tone(1.0)]))
+
+    async def run():
+        await transcriber.add_chunk(data[:3 * SAMPLE_RATE * 2 + 1])
+        assert await transcriber.commit() is None
+        await transcriber.add_chunk(data[3 * SAMPLE_RATE * 2 + 1:])
+        first = await transcriber.commit()
+        final = await transcriber.commit(final=True)
+        return first, final
+
+    first, final = asyncio.run(run())
+    assert (first, final) == ("segment 1", "segment 2")
+    assert transcriber.transcript == "segment 1 segment 2"
+    assert transcriber.overlaps == [False, False]
+    # Every decoded sample went to Whisper exactly once
+    assert sum(whisper) == len(data) // 2
+    assert transcriber.committed_samples == len(data) // 2
+
+
+def test_only_forced_live_cuts_are_deduplicated(monkeypatch):
+    monkeypatch.setattr(settings, "STT_LIVE_WINDOW_SECONDS", 4.0)
+    monkeypatch.setattr(settings, "STT_LIVE_MAX_WINDOW_SECONDS", 6.0)
+    monkeypatch.setattr(settings, "STT_LIVE_MIN_COMMIT_SECONDS", 2.0)
+    monkeypatch.setattr(live, "encode_audio", lambda samples, sample_rate, bitrate: (".wav", b""))
+    texts = iter(["Pravé oko bez nálezu.", "bez nálezu je i levé oko.", "levé oko klidné."])
+
+    async def atranscribe_audio(upload, model, language, prompt, seconds=None):
+        return next(texts)
+
+    monkeypatch.setattr(live, "atranscribe_audio", atranscribe_audio)
+    transcriber = live.LiveTranscriber("pcm16")
+
+    async def run():
+        # A pause cut, then a forced cut in 6s of speech without a pause
+        await transcriber.add_chunk(pcm16(np.concatenate([tone(2.5), silence(1.0), tone(1.0)])))
+        await transcriber.commit()
+        await transcriber.add_chunk(pcm16(tone(5.0)))
+        await transcriber.commit()
+        await transcriber.commit(final=True)
+
+    asyncio.run(run())
+    assert transcriber.overlaps == [False, False, True]
+    assert transcriber.transcript == "Pravé oko bez nálezu. bez nálezu je i levé oko. klidné."
+
+
+def test_recordings_over_the_size_limit_are_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "STT_LIVE_MAX_BYTES", 10)
+    transcriber = live.LiveTranscriber("pcm16")
+    with pytest.raises(ValueError, match="maximum recording size"):
+        asyncio.run(transcriber.add_chunk(b"x" * 11))
+
+
+def test_container_audio_needs_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio.shutil, "which", lambda name: None)
+    with pytest.raises(ValueError, match="ffmpeg is required"):
+        live.LiveTranscriber("webm")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_ffmpeg_stream_decodes_incrementally():
+    data = encode_wav(tone(2.0), SAMPLE_RATE)
+    stream = FfmpegStream()
+    try:
+        decoded = []
+        for start in range(0, len(data), 4096):
+            stream.feed(data[start:start + 4096])
+            decoded.append(stream.read_samples())
+        stream.finish()
+        decoded.append(stream.read_samples())
+    finally:
+        stream.close()
+    assert abs(sum(len(samples) for samples in decoded) - 2 * SAMPLE_RATE) < SAMPLE_RATE * 0.05
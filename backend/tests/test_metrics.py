@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+import metrics
+from metrics import Registry, record_stage, server_timing_header, start_request_timings, timed
+from stt import services, upstream
+from caching import LRUCache
+from stt.cache import TieredCache
+from stt.models import AudioStats
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("path",))
+    latency = registry.histogram("latency_seconds", "Latency")
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    latency.observe(0.02)
+    latency.observe(3.0)
+
+    text = registry.render()
+    assert 'requests_total{path="/a\\"b"} 3.0' in text
+    assert 'latency_seconds_bucket{le="0.025"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_timed_records_stages_and_errors_for_sync_and_async():
+    timings = start_request_timings()
+
+    @timed("test_sync")
+    def fail():
+        raise KeyError("x")
+
+    @timed("test_async")
+    async def succeed():
+        return 1
+
+    with pytest.raises(KeyError):
+        fail()
+    assert asyncio.run(succeed()) == 1
+
+    assert [stage for stage, _ in timings] == ["test_sync", "test_async"]
+    assert 'stage_errors_total{stage="test_sync",error="KeyError"} 1.0' in metrics.registry.render()
+
+
+def test_server_timing_header_sums_repeated_stages():
+    header = server_timing_header([("llm", 0.5), ("whisper", 1.0), ("llm", 0.25)])
+    assert header == "llm;dur=750.0, whisper;dur=1000.0"
+
+
+def test_request_timings_are_only_collected_when_started():
+    start_request_timings()
+    record_stage("outside", 0.1)
+    timings = start_request_timings()
+    record_stage("inside", 0.1)
+    assert timings == [("inside", 0.1)]
+
+
+class FakeWhisper:
+    # Stands in for the sync upstream client, every call returns the same text or raises
+    def __init__(self, error=None):
+        self.error = error
+
+    def call(self, name, make_call, deadline):
+        if self.error:
+            raise self.error
+        return "Pacient bez obtíží."
+
+
+def whispered_seconds() -> float:
+    return metrics.audio_seconds._values.get((), 0.0)
+
+
+def test_whisper_stage_and_audio_seconds_exclude_cache_hits(tmp_path, monkeypatch):
+    path = tmp_path / "dictation.webm"
+    path.write_bytes(b"audio bytes")
+    stats = AudioStats(
+        passthrough=False, original_bytes=11, processed_bytes=11,
+        segments=2, overlaps=[False, False], segment_seconds=[1.5, 2.0]
+    )
+    monkeypatch.setattr(services, "transcription_cache", TieredCache(LRUCache(max_entries=10)))
+    monkeypatch.setattr(services, "preprocess_audio", lambda filepath: ([("a.webm", b""), ("b.webm", b"")], stats))
+    monkeypatch.setattr(upstream, "sync_upstream", FakeWhisper())
+    before = whispered_seconds()
+
+    timings = start_request_timings()
+    services.transcribe_audio_file(str(path))
+    services.transcribe_audio_file(str(path))
+    # Both segments are transcribed on pool threads and still reach the request timings
+    assert [stage for stage, _ in timings] == ["whisper", "whisper"]
+    assert whispered_seconds() - before == 3.5
+
+
+def test_failed_whisper_requests_are_not_counted(monkeypatch):
+    monkeypatch.setattr(upstream, "sync_upstream", FakeWhisper(RuntimeError("whisper request did not finish")))
+    before = whispered_seconds()
+    with pytest.raises(RuntimeError):
+        services.transcribe_upload(("a.webm", b""), 2.0)
+    assert whispered_seconds() == before
+
+
+def test_pooled_llm_chunks_reach_the_request_timings(monkeypatch):
+    monkeypatch.setattr(services, "chunk_for_llm", lambda text: ["První věta.", "Druhá věta."])
+    monkeypatch.setattr(services, "complete_chat", lambda messages, model, **options: '{"text": "Věta.", "recommendations": []}')
+
+    timings = start_request_timings()
+    assert services.correct_with_llm("První věta. Druhá věta.", deterministic=True) == ("Věta. Věta.", [])
+    assert [stage for stage, _ in timings] == ["llm", "llm"]
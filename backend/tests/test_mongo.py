@@ -0,0 +1,171 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from rag.config.settings import settings
+from rag.mongo import mongo
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+        self.cursor = None
+
+    def find(self, query, projection=None, batch_size=None):
+        self.calls.append(("find", query, projection, batch_size))
+        self.cursor = FakeCursor([dict(row) for row in self.rows])
+        return self.cursor
+
+    def aggregate(self, pipeline, batchSize=None):
+        self.calls.append(("aggregate", pipeline, batchSize))
+        self.cursor = FakeCursor([dict(row) for row in self.rows])
+        return self.cursor
+
+
+def law_row(law_id, **fields):
+    return {"_id": ObjectId(), "nazev": f"Zákon {law_id}", "id": law_id, "year": "2020", **fields}
+
+
+def test_changed_since_filter_treats_naive_times_as_utc():
+    assert mongo.changed_since_filter(None) == {}
+
+    since = datetime(2024, 5, 1, 12, 0)
+    query = mongo.changed_since_filter(since)
+    stamped, unstamped = query["$or"]
+    assert stamped == {mongo.UPDATED_AT: {"$gte": since.replace(tzinfo=timezone.utc)}}
+    assert unstamped[mongo.UPDATED_AT] == {"$exists": False}
+    assert unstamped["_id"]["$gte"].generation_time == since.replace(tzinfo=timezone.utc)
+
+
+def test_law_projection_always_keeps_required_fields():
+    assert mongo.law_projection(None) is None
+    assert mongo.law_projection(["category"]) == {"nazev": True, "id": True, "year": True, "category": True}
+
+
+def test_iter_laws_passes_filter_projection_and_batch_size(monkeypatch):
+    collection = FakeCollection([law_row("1/2020"), {"_id": ObjectId(), "nazev": "Bez čísla"}, law_row("2/2020")])
+    requested = []
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: requested.append((db, name)) or collection)
+    since = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    laws = list(mongo.iter_laws_from_mongodb("db", "laws", fields=["date"], since=since, batch_size=7))
+
+    # The row missing required fields is logged and skipped
+    assert [law.id for law in laws] == ["1/2020", "2/2020"]
+    assert requested == [("db", "laws")]
+    assert collection.calls == [(
+        "find", mongo.changed_since_filter(since), {"nazev": True, "id": True, "year": True, "date": True}, 7
+    )]
+    assert collection.cursor.closed
+
+
+def test_iter_laws_reports_laws_that_fail_to_parse(monkeypatch):
+    broken = {"_id": ObjectId(), "nazev": "Bez čísla"}
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: FakeCollection([law_row("1/2020"), broken]))
+    failed = []
+
+    assert [law.id for law in mongo.iter_laws_from_mongodb(failed=failed)] == ["1/2020"]
+    assert failed == [broken["_id"]]
+
+
+def test_iter_laws_defaults_to_whole_documents(monkeypatch):
+    collection = FakeCollection([law_row("1/2020")])
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: collection)
+
+    assert len(list(mongo.iter_laws_from_mongodb())) == 1
+    assert collection.calls == [("find", {}, None, settings.MONGO_BATCH_SIZE)]
+
+
+def test_iter_paragraphs_unwinds_on_the_server_and_shares_law(monkeypatch):
+    first, second = law_row("1/2020"), law_row("2/2020")
+    rows = [
+        {**first, "paragrafy": {"cislo": "1", "zneni": "první"}},
+        {**first, "paragrafy": {"cislo": "2", "zneni": "druhý"}},
+        {**second, "paragrafy": {"cislo": "1", "zneni": "jediný"}}
+    ]
+    collection = FakeCollection(rows)
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: collection)
+
+    pairs = list(mongo.iter_paragraphs_from_mongodb(fields=["date"], batch_size=3))
+
+    assert [(law.id, paragraph.cislo) for law, paragraph in pairs] == [("1/2020", "1"), ("1/2020", "2"), ("2/2020", "1")]
+    assert pairs[0][0] is pairs[1][0]
+    assert pairs[0][0].paragrafy == []
+    _, pipeline, batch_size = collection.calls[0]
+    assert batch_size == 3
+    assert pipeline == [
+        {"$match": {}},
+        {"$project": {"nazev": True, "id": True, "year": True, "date": True, "paragrafy": True}},
+        {"$unwind": "$paragrafy"}
+    ]
+    assert collection.cursor.closed
+
+
+def test_iter_paragraphs_skips_every_row_of_a_malformed_law(monkeypatch):
+    first, broken, last = law_row("1/2020"), {"_id": ObjectId(), "nazev": "Bez čísla"}, law_row("3/2020")
+    rows = [
+        {**first, "paragrafy": {"cislo": "a1", "zneni": "první"}},
+        {**broken, "paragrafy": {"cislo": "b1", "zneni": "druhý"}},
+        {**broken, "paragrafy": {"cislo": "b2", "zneni": "třetí"}},
+        {**last, "paragrafy": {"cislo": "c1", "zneni": "čtvrtý"}}
+    ]
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: FakeCollection(rows))
+
+    pairs = list(mongo.iter_paragraphs_from_mongodb())
+
+    assert [(law.id, paragraph.cislo) for law, paragraph in pairs] == [("1/2020", "a1"), ("3/2020", "c1")]
+
+
+def test_iter_paragraphs_without_fields_drops_only_updated_at(monkeypatch):
+    collection = FakeCollection([])
+    monkeypatch.setattr(mongo, "get_law_collection", lambda db, name: collection)
+
+    assert list(mongo.iter_paragraphs_from_mongodb()) == []
+    _, pipeline, batch_size = collection.calls[0]
+    assert pipeline[1] == {"$project": {mongo.UPDATED_AT: False}}
+    assert batch_size == settings.MONGO_BATCH_SIZE
+
+
+def test_mongo_client_is_shared_per_uri_and_closed(monkeypatch):
+    created = []
+
+    class FakeClient:
+        def __init__(self, uri, maxPoolSize):
+            self.uri = uri
+            self.max_pool_size = maxPoolSize
+            self.closed = False
+            created.append(self)
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(mongo, "MongoClient", FakeClient)
+    monkeypatch.setattr(mongo, "_clients", {})
+
+    default = mongo.get_mongo_client()
+    assert mongo.get_mongo_client() is default
+    assert default.uri == settings.MONGO_URI and default.max_pool_size == settings.MONGO_POOL_SIZE
+    other = mongo.get_mongo_client("mongodb://other:27017/")
+    assert other is not default and len(created) == 2
+
+    mongo.close_mongo_clients()
+    assert default.closed and other.closed
+    assert mongo._clients == {}
+    # A closed client is never handed out again
+    assert mongo.get_mongo_client() is not default
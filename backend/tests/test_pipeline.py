@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from rag.utils import pipeline as pipeline_module
+from rag.utils.pipeline import DONE, Pipeline, PipelineAborted, RateLimiter
+
+
+def test_stages_pass_items_through_in_order():
+    pipeline = Pipeline()
+    inbox, outbox = queue.Queue(maxsize=2), queue.Queue()
+    pipeline.stage("double", lambda item: item * 2, inbox, outbox, 1)
+    for item in range(5):
+        pipeline.put(inbox, item)
+    pipeline.put(inbox, DONE)
+    pipeline.join()
+
+    results = []
+    while (item := outbox.get()) is not DONE:
+        results.append(item)
+    assert results == [0, 2, 4, 6, 8]
+
+
+def test_full_queues_block_the_producer():
+    pipeline = Pipeline()
+    inbox = queue.Queue(maxsize=1)
+    release = threading.Event()
+    pipeline.stage("slow", lambda item: release.wait(), inbox, None, 1)
+    stats = pipeline.source_stats("read")
+
+    def release_later():
+        time.sleep(0.3)
+        release.set()
+
+    threading.Thread(target=release_later).start()
+    # The worker holds one item and the queue one more, the third put waits for the worker
+    for item in range(3):
+        pipeline.put(inbox, item, stats)
+    assert stats.blocked_seconds >= 0.2
+    pipeline.put(inbox, DONE)
+    pipeline.join()
+
+
+def test_a_failed_stage_aborts_producers_and_join_raises():
+    pipeline = Pipeline()
+    inbox = queue.Queue(maxsize=1)
+
+    def work(item):
+        raise ValueError(f"bad item {item}")
+
+    pipeline.stage("fail", work, inbox, None, 2)
+    with pytest.raises(PipelineAborted):
+        for item in range(100):
+            pipeline.put(inbox, item)
+    with pytest.raises(ValueError, match="bad item"):
+        pipeline.join()
+
+
+def test_dropped_items_are_not_forwarded():
+    pipeline = Pipeline()
+    inbox, outbox = queue.Queue(), queue.Queue()
+    pipeline.stage("odd", lambda item: item if item % 2 else None, inbox, outbox, 2)
+    for item in range(6):
+        pipeline.put(inbox, item)
+    pipeline.put(inbox, DONE)
+    pipeline.join()
+
+    results = set()
+    while (item := outbox.get()) is not DONE:
+        results.add(item)
+    assert results == {1, 3, 5}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pipeline_module.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(pipeline_module.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_rate_limiter_waits_for_requests(clock):
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=0)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_rate_limiter_waits_for_tokens_and_caps_large_requests(clock):
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(500)
+    limiter.acquire(200)
+    assert clock.sleeps == [pytest.approx(10.0)]
+    # More tokens than the bucket holds waits for a full bucket instead of forever
+    limiter.acquire(10_000)
+    assert sum(clock.sleeps) == pytest.approx(70.0)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from stt import audio, preprocessing
+from stt.audio import encode_wav, resample
+from stt.config import settings
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.full(int(seconds * SAMPLE_RATE), 1e-4, dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def without_ffmpeg(monkeypatch):
+    # Keeps the results the same whether or not ffmpeg is installed, WAV is decoded and encoded natively
+    monkeypatch.setattr(audio.shutil, "which", lambda name: None)
+
+
+def write_wav(tmp_path, samples: np.ndarray, name: str = "dictation.wav") -> str:
+    path = tmp_path / name
+    path.write_bytes(encode_wav(samples, SAMPLE_RATE))
+    return str(path)
+
+
+def test_undecodable_files_are_sent_as_is(tmp_path):
+    path = tmp_path / "dictation.webm"
+    path.write_bytes(b"not really audio")
+    uploads, stats = preprocessing.preprocess_audio(str(path))
+
+    assert uploads == [("dictation.webm", b"not really audio")]
+    assert stats.passthrough
+    assert stats.original_bytes == stats.processed_bytes == len(b"not really audio")
+    assert stats.processed_seconds is None
+
+
+def test_silence_is_trimmed_before_upload(tmp_path):
+    path = write_wav(tmp_path, np.concatenate([silence(3.0), tone(1.0), silence(3.0)]))
+    uploads, stats = preprocessing.preprocess_audio(path)
+
+    assert [name for name, _ in uploads] == ["segment-0.wav"]
+    assert not stats.passthrough
+    assert abs(stats.original_seconds - 7.0) < 0.01
+    assert abs(stats.processed_seconds - 1.5) < 0.1
+    assert stats.seconds_removed > 5
+    assert stats.bytes_saved > 0
+
+
+def test_long_recordings_are_split_at_pauses(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STT_SEGMENT_MAX_SECONDS", 3.0)
+    path = write_wav(tmp_path, np.concatenate([tone(2.0), silence(0.6), tone(2.0), silence(0.6), tone(2.0)]))
+    uploads, stats = preprocessing.preprocess_audio(path)
+
+    assert [name for name, _ in uploads] == ["segment-0.wav", "segment-1.wav", "segment-2.wav"]
+    assert stats.segments == 3
+    assert stats.overlaps == [False, False, False]
+
+
+def test_short_recordings_pass_through_without_normalization(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STT_AUDIO_NORMALIZE", False)
+    path = write_wav(tmp_path, np.concatenate([silence(1.0), tone(1.0)]))
+    uploads, stats = preprocessing.preprocess_audio(path)
+
+    assert uploads[0][0] == "dictation.wav"
+    assert stats.passthrough
+
+
+def test_reencoding_that_does_not_pay_off_keeps_the_original(tmp_path):
+    path = write_wav(tmp_path, tone(2.0))
+    uploads, stats = preprocessing.preprocess_audio(path)
+
+    assert uploads[0][0] == "dictation.wav"
+    assert stats.passthrough
+    assert abs(stats.processed_seconds - 2.0) < 0.01
+
+
+def test_totals_accumulate_across_files(tmp_path):
+    before = dict(preprocessing.preprocessing_totals)
+    preprocessing.preprocess_audio(write_wav(tmp_path, np.concatenate([silence(3.0), tone(1.0)]), "a.wav"))
+    preprocessing.preprocess_audio(write_wav(tmp_path, tone(1.0), "b.wav"))
+
+    assert preprocessing.preprocessing_totals["files"] - before["files"] == 2
+    assert preprocessing.preprocessing_totals["passthrough_files"] - before["passthrough_files"] == 1
+    assert preprocessing.preprocessing_totals["seconds_removed"] > before["seconds_removed"]
+
+
+def test_resample_keeps_duration():
+    resampled = resample(tone(1.0), SAMPLE_RATE, 8000)
+    assert len(resampled) == 8000
+    assert resampled.dtype == np.float32
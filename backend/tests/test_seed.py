@@ -0,0 +1,219 @@
+import hashlib
+import os
+
+import pytest
+from qdrant_client import QdrantClient
+
+from rag.config.settings import settings
+from rag.index import STORED_FIELDS, DocumentStore, DocumentStoreWriter
+from rag.models import Law, Paragraf
+from rag.utils import build_local_index, seed_qdrant
+from rag.voyage_embed import batching
+
+COLLECTION = "LAWS_MVP"
+
+
+def embed(text: str) -> list:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [1.0 + byte / 255 for byte in digest[:4]]
+
+
+def law(law_id: str, *paragraphs: str) -> Law:
+    return Law(
+        nazev=f"Zákon {law_id}",
+        id=law_id,
+        year="2011",
+        paragrafy=[Paragraf(cislo=str(index + 1), zneni=text) for index, text in enumerate(paragraphs)]
+    )
+
+
+class Seeding:
+    def __init__(self, tmp_path, monkeypatch):
+        self.client = QdrantClient(":memory:")
+        self.laws = []
+        self.upserted_payloads = []
+        self.embedded = []
+        self.store_dir = str(tmp_path / "documents")
+        self.checkpoint_path = str(tmp_path / "checkpoint.json")
+        upsert = self.client.upsert
+
+        def recording_upsert(collection_name, points, wait=True):
+            self.upserted_payloads.extend(dict(point.payload) for point in points)
+            return upsert(collection_name=collection_name, points=points, wait=wait)
+
+        monkeypatch.setattr(self.client, "upsert", recording_upsert)
+        monkeypatch.setattr(seed_qdrant, "qdrant_client", self.client)
+        monkeypatch.setattr(build_local_index, "qdrant_client", self.client)
+        monkeypatch.setattr(seed_qdrant, "iter_laws_from_mongodb", self.iter_laws)
+        monkeypatch.setattr(seed_qdrant, "close_mongo_clients", lambda: None)
+        monkeypatch.setattr(seed_qdrant, "get_embeddings", lambda texts, **kwargs: [embed(text) for text in texts])
+        monkeypatch.setattr(seed_qdrant, "get_embeddings_batched", self.embed_batched)
+        monkeypatch.setattr(settings, "DOCUMENT_STORE_DIR", self.store_dir)
+        monkeypatch.setattr(settings, "SEED_CHECKPOINT_PATH", self.checkpoint_path)
+        monkeypatch.setattr(settings, "QDRANT_SEED_MARKER_PATH", str(tmp_path / "seeded"))
+        monkeypatch.setattr(settings, "LOCAL_INDEX_DIR", "")
+        monkeypatch.setattr(settings, "BM25_INDEX_DIR", "")
+
+    def iter_laws(self, failed=None):
+        # None stands for a Mongo document that fails to parse
+        for law in self.laws:
+            if law is None:
+                failed.append("unparsed")
+            else:
+                yield law
+
+    def embed_batched(self, texts, token_counts=None):
+        self.embedded.extend(texts)
+        return [embed(text) for text in texts]
+
+    def points(self) -> dict:
+        records, _ = self.client.scroll(COLLECTION, limit=1000, with_payload=True)
+        return {str(record.id): record.payload for record in records}
+
+
+@pytest.fixture
+def seeding(tmp_path, monkeypatch):
+    return Seeding(tmp_path, monkeypatch)
+
+
+def test_points_keep_full_payloads_until_the_document_store_is_published(seeding):
+    seeding.laws = [law("372", "Zdravotní dokumentace.", "Nahlížení do dokumentace.")]
+    seed_qdrant.main()
+
+    # Upserted points can be served on their own while the previous document store is still live
+    assert all(payload["paragraph_zneni"] for payload in seeding.upserted_payloads)
+    store = DocumentStore(seeding.store_dir)
+    for point_id, payload in seeding.points().items():
+        assert not set(STORED_FIELDS) & set(payload)
+        assert payload["law_id"] == "372"
+        assert store.payload(point_id)["paragraph_zneni"] in ("Zdravotní dokumentace.", "Nahlížení do dokumentace.")
+
+
+def test_reseeding_only_embeds_changed_paragraphs_and_deletes_stale_points(seeding):
+    seeding.laws = [law("372", "Zdravotní dokumentace.", "Nahlížení do dokumentace.")]
+    seed_qdrant.main()
+    first = set(seeding.points())
+
+    seeding.embedded.clear()
+    seeding.laws = [law("372", "Zdravotní dokumentace.", "Nahlížení je možné.")]
+    seed_qdrant.main()
+
+    assert seeding.embedded == ["Nahlížení je možné."]
+    points = seeding.points()
+    assert len(points) == 2 and len(first & set(points)) == 1
+    store = DocumentStore(seeding.store_dir)
+    assert sorted(store.payload(point_id)["paragraph_zneni"] for point_id in points) == ["Nahlížení je možné.", "Zdravotní dokumentace."]
+
+
+def test_document_store_finds_every_kind_of_point_id(tmp_path):
+    writer = DocumentStoreWriter(str(tmp_path))
+    law_row = writer.add_law(law("372"))
+    ids = ["5b0c3f3e-6f51-4c1e-9a57-2f1d0c6a7e21", 7, "b", "a"]
+    for point_id in ids:
+        writer.add_point(point_id, writer.add_paragraph(law_row, "1", f"text {point_id}"))
+    writer.commit()
+
+    store = DocumentStore(str(tmp_path))
+    for point_id in ids:
+        assert store.payload(point_id)["paragraph_zneni"] == f"text {point_id}"
+    assert store.payload("7") is not None
+    assert store.payload("c") is None
+    assert store.payload("x" * 100) is None
+
+
+def test_chunks_of_a_long_paragraph_share_the_stored_paragraph(seeding, monkeypatch):
+    monkeypatch.setattr(batching, "_encoding", lambda: None)
+    monkeypatch.setattr(settings, "EMBEDDING_CHUNK_MAX_TOKENS", 20)
+    monkeypatch.setattr(settings, "EMBEDDING_CHUNK_OVERLAP_TOKENS", 5)
+    long_paragraph = " ".join(f"slovo{index}" for index in range(40))
+    seeding.laws = [law("372", long_paragraph, "Krátký odstavec.")]
+    seed_qdrant.main()
+
+    points = seeding.points()
+    chunks = [payload for payload in points.values() if payload["paragraph_cislo"] == "1"]
+    assert len(chunks) > 1
+    assert sorted(payload["paragraph_chunk"] for payload in chunks) == list(range(len(chunks)))
+    # Each chunk was embedded on its own, but the store returns the whole paragraph for every one of them
+    assert all(len(text) < len(long_paragraph) for text in seeding.embedded if text.startswith("slovo"))
+    store = DocumentStore(seeding.store_dir)
+    assert {store.payload(point_id)["paragraph_zneni"] for point_id, payload in points.items() if payload["paragraph_cislo"] == "1"} == {long_paragraph}
+
+
+def test_checkpoint_only_records_laws_whose_batches_are_upserted(tmp_path):
+    checkpoint = seed_qdrant.SeedCheckpoint(str(tmp_path / "checkpoint.json"), COLLECTION)
+    progress = seed_qdrant.LawProgress(checkpoint)
+    first, second = seed_qdrant.SeedBatch(), seed_qdrant.SeedBatch()
+    progress.add_to_batch("372:2011", first)
+    progress.add_to_batch("372:2011", second)
+    progress.add_to_batch("89:2012", second)
+    progress.close_law("372:2011", "hash-a")
+    progress.close_law("89:2012", "hash-b")
+
+    progress.batch_upserted(first)
+    assert checkpoint.laws == {}
+    progress.batch_upserted(second)
+    assert checkpoint.laws == {"372:2011": "hash-a", "89:2012": "hash-b"}
+
+    # Another collection starts from scratch, the same one resumes
+    assert seed_qdrant.SeedCheckpoint(checkpoint.path, "OTHER").laws == {}
+    assert seed_qdrant.SeedCheckpoint(checkpoint.path, COLLECTION).is_done("89:2012", "hash-b")
+
+
+def test_interrupted_seed_resumes_without_reembedding_finished_laws(seeding, monkeypatch):
+    seeding.laws = [law("1", "První zákon."), law("2", "Druhý zákon."), law("3", "Třetí zákon.")]
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_TEXTS", 1)
+    monkeypatch.setattr(settings, "SEED_EMBED_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "SEED_UPSERT_CONCURRENCY", 1)
+    upsert = seeding.client.upsert
+
+    def failing_upsert(collection_name, points, wait=True):
+        if points[0].payload["law_id"] == "3":
+            raise ConnectionError("Qdrant went away")
+        return upsert(collection_name=collection_name, points=points, wait=wait)
+
+    monkeypatch.setattr(seeding.client, "upsert", failing_upsert)
+    with pytest.raises(ConnectionError):
+        seed_qdrant.main()
+    checkpoint = seed_qdrant.SeedCheckpoint(seeding.checkpoint_path, COLLECTION)
+    assert set(checkpoint.laws) == {"1:2011", "2:2011"}
+
+    monkeypatch.setattr(seeding.client, "upsert", upsert)
+    seeding.embedded.clear()
+    seed_qdrant.main()
+
+    assert seeding.embedded == ["Třetí zákon."]
+    assert len(seeding.points()) == 3
+    assert not os.path.exists(seeding.checkpoint_path)
+
+
+def test_missing_embeddings_fail_the_seed_and_keep_the_checkpoint(seeding, monkeypatch):
+    seeding.laws = [law("1", "První zákon."), law("2", "Druhý zákon.")]
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_MAX_TEXTS", 1)
+    monkeypatch.setattr(settings, "SEED_EMBED_CONCURRENCY", 1)
+
+    def embed_batched(texts, token_counts=None):
+        return [] if texts == ["Druhý zákon."] else [embed(text) for text in texts]
+
+    monkeypatch.setattr(seed_qdrant, "get_embeddings_batched", embed_batched)
+    with pytest.raises(RuntimeError, match="Got 0 embeddings for 1 texts"):
+        seed_qdrant.main()
+
+    checkpoint = seed_qdrant.SeedCheckpoint(seeding.checkpoint_path, COLLECTION)
+    assert set(checkpoint.laws) == {"1:2011"}
+    assert not os.path.exists(settings.QDRANT_SEED_MARKER_PATH)
+
+
+def test_unparsed_laws_fail_the_seed_before_stale_points_are_deleted(seeding):
+    seeding.laws = [law("1", "První zákon."), law("2", "Druhý zákon.")]
+    seed_qdrant.main()
+    points = seeding.points()
+
+    # Law 2 is still in Mongo but its document no longer parses
+    seeding.laws = [law("1", "První zákon."), None]
+    with pytest.raises(RuntimeError, match="1 laws could not be parsed"):
+        seed_qdrant.main()
+
+    assert seeding.points().keys() == points.keys()
+    # The published document store still covers law 2
+    store = DocumentStore(seeding.store_dir)
+    assert {store.payload(point_id)["law_id"] for point_id in points} == {"1", "2"}
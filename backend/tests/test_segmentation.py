@@ -0,0 +1,76 @@
+import numpy as np
+
+from stt.segmentation import find_silences, split_on_silence, stitch_transcripts, trim_silence
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.full(int(seconds * SAMPLE_RATE), 1e-4, dtype=np.float32)
+
+
+def test_find_silences_locates_pauses_between_speech():
+    samples = np.concatenate([tone(1.0), silence(0.6), tone(1.0), silence(0.1), tone(1.0)])
+    silences = find_silences(samples, SAMPLE_RATE, min_silence_seconds=0.4)
+
+    # The 0.1s gap is too short to count as a pause
+    assert len(silences) == 1
+    start, end = silences[0]
+    assert abs(start / SAMPLE_RATE - 1.0) < 0.05
+    assert abs(end / SAMPLE_RATE - 1.6) < 0.05
+
+
+def test_trim_silence_keeps_padding_around_speech():
+    samples = np.concatenate([silence(2.0), tone(1.0), silence(2.0)])
+    trimmed = trim_silence(samples, SAMPLE_RATE, padding_seconds=0.25)
+    assert abs(len(trimmed) / SAMPLE_RATE - 1.5) < 0.1
+
+
+def test_split_on_silence_prefers_pauses_and_keeps_segments_short():
+    total = 300 * SAMPLE_RATE
+    silences = [(100 * SAMPLE_RATE, 101 * SAMPLE_RATE), (190 * SAMPLE_RATE, 191 * SAMPLE_RATE)]
+    segments, overlaps = split_on_silence(total, SAMPLE_RATE, silences, max_seconds=120, overlap_seconds=1)
+
+    assert segments[0] == (0, int(100.5 * SAMPLE_RATE))
+    assert segments[1] == (int(100.5 * SAMPLE_RATE), int(190.5 * SAMPLE_RATE))
+    assert segments[-1][1] == total
+    assert all(end - start <= 120 * SAMPLE_RATE for start, end in segments)
+    # Cuts at pauses need no overlap
+    assert overlaps == [False, False, False]
+
+
+def test_split_on_silence_overlaps_hard_cuts():
+    segments, overlaps = split_on_silence(250 * SAMPLE_RATE, SAMPLE_RATE, [], max_seconds=100, overlap_seconds=1)
+    assert segments[0] == (0, 100 * SAMPLE_RATE)
+    assert segments[1][0] == 99 * SAMPLE_RATE
+    assert segments[-1][1] == 250 * SAMPLE_RATE
+    assert overlaps == [False, True, True]
+
+
+def test_short_recordings_are_one_segment():
+    assert split_on_silence(10 * SAMPLE_RATE, SAMPLE_RATE, [], max_seconds=100, overlap_seconds=1) == ([(0, 10 * SAMPLE_RATE)], [False])
+
+
+def test_stitch_transcripts_drops_repeated_overlap():
+    texts = ["Pacient má zánět spojivek, doporučuji kapky", "Doporučuji kapky Tobrex třikrát denně."]
+    assert stitch_transcripts(texts, [False, True]) == "Pacient má zánět spojivek, doporučuji kapky Tobrex třikrát denně."
+
+
+def test_stitch_transcripts_ignores_single_word_matches():
+    # One shared word is as likely to be a real repetition as an overlap
+    assert stitch_transcripts(["Oko je", "je klidné."], [False, True]) == "Oko je je klidné."
+
+
+def test_stitch_transcripts_keeps_text_without_overlap():
+    assert stitch_transcripts(["První věta.", "", "Druhá věta."], [False, True, True]) == "První věta. Druhá věta."
+
+
+def test_stitch_transcripts_keeps_repetitions_across_pauses():
+    # The segments were cut at a pause, so the repeated words were really said twice
+    texts = ["Pravé oko bez nálezu.", "bez nálezu je i levé oko."]
+    assert stitch_transcripts(texts, [False, False]) == "Pravé oko bez nálezu. bez nálezu je i levé oko."
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from stt import services, streaming
+from caching import LRUCache
+from stt.config import settings
+
+RESPONSE = json.dumps({"text": "Oko klidné.\nVizus 1,0.", "recommendations": ["Kontrola za měsíc"]}, ensure_ascii=False)
+
+
+def parse_events(stream):
+    events = []
+    for raw in stream:
+        lines = raw.strip().split("\n")
+        events.append((lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))))
+    return events
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(streaming, "transcribe_audio_file", lambda filepath: "oko klidne vizus jedna")
+    monkeypatch.setattr(services, "correction_cache", LRUCache(max_entries=10))
+    monkeypatch.setattr(settings, "STT_LOCAL_CORRECTION", False)
+
+    def stream_llm(messages, deterministic=False):
+        # Chunk boundaries fall inside escapes and multi-byte characters on purpose
+        for start in range(0, len(RESPONSE), 3):
+            yield RESPONSE[start:start + 3]
+
+    monkeypatch.setattr(streaming, "stream_llm", stream_llm)
+
+
+@pytest.mark.parametrize("field_json", [
+    r'{"text": "a\"b\u00e9\n", "recommendations": []}',
+    r'{"recommendations": [], "text" : "žluté \ud83d\ude00"}',
+])
+def test_json_string_field_stream_decodes_any_chunking(field_json):
+    expected = json.loads(field_json)["text"]
+    for size in range(1, 6):
+        stream = streaming.JsonStringFieldStream("text")
+        decoded = "".join(stream.feed(field_json[start:start + size]) for start in range(0, len(field_json), size))
+        assert decoded == expected
+        assert stream.done
+
+
+def test_streamed_and_cached_results_have_the_same_shape(pipeline):
+    streamed = parse_events(streaming.stream_transcription_events("audio.webm", deterministic=True))
+    cached = parse_events(streaming.stream_transcription_events("audio.webm", deterministic=True))
+
+    expected = {"transcription": "Oko klidné.\nVizus 1,0.", "recommendations": ["Kontrola za měsíc"]}
+    assert streamed[-1] == ("result", expected)
+    assert cached[-1] == ("result", expected)
+    assert "".join(data["delta"] for event, data in streamed if event == "correction") == expected["transcription"]
+    assert [data["delta"] for event, data in cached if event == "correction"] == [expected["transcription"]]
+
+
+def test_long_transcripts_are_streamed_in_chunks(pipeline, monkeypatch):
+    monkeypatch.setattr(streaming, "chunk_for_llm", lambda text: ["oko klidne", "vizus jedna", "kontrola"])
+    replies = {
+        "vizus jedna": json.dumps({"text": "Vizus 1,0.", "recommendations": ["Kontrola za měsíc"]}, ensure_ascii=False),
+        "kontrola": json.dumps({"text": "Kontrola.", "recommendations": ["kontrola za měsíc"]}, ensure_ascii=False)
+    }
+    prompts = []
+
+    def stream_llm(messages, deterministic=False):
+        prompts.append(messages[-1]["content"])
+        yield json.dumps({"text": "Oko klidné.", "recommendations": []}, ensure_ascii=False)
+
+    def invoke_llm(messages, deterministic=False):
+        prompts.append(messages[-1]["content"])
+        return replies[messages[-1]["content"]]
+
+    monkeypatch.setattr(streaming, "format_prompt", lambda text: [{"role": "user", "content": text}])
+    monkeypatch.setattr(streaming, "stream_llm", stream_llm)
+    monkeypatch.setattr(streaming, "invoke_llm", invoke_llm)
+    events = parse_events(streaming.stream_transcription_events("audio.webm", deterministic=True))
+
+    assert sorted(prompts) == ["kontrola", "oko klidne", "vizus jedna"]
+    assert [data["delta"] for event, data in events if event == "correction"] == ["Oko klidné.", " Vizus 1,0.", " Kontrola."]
+    assert events[-1] == ("result", {
+        "transcription": "Oko klidné. Vizus 1,0. Kontrola.",
+        "recommendations": ["Kontrola za měsíc"]
+    })
+
+
+def test_skipped_llm_results_have_the_same_shape(pipeline, monkeypatch):
+    monkeypatch.setattr(streaming, "can_skip_llm", lambda text, substitutions: True)
+    events = parse_events(streaming.stream_transcription_events("audio.webm"))
+    assert events[-1] == ("result", {"transcription": "oko klidne vizus jedna", "recommendations": []})
+
+
+def test_errors_are_reported_as_events(monkeypatch):
+    def fail(filepath):
+        raise RuntimeError("whisper is down")
+
+    monkeypatch.setattr(streaming, "transcribe_audio_file", fail)
+    assert parse_events(streaming.stream_transcription_events("audio.webm")) == [("error", {"error": "whisper is down"})]
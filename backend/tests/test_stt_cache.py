@@ -0,0 +1,75 @@
+import os
+
+from caching import LRUCache
+from stt import services
+from stt.cache import DiskCache, TieredCache, content_key, file_content_key
+
+
+def test_file_content_key_matches_content_key(tmp_path):
+    path = tmp_path / "audio.webm"
+    data = os.urandom(10_000)
+    path.write_bytes(data)
+    assert file_content_key(str(path), "whisper-1", "cs", chunk_size=999) == content_key(data, "whisper-1", "cs")
+    assert file_content_key(str(path), "whisper-1", "en") != content_key(data, "whisper-1", "cs")
+
+
+def test_disk_cache_round_trip_and_size_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=25)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+    assert cache.get("a") == "x" * 10
+    cache.set("c", "z" * 10)
+
+    # "b" was used least recently
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "z" * 10
+    assert cache.total_bytes == 20
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def test_disk_cache_overwrites_do_not_double_count(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    for _ in range(5):
+        cache.set("a", "x" * 30)
+    assert cache.total_bytes == 30
+
+
+def test_disk_cache_does_not_rescan_on_every_set(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    scans = []
+    original = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or original(path))
+    for index in range(20):
+        cache.set(str(index), "value")
+    assert scans == []
+
+
+def test_disk_cache_picks_up_existing_entries(tmp_path):
+    DiskCache(str(tmp_path), max_bytes=1000).set("a", "x" * 10)
+    reopened = DiskCache(str(tmp_path), max_bytes=15)
+    assert reopened.total_bytes == 10
+    reopened.set("b", "y" * 10)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == "y" * 10
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    disk = DiskCache(str(tmp_path), max_bytes=1000)
+    disk.set("a", "text")
+    cache = TieredCache(LRUCache(max_entries=10), disk)
+    assert cache.get("a") == "text"
+    assert cache.memory.get("a") == "text"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_cached_transcriptions_skip_preprocessing_and_whisper(tmp_path, monkeypatch):
+    path = tmp_path / "dictation.webm"
+    path.write_bytes(b"audio bytes")
+    calls = []
+    monkeypatch.setattr(services, "transcription_cache", TieredCache(LRUCache(max_entries=10)))
+    monkeypatch.setattr(services, "preprocess_audio", lambda filepath: calls.append(filepath) or ([("a.webm", b"")], None))
+    monkeypatch.setattr(services, "transcribe_uploads", lambda uploads, stats: ["Pacient bez obtíží."])
+
+    assert services.transcribe_audio_file(str(path)) == "Pacient bez obtíží."
+    assert services.transcribe_audio_file(str(path)) == "Pacient bez obtíží."
+    assert len(calls) == 1
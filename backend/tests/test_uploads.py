@@ -0,0 +1,61 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from fastapi import UploadFile
+
+from stt import uploads
+from stt.config import settings
+
+
+def make_upload(data: bytes, filename: str = "dictation.webm") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def test_save_upload_writes_file_in_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+    upload_id, filepath = asyncio.run(uploads.save_upload(make_upload(b"0123456789", "note.MP3")))
+
+    assert filepath.endswith(upload_id + ".mp3")
+    with open(filepath, "rb") as f:
+        assert f.read() == b"0123456789"
+    assert uploads.resolve_upload(upload_id) == filepath
+
+
+def test_save_upload_defaults_unknown_extensions_to_webm():
+    _, filepath = asyncio.run(uploads.save_upload(make_upload(b"data", "note.exe")))
+    assert filepath.endswith(".webm")
+
+
+def test_save_upload_rejects_oversized_files_and_removes_partial_file(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 5)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 2)
+    before = set(os.listdir(settings.UPLOAD_FOLDER))
+
+    with pytest.raises(uploads.UploadTooLargeError):
+        asyncio.run(uploads.save_upload(make_upload(b"0123456789")))
+    assert set(os.listdir(settings.UPLOAD_FOLDER)) == before
+
+
+@pytest.mark.parametrize("upload_id", ["../etc/passwd", "not-an-id", "A" * 32])
+def test_resolve_upload_rejects_malformed_ids(upload_id):
+    assert uploads.resolve_upload(upload_id) is None
+
+
+def test_cleanup_removes_only_expired_uploads(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_RETENTION_SECONDS", 60)
+    old_id, old_path = asyncio.run(uploads.save_upload(make_upload(b"old")))
+    new_id, new_path = asyncio.run(uploads.save_upload(make_upload(b"new")))
+    foreign_path = os.path.join(settings.UPLOAD_FOLDER, "keep-me.webm")
+    with open(foreign_path, "wb") as f:
+        f.write(b"not ours")
+    past = time.time() - 120
+    os.utime(old_path, (past, past))
+    os.utime(foreign_path, (past, past))
+
+    assert uploads.cleanup_expired_uploads() == 1
+    assert uploads.resolve_upload(old_id) is None
+    assert uploads.resolve_upload(new_id) == new_path
+    assert os.path.exists(foreign_path)
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from stt import upstream
+from stt.config import settings
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test-model",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "{\"text\": \"Oko klidné.\", \"recommendations\": []}"}
+    }],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+}
+
+
+class StandIn:
+    # Serves the OpenAI endpoints with a scripted list of (status, delay) replies, the last one repeats
+    def __init__(self):
+        self.replies = [(200, 0)]
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stand_in.requests.append(self.path)
+                status, delay = stand_in.replies[min(len(stand_in.requests), len(stand_in.replies)) - 1]
+                time.sleep(delay)
+                if self.path.endswith("/audio/transcriptions"):
+                    body, content_type = "Pacient bez obtíží.".encode(), "text/plain"
+                else:
+                    body, content_type = json.dumps(COMPLETION).encode(), "application/json"
+                if status != 200:
+                    body, content_type = json.dumps({"error": {"message": "scripted"}}).encode(), "application/json"
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    server = StandIn()
+    monkeypatch.setattr(settings, "STT_UPSTREAM_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "STT_UPSTREAM_MAX_RETRIES", 2)
+    monkeypatch.setattr(upstream, "sync_upstream", upstream.SyncUpstreamClient(upstream.create_openai_client(server.base_url)))
+    yield server
+    server.close()
+
+
+def run_async(monkeypatch, stand_in, make_call):
+    async def run():
+        # The async client binds to the running loop, so it is created inside it
+        monkeypatch.setattr(upstream, "upstream", upstream.UpstreamClient(upstream.create_async_openai_client(stand_in.base_url)))
+        return await make_call()
+
+    return asyncio.run(run())
+
+
+def test_sync_transcription_retries_server_errors(stand_in):
+    stand_in.replies = [(503, 0), (200, 0)]
+    assert upstream.transcribe_audio(("a.webm", b"audio"), "whisper-1", "cs", "").strip() == "Pacient bez obtíží."
+    assert stand_in.requests == ["/v1/audio/transcriptions"] * 2
+
+
+def test_async_transcription_retries_server_errors(monkeypatch, stand_in):
+    stand_in.replies = [(503, 0), (200, 0)]
+    text = run_async(monkeypatch, stand_in, lambda: upstream.atranscribe_audio(("a.webm", b"audio"), "whisper-1", "cs", ""))
+    assert text.strip() == "Pacient bez obtíží."
+    assert len(stand_in.requests) == 2
+
+
+def test_sync_and_async_chat_send_the_same_request(monkeypatch, stand_in):
+    messages = [{"role": "user", "content": "oko klidne"}]
+    sync_text = upstream.complete_chat(messages, "test-model", temperature=0)
+    async_text = run_async(monkeypatch, stand_in, lambda: upstream.acomplete_chat(messages, "test-model", temperature=0))
+    assert sync_text == async_text == COMPLETION["choices"][0]["message"]["content"]
+    assert stand_in.requests == ["/v1/chat/completions"] * 2
+
+
+def test_client_errors_are_not_retried(monkeypatch, stand_in):
+    stand_in.replies = [(400, 0)]
+    with pytest.raises(openai.BadRequestError):
+        upstream.complete_chat([{"role": "user", "content": "x"}], "test-model")
+    with pytest.raises(openai.BadRequestError):
+        run_async(monkeypatch, stand_in, lambda: upstream.acomplete_chat([{"role": "user", "content": "x"}], "test-model"))
+    assert len(stand_in.requests) == 2
+
+
+def test_sync_call_gives_up_at_the_deadline(monkeypatch, stand_in):
+    stand_in.replies = [(200, 1.0)]
+    monkeypatch.setattr(settings, "STT_LLM_DEADLINE_SECONDS", 0.2)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="llm request did not finish"):
+        upstream.complete_chat([{"role": "user", "content": "x"}], "test-model")
+    assert time.monotonic() - started < 0.9
+
+
+def test_async_call_gives_up_at_the_deadline(monkeypatch, stand_in):
+    stand_in.replies = [(200, 1.0)]
+    monkeypatch.setattr(settings, "STT_LLM_DEADLINE_SECONDS", 0.2)
+    with pytest.raises(RuntimeError, match="llm request did not finish"):
+        run_async(monkeypatch, stand_in, lambda: upstream.acomplete_chat([{"role": "user", "content": "x"}], "test-model"))
@@ -73,12 +73,15 @@ function App() {
 		recorderControls.startRecording();
 	};
 
-	const handleTranscribeAudio = async () => {
+	const handleTranscribeAudio = async (uploadId: string) => {
 		setIsTranscribing(true); // Start indicating transcription process
 		try {
-			const transcriptionResponse = await fetch(`${apiUrl}/transcribe`, {
-				method: "GET",
-			});
+			const transcriptionResponse = await fetch(
+				`${apiUrl}/transcribe?upload_id=${encodeURIComponent(uploadId)}`,
+				{
+					method: "GET",
+				}
+			);
 			const transcriptionData = await transcriptionResponse.json();
 			if (transcriptionResponse.ok) {
 				setTranscriptionText(
@@ -101,11 +104,15 @@ function App() {
 		const formData = new FormData();
 		formData.append("file", blob, "recording.webm");
 		try {
-			await fetch(`${apiUrl}/upload`, {
+			const uploadResponse = await fetch(`${apiUrl}/upload`, {
 				method: "POST",
 				body: formData,
 			});
-			handleTranscribeAudio();
+			const uploadData = await uploadResponse.json();
+			if (!uploadResponse.ok) {
+				throw new Error(uploadData.detail || "Failed to upload file");
+			}
+			handleTranscribeAudio(uploadData.upload_id);
 		} catch (error) {
 			console.error("Error during upload:", error);
 			setIsTranscribing(false); // Ensure we stop indicating transcription if upload fails